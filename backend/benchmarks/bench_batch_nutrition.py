@@ -0,0 +1,89 @@
+"""
+bench_batch_nutrition.py
+
+Throughput benchmark: analysing N meal descriptions one /api/analyze-nutrition request at a
+time versus a single /api/analyze-nutrition/batch request (sparse quantity matrix x
+nutrient matrix, see nutrition_matrix.py). Both go through Flask's test client. The
+in-process rows show the same comparison without HTTP: find_food_matches + estimate_item
++ aggregate per description versus analyze_batch.
+
+Run from backend/:
+    python benchmarks/bench_batch_nutrition.py [--sizes 100,1000,5000] [--repeat 3]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+
+import nutrition_extractor as ne  # noqa: E402
+
+_UNITS = ["g", "g of", " cups", " tbsp", " slices", " pieces", " oz", ""]
+_FILLER = ["for lunch", "with a little salt", "and water", "after the gym", "late snack"]
+
+
+def corpus(size, rnd):
+    foods = list(ne.FOOD_DB) + [s for group in ne.SYNONYMS.values() for s in group]
+    texts = []
+    for _ in range(size):
+        parts = []
+        for _ in range(rnd.randint(1, 5)):
+            food = rnd.choice(foods)
+            parts.append(f"{rnd.randint(1, 300)}{rnd.choice(_UNITS)} {food}" if rnd.random() < 0.7 else food)
+        texts.append(", ".join(parts) + " " + rnd.choice(_FILLER))
+    return texts
+
+
+def single(text):
+    matches = ne.find_food_matches(text)
+    identified = [ne.estimate_item(m) for m in matches]
+    return ne.aggregate(identified) if identified else ne.heuristic_free_text(text)
+
+
+def best(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="100,1000,5000")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    rnd = random.Random(11)
+
+    app = Flask(__name__)
+    app.register_blueprint(ne.bp, url_prefix="/api")
+    client = app.test_client()
+    ne.find_food_matches("warm-up")             # compile the matcher outside the timings
+
+    print(f"{'texts':>7}{'http single':>14}{'http batch':>14}{'speedup':>9}{'fn single':>14}{'fn batch':>14}{'speedup':>9}   (descriptions/s)")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        texts = corpus(size, rnd)
+
+        def http_single():
+            for text in texts:
+                client.post("/api/analyze-nutrition", json={"description": text})
+
+        def http_batch():
+            r = client.post("/api/analyze-nutrition/batch", json={"descriptions": texts})
+            assert r.status_code == 200, r.get_json()
+
+        hs = size / best(http_single, args.repeat)
+        hb = size / best(http_batch, args.repeat)
+        fs = size / best(lambda: [single(t) for t in texts], args.repeat)
+        fb = size / best(lambda: ne.analyze_batch(texts), args.repeat)
+        print(f"{size:>7}{hs:>14,.0f}{hb:>14,.0f}{hb / hs:>8.1f}x{fs:>14,.0f}{fb:>14,.0f}{fb / fs:>8.1f}x", flush=True)
+        ne.NUTRITION_STORE.clear()
+
+
+if __name__ == "__main__":
+    main()
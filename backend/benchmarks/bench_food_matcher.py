@@ -0,0 +1,144 @@
+"""
+bench_food_matcher.py
+
+Micro-benchmark: nutrition_extractor.find_food_matches with the previous substring scans
+(every FOOD_DB key, every SYNONYMS entry, identify_food_key's linear scan and the any(...)
+dedupe) versus the compiled Aho-Corasick matcher (food_matcher), as the food table grows.
+
+Run from backend/:
+    python benchmarks/bench_food_matcher.py [--sizes 16,256,4096] [--repeat 200]
+
+The table is the real FOOD_DB padded with synthetic foods; descriptions mention a mix of
+real and synthetic foods, with and without quantities. "build" is the one-off compile that
+happens when the table changes; it is not part of the per-call time.
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import food_matcher  # noqa: E402
+import nutrition_extractor as ne  # noqa: E402
+
+BASE_DB = dict(ne.FOOD_DB)
+BASE_SYNONYMS = {k: list(v) for k, v in ne.SYNONYMS.items()}
+
+
+# ---------------- Legacy matcher (matching logic verbatim, unit conversion omitted) ----------------
+
+def legacy_identify_food_key(name, food_db, synonyms):
+    n = name.lower().strip()
+    if n in food_db:
+        return n
+    for k in food_db.keys():
+        if n == k or n in k or k in n:
+            return k
+    for canon, syns in synonyms.items():
+        if n in syns:
+            for k in food_db.keys():
+                if canon in k:
+                    return k
+    return None
+
+
+def legacy_find_food_matches(description, food_db, synonyms):
+    desc = description.lower()
+    matches = []
+    pattern = r"(\d+(?:[.,]\d+)?)\s*(g|grams|gram|kg|cup|cups|tbsp|tablespoon|tsp|slice|slices|piece|pieces|oz|ounce|ounces)?\s*(of\s+)?([a-zA-Z\s]+?)(?:$|,|\band\b|\.)"
+    for m in re.finditer(pattern, desc):
+        num_s = m.group(1)
+        raw_food = m.group(4).strip()
+        try:
+            float(num_s.replace(",", "."))
+        except Exception:
+            continue
+        food_key = legacy_identify_food_key(raw_food, food_db, synonyms)
+        if food_key:
+            matches.append({"food_key": food_key, "raw": raw_food, "quantity_g": None, "count": None})
+    for k in food_db.keys():
+        if k in desc and not any(m["food_key"] == k for m in matches):
+            matches.append({"food_key": k, "raw": k, "quantity_g": None, "count": None})
+    for group in synonyms.values():
+        for syn in group:
+            if syn in desc:
+                fk = legacy_identify_food_key(syn, food_db, synonyms)
+                if fk and not any(m["food_key"] == fk for m in matches):
+                    matches.append({"food_key": fk, "raw": syn, "quantity_g": None, "count": None})
+    return matches
+
+
+# ---------------- Inputs ----------------
+
+_SYLLABLES = ["ka", "lo", "mi", "ra", "zu", "ne", "to", "pi", "sa", "vo", "qu", "de"]
+
+
+def synthetic_table(size, rnd):
+    food_db = dict(BASE_DB)
+    while len(food_db) < size:
+        name = "".join(rnd.choice(_SYLLABLES) for _ in range(rnd.randint(2, 4)))
+        if rnd.random() < 0.3:
+            name += " " + "".join(rnd.choice(_SYLLABLES) for _ in range(2))
+        food_db[name] = {"per_100g": {"calories": 100, "protein": 5, "carbs": 10, "fat": 3}}
+    return food_db
+
+
+def descriptions(food_db, rnd, count=20):
+    names = list(food_db)
+    out = []
+    for _ in range(count):
+        parts = []
+        for _ in range(rnd.randint(3, 8)):
+            name = rnd.choice(names)
+            parts.append(f"{rnd.randint(1, 300)}g {name}" if rnd.random() < 0.5 else f"some {name}")
+        out.append("For lunch I had " + ", ".join(parts) + " and a glass of water.")
+    return out
+
+
+def best_per_call(fn, texts, repeat):
+    best = None
+    for _ in range(max(1, repeat // len(texts))):
+        t = time.perf_counter()
+        for text in texts:
+            fn(text)
+        elapsed = (time.perf_counter() - t) / len(texts)
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def fmt(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f}us"
+    return f"{seconds * 1e3:.2f}ms"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="16,256,4096")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    rnd = random.Random(7)
+
+    print(f"{'foods':>7}{'build':>12}{'legacy':>12}{'automaton':>12}{'speedup':>10}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        food_db = synthetic_table(size, rnd)
+        texts = descriptions(food_db, rnd)
+        ne.FOOD_DB = food_db
+
+        t = time.perf_counter()
+        ne.find_food_matches(texts[0])          # first call compiles the automaton
+        build = time.perf_counter() - t
+
+        legacy = best_per_call(lambda d: legacy_find_food_matches(d, food_db, BASE_SYNONYMS), texts, args.repeat)
+        automaton = best_per_call(ne.find_food_matches, texts, args.repeat)
+        print(f"{len(food_db):>7}{fmt(build):>12}{fmt(legacy):>12}{fmt(automaton):>12}{legacy / automaton:>9.1f}x", flush=True)
+
+    ne.FOOD_DB = BASE_DB
+    print(f"automaton builds: {food_matcher.stats()['builds']} (one per table)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+bench_fuzzy_index.py
+
+Micro-benchmark: typo-tolerant name lookup with fuzzy_index (word trigram index, bounded
+edit distance) versus a brute-force scan that computes the bounded distance to every name,
+as the table grows.
+
+Run from backend/:
+    python benchmarks/bench_fuzzy_index.py [--sizes 1000,10000,100000] [--queries 200]
+
+Names are synthetic 1-3 word phrases over a vocabulary that grows with the table (as real
+food tables do); each query is a name with one or two typos (substitution, deletion,
+insertion or swapped neighbours). "found" is the share of queries that got their name back.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fuzzy_index  # noqa: E402
+
+_LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def synthetic_names(size, rnd):
+    vocab = ["".join(rnd.choice(_LETTERS) for _ in range(rnd.randint(4, 10))) for _ in range(max(50, size // 4))]
+    names = set()
+    while len(names) < size:
+        names.add(" ".join(rnd.choice(vocab) for _ in range(rnd.randint(1, 3))))
+    return list(names)
+
+
+def typo(text, rnd):
+    chars = list(text)
+    i = rnd.randrange(len(chars) - 1)
+    op = rnd.random()
+    if op < 0.25:
+        chars[i] = rnd.choice(_LETTERS)
+    elif op < 0.5:
+        del chars[i]
+    elif op < 0.75:
+        chars.insert(i, rnd.choice(_LETTERS))
+    else:
+        chars[i], chars[i + 1] = chars[i + 1], chars[i]
+    return "".join(chars)
+
+
+def brute_force(names, query):
+    k = fuzzy_index.edit_budget(query)
+    best = None
+    for name in names:
+        d = fuzzy_index.bounded_levenshtein(query, name, k)
+        if d is not None and (best is None or d < best[0]):
+            best = (d, name)
+    return best[1] if best else None
+
+
+def fmt(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f}us"
+    return f"{seconds * 1e3:.2f}ms"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    rnd = random.Random(5)
+
+    print(f"{'names':>8}{'build':>10}{'index':>12}{'brute':>12}{'speedup':>10}{'found':>8}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        names = synthetic_names(size, rnd)
+        targets = [rnd.choice([n for n in rnd.sample(names, 10) if len(n) >= 9] or names[:1]) for _ in range(args.queries)]
+        queries = [typo(t, rnd) for t in targets]
+
+        t = time.perf_counter()
+        index = fuzzy_index.FoodIndex({n: n for n in names})
+        build = time.perf_counter() - t
+
+        t = time.perf_counter()
+        found = [index._lookup(q) for q in queries]     # unmemoised, as for a first sighting
+        per_index = (time.perf_counter() - t) / len(queries)
+
+        sample = queries[:max(1, min(len(queries), 2_000_000 // size))]
+        t = time.perf_counter()
+        for q in sample:
+            brute_force(names, q)
+        per_brute = (time.perf_counter() - t) / len(sample)
+
+        hit = sum(f == target for f, target in zip(found, targets)) / len(queries)
+        print(f"{size:>8}{build:>9.2f}s{fmt(per_index):>12}{fmt(per_brute):>12}{per_brute / per_index:>9.0f}x{hit:>8.0%}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+bench_json_extract.py
+
+Micro-benchmark: the regex JSON extractors previously used by recipe_extractor / diet_plan
+and fridge versus llm_json.parse_json_from_text, on multi-kilobyte adversarial model output.
+
+Run from backend/:
+    python benchmarks/bench_json_extract.py [--sizes 4096,16384,65536] [--repeat 3]
+
+Each measurement runs in a child process with a time cap (--cap seconds); a capped run is
+reported as ">cap" because a backtracking regex holds the GIL and cannot be interrupted,
+so it would otherwise pin the benchmark the same way it pins a request thread.
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import multiprocessing as mp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_json  # noqa: E402
+
+
+# ---------------- Legacy extractors (verbatim logic, for comparison) ----------------
+
+def legacy_object_parser(text):
+    """recipe_extractor / diet_plan before the shared extractor"""
+    try:
+        return json.loads(text)
+    except Exception:
+        m = re.search(r"(\{(?:.|\n)*\})", text)
+        if m:
+            candidate = m.group(1)
+            try:
+                return json.loads(candidate)
+            except Exception:
+                try:
+                    return json.loads(candidate.replace("'", '"'))
+                except Exception:
+                    pass
+    return None
+
+
+def legacy_array_parser(text):
+    """fridge before the shared extractor"""
+    text = text.strip()
+    try:
+        return json.loads(text)
+    except Exception:
+        pass
+    try:
+        match = re.search(r'\[[^]]*\][^]]*\]', text)
+        if not match:
+            match = re.search(r'\[.*\]', text, re.DOTALL)
+        if match:
+            return json.loads(match.group(0))
+    except Exception:
+        pass
+    return None
+
+
+# ---------------- Adversarial inputs ----------------
+
+def make_inputs(size):
+    recipe = json.dumps({"title": "Dal", "ingredients": [{"name": "lentils", "quantity": "1", "unit": "cup"}]})
+    filler = ("The dish uses { braces and [ brackets in prose. " * (size // 48 + 1))[:size]
+    return {
+        "unclosed braces": "{" * size,
+        "unclosed brackets": "[" * size,
+        "brackets, no closer": "[a" * (size // 2) + "]",
+        "prose + object": filler + recipe,
+        "object + trailing prose": recipe + filler,
+        "truncated object": recipe[:-1] + ', "instructions": ["' + "stir " * (size // 5),
+        "many small objects": ('{"a": 1} x ' * (size // 11 + 1))[:size],
+        "whitespace run": '{"a": 1' + " " * size + "x",
+    }
+
+
+def _measure(fn, text, repeat, out):
+    best = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn(text)
+        s = time.perf_counter() - t
+        best = s if best is None else min(best, s)
+    out.put(best)
+
+
+def timed(fn, text, repeat, cap):
+    """Best of `repeat` runs, or None when the runs did not finish within `cap` seconds."""
+    out = mp.Queue()
+    child = mp.Process(target=_measure, args=(fn, text, repeat, out), daemon=True)
+    child.start()
+    child.join(cap)
+    if child.is_alive():
+        child.terminate()
+        child.join()
+        return None
+    return out.get()
+
+
+def fmt(seconds, cap):
+    if seconds is None:
+        return f">{cap:g}s"
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.0f}us"
+    return f"{seconds * 1e3:.1f}ms"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="4096,16384,65536")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--cap", type=float, default=5.0)
+    args = parser.parse_args()
+
+    contenders = [
+        ("regex {..}", legacy_object_parser),
+        ("regex [..]", legacy_array_parser),
+        ("llm_json", llm_json.parse_json_from_text),
+    ]
+    print(f"{'input':<26}{'bytes':>8}" + "".join(f"{name:>14}" for name, _ in contenders))
+    for size in [int(s) for s in args.sizes.split(",")]:
+        for label, text in make_inputs(size).items():
+            row = f"{label:<26}{len(text):>8}"
+            for _, fn in contenders:
+                row += f"{fmt(timed(fn, text, args.repeat, args.cap), args.cap):>14}"
+            print(row, flush=True)
+
+
+if __name__ == "__main__":
+    main()
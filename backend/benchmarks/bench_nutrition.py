@@ -0,0 +1,257 @@
+"""
+bench_nutrition.py
+
+Regression benchmark for the nutrition_extractor hot path. It measures ops/s, p50/p99
+latency and peak memory (tracemalloc) of:
+- find_food_matches   one call per description
+- estimate_item       one call per matched food
+- aggregate           one call per description (its estimated items)
+- request             POST /api/analyze-nutrition through Flask's test client
+
+The corpus is generated from a fixed seed. It has thousands of meal logs with:
+- quantities (integers, decimals, decimal commas) and unit spellings ("g", "grams", "2 cups")
+- synonyms, plurals and capitalisation
+- typos in food names
+- foods the table does not know, filler words and repeats
+
+Results are compared with a stored baseline (JSON). The baseline is written on the first
+run, or with --update-baseline. The comparison flags an operation when its throughput drops,
+or its p50 or peak memory grows, by more than --tolerance. p99 is reported but not gated: a
+handful of slow calls (GC, a busy neighbour) move it too much between identical runs. With
+--check the exit code is 1 on any regression (for CI). Baselines are only comparable on the same machine, corpus and
+nutrient database; the stored meta shows what they were taken with.
+
+The memo in front of text analyses (nutrition_memo) is disabled unless --memo is given:
+otherwise repeats in the corpus would measure cache hits, not the estimator.
+
+Run from backend/:
+    python benchmarks/bench_nutrition.py [--size 3000] [--repeat 3] [--baseline PATH]
+                                         [--update-baseline] [--check] [--tolerance 0.2] [--memo]
+"""
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import tracemalloc
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+
+import nutrition_extractor as ne  # noqa: E402
+import nutrition_memo  # noqa: E402
+import nutrient_db  # noqa: E402
+import fuzzy_index  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline_nutrition.json")
+SEED = 25
+
+# unit spelling -> plausible amounts for it
+_WEIGHTS = [30, 50, 80, 100, 120, 150, 200, 250, 300]
+_SPOONS = ["1", "2", "1.5", "0.5", "3"]
+_COUNTS = ["1", "1", "2", "2", "3", "4"]
+_UNITS = {
+    "g": _WEIGHTS, " g": _WEIGHTS, " grams": _WEIGHTS, " gram": _WEIGHTS,
+    "kg": ["0.5", "1", "0,25", "1.2"],
+    " cup": ["1", "0.5", "1,5"], " cups": ["2", "1.5", "0.75"],
+    " tbsp": _SPOONS, " tablespoon": _SPOONS, " tsp": _SPOONS,
+    " slice": ["1"], " slices": _COUNTS[2:], " piece": ["1"], " pieces": _COUNTS[2:],
+    " oz": ["3", "4", "6", "8", "2.5"], " ounces": ["4", "6", "8"],
+    "": _COUNTS,
+}
+_JOINERS = [", ", ", ", " and ", " with ", "; ", " + ", ". "]
+_UNKNOWN = ["quinoa", "hummus", "kimchi", "sourdough", "falafel", "granola", "paneer", "miso soup"]
+_FILLER = ["for lunch", "for breakfast", "after the gym", "late snack", "with a little salt",
+           "and a glass of water", "at the canteen", "homemade", "leftovers", ""]
+_LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def _typo(word, rnd):
+    if len(word) < 5:
+        return word
+    chars = list(word)
+    i = rnd.randrange(1, len(chars) - 1)
+    op = rnd.random()
+    if op < 0.3:
+        chars[i] = rnd.choice(_LETTERS)
+    elif op < 0.6:
+        del chars[i]
+    elif op < 0.8:
+        chars.insert(i, chars[i])
+    else:
+        chars[i], chars[i + 1] = chars[i + 1], chars[i]
+    return "".join(chars)
+
+
+def corpus(size, rnd):
+    foods = list(ne.FOOD_DB) + [s for group in ne.SYNONYMS.values() for s in group]
+    foods += [f + "s" for f in ne.FOOD_DB if not f.endswith("s")]
+    texts = []
+    for _ in range(size):
+        if texts and rnd.random() < 0.2:        # people log the same meals again
+            texts.append(rnd.choice(texts))
+            continue
+        parts = []
+        for _ in range(rnd.randint(1, 5)):
+            food = rnd.choice(_UNKNOWN) if rnd.random() < 0.1 else rnd.choice(foods)
+            if rnd.random() < 0.1:
+                food = " ".join(_typo(w, rnd) for w in food.split())
+            if rnd.random() < 0.15:
+                food = food.title()
+            if rnd.random() < 0.65:
+                unit = rnd.choice(list(_UNITS) + [""] * 4)
+                amount = rnd.choice(_UNITS[unit])
+                food = f"{amount}{unit}{' of' if unit and rnd.random() < 0.2 else ''} {food}"
+            parts.append(food)
+        text = parts[0]
+        for part in parts[1:]:
+            text += rnd.choice(_JOINERS) + part
+        filler = rnd.choice(_FILLER)
+        texts.append(f"{text} {filler}".strip() if rnd.random() < 0.5 else text)
+    return texts
+
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def measure(calls, repeat, reset):
+    """
+    calls: zero-argument callables, one per operation; timed one by one, `repeat` passes
+    after a warm-up pass. reset() runs before the warm-up and before the memory pass.
+    """
+    reset()
+    for call in calls:
+        call()
+    samples = []
+    for _ in range(repeat):
+        for call in calls:
+            t = time.perf_counter_ns()
+            call()
+            samples.append(time.perf_counter_ns() - t)
+    samples.sort()
+    # peak memory in a separate pass from the same state: tracing slows every allocation down
+    reset()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    for call in calls:
+        call()
+    peak = tracemalloc.get_traced_memory()[1] - start
+    tracemalloc.stop()
+    return {
+        "calls": len(samples),
+        "ops_per_sec": round(len(samples) / (sum(samples) / 1e9), 1),
+        "p50_us": round(_percentile(samples, 0.50) / 1e3, 2),
+        "p99_us": round(_percentile(samples, 0.99) / 1e3, 2),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def _change(now, before):
+    return (now - before) / before if before else 0.0
+
+
+def compare(results, baseline, tolerance):
+    """Prints current vs baseline per operation; returns the names of the regressed operations."""
+    regressed = []
+    print(f"\nvs baseline taken {baseline['meta'].get('created', '?')} (tolerance {tolerance:.0%})")
+    print(f"{'operation':<20}{'ops/s':>12}{'p50':>10}{'p99':>10}{'peak':>10}")
+    for name, now in results.items():
+        before = baseline["results"].get(name)
+        if before is None:
+            print(f"{name:<20}{'(not in baseline)':>42}")
+            continue
+        ops = _change(now["ops_per_sec"], before["ops_per_sec"])
+        p50 = _change(now["p50_us"], before["p50_us"])
+        p99 = _change(now["p99_us"], before["p99_us"])
+        peak = _change(now["peak_kib"], before["peak_kib"])
+        worse = ops < -tolerance or p50 > tolerance or peak > tolerance
+        if worse:
+            regressed.append(name)
+        print(f"{name:<20}{ops:>+12.1%}{p50:>+10.1%}{p99:>+10.1%}{peak:>+10.1%}{'   REGRESSION' if worse else ''}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=3000, help="descriptions in the corpus")
+    parser.add_argument("--repeat", type=int, default=3, help="timed passes over the corpus")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--memo", action="store_true", help="keep the description memo enabled")
+    args = parser.parse_args()
+
+    nutrition_memo.MEMO_ENABLED = args.memo
+    app = Flask(__name__)
+    app.register_blueprint(ne.bp, url_prefix="/api")
+    ne.init_app(app)
+    client = app.test_client()
+    db = nutrient_db.get_db()
+    if db is not None:
+        while not fuzzy_index.is_ready("nutrient_db", db.identity):     # the typo index builds in the background
+            time.sleep(0.05)
+    ne.find_food_matches("warm-up")             # compile the matcher outside the timings
+
+    texts = corpus(args.size, random.Random(SEED))
+    matches = [ne.find_food_matches(t) for t in texts]
+    items = [m for found in matches for m in found]
+    identified = [[ne.estimate_item(m) for m in found] for found in matches]
+    identified = [group for group in identified if group]
+
+    def reset():
+        ne.NUTRITION_STORE.clear()
+        nutrition_memo.memo.clear()
+
+    def request(text):
+        r = client.post("/api/analyze-nutrition", json={"description": text})
+        assert r.status_code == 200, r.get_json()
+
+    print(f"corpus: {len(texts)} descriptions ({len(set(texts))} distinct), {len(items)} matched foods, "
+          f"{sum(not found for found in matches)} without a match")
+    print(f"{'operation':<20}{'calls':>9}{'ops/s':>12}{'p50 us':>10}{'p99 us':>10}{'peak KiB':>11}")
+    results = {}
+    for name, calls in [
+        ("find_food_matches", [lambda t=t: ne.find_food_matches(t) for t in texts]),
+        ("estimate_item", [lambda m=m: ne.estimate_item(m) for m in items]),
+        ("aggregate", [lambda g=g: ne.aggregate(g) for g in identified]),
+        ("request", [lambda t=t: request(t) for t in texts]),
+    ]:
+        r = results[name] = measure(calls, args.repeat, reset)
+        print(f"{name:<20}{r['calls']:>9}{r['ops_per_sec']:>12,.0f}{r['p50_us']:>10.1f}{r['p99_us']:>10.1f}{r['peak_kib']:>11.1f}", flush=True)
+
+    meta = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "corpus": args.size,
+        "seed": SEED,
+        "repeat": args.repeat,
+        "memo": args.memo,
+        "nutrient_db_rows": nutrient_db.stats().get("rows", 0),
+    }
+    if args.update_baseline or not os.path.exists(args.baseline):
+        with open(args.baseline, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+            f.write("\n")
+        print(f"\nbaseline written to {args.baseline}")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    differs = {k: (baseline["meta"].get(k), v) for k, v in meta.items()
+               if k not in ("created", "repeat") and baseline["meta"].get(k) != v}
+    if differs:
+        print("\nwarning: baseline taken with different settings: " + ", ".join(f"{k} {a} -> {b}" for k, (a, b) in differs.items()))
+    regressed = compare(results, baseline, args.tolerance)
+    if regressed and args.check:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
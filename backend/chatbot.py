@@ -3,13 +3,17 @@ import os
 import json
 import base64
 import requests
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from flask_cors import cross_origin
 import logging
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterator, Optional
 import re
 import time
 import io
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FutureTimeoutError
+import llm_gateway
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -18,104 +22,262 @@ logger = logging.getLogger(__name__)
 # Create Flask blueprint
 chatbot_bp = Blueprint('chatbot', __name__)
 
+# Hedged requests: if the primary provider has not answered after the hedge delay, the
+# secondary is fired too and whichever answers first wins (the loser is ignored).
+# CHATBOT_HEDGE_DELAY_MS="auto" uses the observed p95 latency of the primary provider.
+def _parse_hedge_delay(raw: str) -> Optional[float]:
+    """Fixed hedge delay in ms, or None for "auto" (also used when the value is not a number)"""
+    if raw.strip().lower() == 'auto':
+        return None
+    try:
+        return max(0.0, float(raw))
+    except ValueError:
+        logger.error(f"CHATBOT_HEDGE_DELAY_MS={raw!r} is neither a number nor 'auto'; using auto")
+        return None
+
+
+HEDGE_ENABLED = os.getenv('CHATBOT_HEDGE_ENABLED', '1') == '1'
+HEDGE_DELAY_MS = _parse_hedge_delay(os.getenv('CHATBOT_HEDGE_DELAY_MS', 'auto'))
+HEDGE_DEFAULT_DELAY_MS = float(os.getenv('CHATBOT_HEDGE_DEFAULT_DELAY_MS', '1500'))
+HEDGE_PERCENTILE = float(os.getenv('CHATBOT_HEDGE_PERCENTILE', '95'))
+HEDGE_MIN_SAMPLES = 20
+_hedge_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('CHATBOT_HEDGE_WORKERS', '16')),
+    thread_name_prefix='chat-hedge'
+)
+
+class HedgeMetrics:
+    """Rolling per-provider latencies and hedge outcome counters (exposed on /health)"""
+    
+    def __init__(self, window: int = 200):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, deque] = {}
+        self.window = window
+        self.counters = {
+            'hedged_requests': 0,
+            'hedges_fired': 0,
+            'primary_wins': 0,
+            'secondary_wins': 0,
+            'failovers': 0,
+            'all_failed': 0,
+        }
+    
+    def count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+    
+    def record_latency(self, provider: str, seconds: float):
+        with self._lock:
+            self.latencies.setdefault(provider, deque(maxlen=self.window)).append(seconds)
+    
+    def percentile(self, provider: str, pct: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self.latencies.get(provider, ()))
+        if not samples:
+            return None
+        idx = min(len(samples) - 1, int(round(pct / 100.0 * (len(samples) - 1))))
+        return samples[idx]
+    
+    def hedge_delay(self, primary: str) -> float:
+        """Seconds to wait on the primary before firing the secondary"""
+        if HEDGE_DELAY_MS is not None:
+            return HEDGE_DELAY_MS / 1000.0
+        with self._lock:
+            enough = len(self.latencies.get(primary, ())) >= HEDGE_MIN_SAMPLES
+        if not enough:
+            return HEDGE_DEFAULT_DELAY_MS / 1000.0
+        return self.percentile(primary, HEDGE_PERCENTILE)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+            providers = list(self.latencies.keys())
+        return {
+            'enabled': HEDGE_ENABLED,
+            'delay_ms': 'auto' if HEDGE_DELAY_MS is None else HEDGE_DELAY_MS,
+            **counters,
+            'latency_ms': {
+                p: {
+                    'p50': round((self.percentile(p, 50) or 0) * 1000, 1),
+                    'p95': round((self.percentile(p, 95) or 0) * 1000, 1),
+                    'samples': len(self.latencies.get(p, ())),
+                }
+                for p in providers
+            },
+            'current_delay_ms': {p: round(self.hedge_delay(p) * 1000, 1) for p in providers},
+        }
+
+class StreamInterrupted(RuntimeError):
+    """A provider failed after part of the reply had already been streamed to the client"""
+
+
 class AIService:
     """Unified AI service handler with proper error handling"""
     
     def __init__(self):
         self.clients = {}
+        self.metrics = HedgeMetrics()
         self.setup_clients()
     
     def setup_clients(self):
-        """Setup all available AI clients"""
-        # Gemini
-        gemini_key = os.getenv('GEMINI_API_KEY')
-        if gemini_key:
-            try:
-                import google.generativeai as genai
-                GEMINI_AVAILABLE = True
-
-            except ImportError as e:
-                GEMINI_AVAILABLE = False
-                print(f"❌ Gemini import failed: {e}")
-        
-        # Groq
-        groq_key = os.getenv('GROQ_API_KEY')
-        if groq_key:
-            try:
-                from groq import Groq
-                self.clients['groq'] = Groq(api_key=groq_key)
-                logger.info("✅ Groq client initialized")
-            except Exception as e:
-                logger.error(f"❌ Groq setup failed: {e}")
-        
-        # OpenAI (fallback)
-        openai_key = os.getenv('OPENAI_API_KEY')
-        if openai_key:
-            try:
-                import openai
-                openai.api_key = openai_key
-                self.clients['openai'] = openai
-                logger.info("✅ OpenAI client initialized")
-            except Exception as e:
-                logger.error(f"❌ OpenAI setup failed: {e}")
+        """Register the providers available through the shared LLM gateway"""
+        for provider in llm_gateway.available_providers():
+            self.clients[provider] = llm_gateway.get_client(provider)
+            logger.info(f"✅ {provider} client ready")
     
     def get_response(self, prompt: str) -> str:
-        """Get response from available AI services"""
-        # Try Gemini first
-        if 'gemini' in self.clients:
+        """Get response from available AI services, healthiest first (open breakers are skipped)"""
+        providers = [name for name in llm_gateway.provider_order(('gemini', 'groq', 'openai')) if name in self.clients]
+        
+        remaining = providers
+        if HEDGE_ENABLED and len(providers) >= 2:
+            result = self._hedged_response(prompt, providers[0], providers[1])
+            if result is not None:
+                return result
+            remaining = providers[2:]
+        
+        for name in remaining:
             try:
-                return self._get_gemini_response(prompt)
+                return self._call_provider(name, prompt)
             except Exception as e:
-                logger.error(f"Gemini request failed: {e}")
+                logger.error(f"{name} request failed: {e}")
         
-        # Try Groq second
-        if 'groq' in self.clients:
+        # Final fallback
+        return self._get_fallback_response(prompt)
+    
+    def _call_provider(self, name: str, prompt: str) -> str:
+        """Call one provider and record its latency for hedge-delay tuning (cache hits are not provider latency)"""
+        handlers = {
+            'gemini': self._get_gemini_response,
+            'groq': self._get_groq_response,
+            'openai': self._get_openai_response,
+        }
+        start = time.time()
+        result = handlers[name](prompt)
+        if not llm_gateway.served_from_cache():
+            self.metrics.record_latency(name, time.time() - start)
+        return result
+    
+    def _hedged_response(self, prompt: str, primary: str, secondary: str) -> Optional[str]:
+        """Race primary against a delayed secondary; None when both fail"""
+        self.metrics.count('hedged_requests')
+        primary_future = _hedge_executor.submit(self._call_provider, primary, prompt)
+        try:
+            result = primary_future.result(timeout=self.metrics.hedge_delay(primary))
+            self.metrics.count('primary_wins')
+            return result
+        except FutureTimeoutError:
+            pass
+        except Exception as e:
+            # Primary failed before the hedge delay: plain failover, no race needed
+            logger.error(f"{primary} request failed: {e}")
+            self.metrics.count('failovers')
             try:
-                return self._get_groq_response(prompt)
-            except Exception as e:
-                logger.error(f"Groq request failed: {e}")
+                return self._call_provider(secondary, prompt)
+            except Exception as e2:
+                logger.error(f"{secondary} request failed: {e2}")
+                self.metrics.count('all_failed')
+                return None
         
-        # Try OpenAI as fallback
-        if 'openai' in self.clients:
+        self.metrics.count('hedges_fired')
+        logger.info(f"Hedging {primary} with {secondary}")
+        pending = {
+            primary_future: primary,
+            _hedge_executor.submit(self._call_provider, secondary, prompt): secondary,
+        }
+        while pending:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"{name} request failed: {e}")
+                    continue
+                self.metrics.count('primary_wins' if name == primary else 'secondary_wins')
+                for loser in pending:
+                    loser.cancel()  # no-op if already running; its result is ignored
+                return result
+        self.metrics.count('all_failed')
+        return None
+    
+    def stream_response(self, prompt: str) -> Iterator[str]:
+        """Stream a response; move to the next provider only if nothing was emitted yet"""
+        streams = {
+            'gemini': self._stream_gemini_response,
+            'groq': self._stream_groq_response,
+            'openai': self._stream_openai_response,
+        }
+        for name in llm_gateway.provider_order(streams.keys()):
+            if name not in self.clients:
+                continue
+            open_stream = streams[name]
+            emitted = False
             try:
-                return self._get_openai_response(prompt)
+                for piece in open_stream(prompt):
+                    if piece:
+                        emitted = True
+                        yield piece
+                return
             except Exception as e:
-                logger.error(f"OpenAI request failed: {e}")
+                logger.error(f"{name} stream failed: {e}")
+                if emitted:
+                    raise StreamInterrupted(f"{name} stream failed mid-reply: {e}") from e
         
         # Final fallback
-        return self._get_fallback_response(prompt)
+        yield self._get_fallback_response(prompt)
+    
+    def _stream_gemini_response(self, prompt: str) -> Iterator[str]:
+        return llm_gateway.call_gemini_text_stream(prompt, cache="chatbot")
+    
+    def _stream_groq_response(self, prompt: str) -> Iterator[str]:
+        return llm_gateway.groq_chat_stream(
+            messages=[{"role": "user", "content": prompt}],
+            model="llama3-8b-8192",
+            cache="chatbot",
+            temperature=0.7,
+            max_tokens=1500
+        )
+    
+    def _stream_openai_response(self, prompt: str) -> Iterator[str]:
+        return llm_gateway.openai_chat_stream(
+            model="gpt-3.5-turbo",
+            messages=[{"role": "user", "content": prompt}],
+            cache="chatbot",
+            max_tokens=1500,
+            temperature=0.7
+        )
     
     def _get_gemini_response(self, prompt: str) -> str:
         """Get response from Gemini"""
         try:
-            response = self.clients['gemini'].generate_content(prompt)
-            return response.text
+            return llm_gateway.call_gemini_text(prompt, cache="chatbot")
         except Exception as e:
             raise Exception(f"Gemini error: {e}")
     
     def _get_groq_response(self, prompt: str) -> str:
         """Get response from Groq"""
         try:
-            response = self.clients['groq'].chat.completions.create(
+            return llm_gateway.groq_chat(
                 messages=[{"role": "user", "content": prompt}],
                 model="llama3-8b-8192",
+                cache="chatbot",
                 temperature=0.7,
                 max_tokens=1500
             )
-            return response.choices[0].message.content
         except Exception as e:
             raise Exception(f"Groq error: {e}")
     
     def _get_openai_response(self, prompt: str) -> str:
         """Get response from OpenAI"""
         try:
-            response = self.clients['openai'].ChatCompletion.create(
+            return llm_gateway.openai_chat(
                 model="gpt-3.5-turbo",
                 messages=[{"role": "user", "content": prompt}],
+                cache="chatbot",
                 max_tokens=1500,
                 temperature=0.7
             )
-            return response.choices[0].message.content
         except Exception as e:
             raise Exception(f"OpenAI error: {e}")
     
@@ -144,6 +306,35 @@ class BaseAgent:
     def __init__(self, ai_service: AIService):
         self.ai_service = ai_service
     
+    def canned_response(self, prompt: str) -> Optional[str]:
+        """Pre-written answer for common questions, or None to ask the AI service"""
+        return None
+    
+    def build_prompt(self, prompt: str, context: str = "", intent: str = "") -> str:
+        """Agent-specific prompt sent to the AI service"""
+        raise NotImplementedError
+    
+    def process_query(self, prompt: str, context: str = "", intent: str = "") -> str:
+        canned = self.canned_response(prompt)
+        if canned is not None:
+            return canned
+        return self._get_ai_response(self.build_prompt(prompt, context, intent))
+    
+    def stream_query(self, prompt: str, context: str = "", intent: str = "") -> Iterator[str]:
+        """Streaming twin of process_query: canned answers are emitted at once, AI answers token by token"""
+        canned = self.canned_response(prompt)
+        if canned is not None:
+            yield canned
+            return
+        base_prompt = self.build_prompt(prompt, context, intent)
+        try:
+            yield from self.ai_service.stream_response(base_prompt)
+        except StreamInterrupted:
+            raise  # part of the reply is out: a fallback answer appended to it would read as one reply
+        except Exception as e:
+            logger.error(f"AI service stream error in {self.__class__.__name__}: {e}")
+            yield self._get_fallback_response(prompt)
+    
     def _get_ai_response(self, prompt: str) -> str:
         """Get response from AI service with proper error handling"""
         try:
@@ -159,7 +350,7 @@ class BaseAgent:
 class NutritionExpertAgent(BaseAgent):
     """Specialized agent for nutrition questions"""
     
-    def process_query(self, prompt: str, context: str = "", intent: str = "") -> str:
+    def build_prompt(self, prompt: str, context: str = "", intent: str = "") -> str:
         base_prompt = f"""
         You are a certified nutritionist and dietitian with 15 years of experience. 
         Provide scientifically accurate, practical nutrition advice.
@@ -179,12 +370,12 @@ class NutritionExpertAgent(BaseAgent):
         Current question: {prompt}
         """
         
-        return self._get_ai_response(base_prompt)
+        return base_prompt
 
 class RecipeSpecialistAgent(BaseAgent):
     """Specialized agent for recipe-related questions"""
     
-    def process_query(self, prompt: str, context: str = "", intent: str = "") -> str:
+    def canned_response(self, prompt: str) -> Optional[str]:
         # Special handling for specific recipe requests
         prompt_lower = prompt.lower()
         
@@ -196,7 +387,9 @@ class RecipeSpecialistAgent(BaseAgent):
             return self._get_salad_recipe()
         elif 'curry' in prompt_lower:
             return self._get_curry_recipe()
-        
+        return None
+    
+    def build_prompt(self, prompt: str, context: str = "", intent: str = "") -> str:
         base_prompt = f"""
         You are a master chef and recipe developer with expertise in global cuisines. 
         Provide detailed, tested recipes and cooking guidance.
@@ -216,7 +409,7 @@ class RecipeSpecialistAgent(BaseAgent):
         For recipe requests, provide a complete recipe.
         """
         
-        return self._get_ai_response(base_prompt)
+        return base_prompt
     
     def _get_ice_cream_recipe(self) -> str:
         return """
@@ -305,7 +498,7 @@ Enjoy! 🍨
 class FoodSafetyAgent(BaseAgent):
     """Specialized agent for food safety questions"""
     
-    def process_query(self, prompt: str, context: str = "", intent: str = "") -> str:
+    def canned_response(self, prompt: str) -> Optional[str]:
         # Special handling for common food safety questions
         prompt_lower = prompt.lower()
         
@@ -315,7 +508,9 @@ class FoodSafetyAgent(BaseAgent):
             return self._get_expired_food_safety()
         elif any(word in prompt_lower for word in ['milk', 'soda', 'sprite', 'mix']):
             return self._get_milk_soda_safety()
-        
+        return None
+    
+    def build_prompt(self, prompt: str, context: str = "", intent: str = "") -> str:
         base_prompt = f"""
         You are a food safety expert and microbiologist. Provide accurate food safety information.
 
@@ -334,7 +529,7 @@ class FoodSafetyAgent(BaseAgent):
         Be clear about risks and safe practices.
         """
         
-        return self._get_ai_response(base_prompt)
+        return base_prompt
     
     def _get_chocolate_chilli_safety(self) -> str:
         return """
@@ -396,7 +591,7 @@ class FoodSafetyAgent(BaseAgent):
 class DietPlannerAgent(BaseAgent):
     """Specialized agent for diet planning"""
     
-    def process_query(self, prompt: str, context: str = "", intent: str = "") -> str:
+    def build_prompt(self, prompt: str, context: str = "", intent: str = "") -> str:
         base_prompt = f"""
         You are a certified dietitian specializing in meal planning and dietary strategies.
 
@@ -414,12 +609,12 @@ class DietPlannerAgent(BaseAgent):
         Make it practical and achievable.
         """
         
-        return self._get_ai_response(base_prompt)
+        return base_prompt
 
 class GeneralChefAgent(BaseAgent):
     """General culinary expert for miscellaneous questions"""
     
-    def process_query(self, prompt: str, context: str = "", intent: str = "") -> str:
+    def build_prompt(self, prompt: str, context: str = "", intent: str = "") -> str:
         base_prompt = f"""
         You are an experienced chef and culinary instructor. Provide helpful cooking advice.
 
@@ -430,7 +625,7 @@ class GeneralChefAgent(BaseAgent):
         Format with clear sections using **bold** text.
         """
         
-        return self._get_ai_response(base_prompt)
+        return base_prompt
 
 class IntentDetector:
     """Advanced intent detection with food-specific patterns"""
@@ -518,39 +713,105 @@ class AIServiceOrchestrator:
         except Exception as e:
             logger.error(f"Agent error for intent '{intent}': {e}")
             return f"🧑‍🔬 **Culinary Assistant**\n\nI encountered an issue processing your request. Please try again or rephrase your question.\n\nError: {str(e)}"
+    
+    def stream_to_agent(self, prompt: str, intent: str, context: str = "") -> Iterator[str]:
+        """Streaming twin of route_to_agent"""
+        agent = self.agents.get(intent, self.agents['general_query'])
+        
+        try:
+            yield from agent.stream_query(prompt, context, intent)
+        except StreamInterrupted:
+            raise
+        except Exception as e:
+            logger.error(f"Agent stream error for intent '{intent}': {e}")
+            yield f"🧑‍🔬 **Culinary Assistant**\n\nI encountered an issue processing your request. Please try again or rephrase your question.\n\nError: {str(e)}"
 
 # Initialize the orchestrator
 ai_orchestrator = AIServiceOrchestrator()
 
+# Frontend screens to suggest for certain intents
+INTENT_REDIRECTS = {
+    'nutrition_analysis': 'extract-nutrition',
+    'recipe_request': 'extract-recipe', 
+}
+
+def _read_chat_message():
+    """Validate the chat request body; returns (message, language, error_response)"""
+    if not request.is_json:
+        return None, None, (jsonify({
+            'success': False,
+            'error': 'Request must be JSON'
+        }), 400)
+        
+    data = request.get_json()
+    if not data:
+        return None, None, (jsonify({
+            'success': False,
+            'error': 'No JSON data provided'
+        }), 400)
+        
+    message = data.get('message', '').strip()
+    language = data.get('language', 'en')
+    
+    if not message:
+        return None, None, (jsonify({
+            'success': False,
+            'error': 'No message provided'
+        }), 400)
+    return message, language, None
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _stream_chat_response(message: str, intent: str) -> Response:
+    """
+    Server-Sent Events response. Event order:
+      meta  {intent, redirect}        - sent before any AI work, so the first byte is immediate
+      token {text}                    - one per streamed chunk (canned answers arrive as a single token)
+      error {success: false, error}   - only when the provider failed mid-reply: the tokens so far are incomplete
+      done  {success, response_time, time_to_first_token}
+    """
+    def generate():
+        start_time = time.time()
+        yield _sse('meta', {'intent': intent, 'redirect': INTENT_REDIRECTS.get(intent)})
+        first_token_time = None
+        success = True
+        try:
+            for piece in ai_orchestrator.stream_to_agent(message, intent):
+                if not piece:
+                    continue
+                if first_token_time is None:
+                    first_token_time = time.time() - start_time
+                yield _sse('token', {'text': piece})
+        except StreamInterrupted as e:
+            logger.error(f"Chat stream cut off: {e}")
+            success = False
+            yield _sse('error', {'success': False, 'error': 'The response was cut off. Please try again.'})
+        response_time = time.time() - start_time
+        logger.info(f"AI response streamed in {response_time:.2f}s (first token {first_token_time or 0:.2f}s)")
+        yield _sse('done', {
+            'success': success,
+            'response_time': f"{response_time:.2f}s",
+            'time_to_first_token': f"{(first_token_time or response_time):.2f}s",
+        })
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
 @chatbot_bp.route('/message', methods=['POST', 'OPTIONS'])
 @cross_origin()
 def chat_message():
-    """Enhanced chatbot endpoint with agentic architecture"""
+    """Enhanced chatbot endpoint with agentic architecture (streams when Accept: text/event-stream)"""
     try:
         if request.method == 'OPTIONS':
             return jsonify({'status': 'ok'}), 200
             
-        if not request.is_json:
-            return jsonify({
-                'success': False,
-                'error': 'Request must be JSON'
-            }), 400
-            
-        data = request.get_json()
-        if not data:
-            return jsonify({
-                'success': False,
-                'error': 'No JSON data provided'
-            }), 400
-            
-        message = data.get('message', '').strip()
-        language = data.get('language', 'en')
-        
-        if not message:
-            return jsonify({
-                'success': False,
-                'error': 'No message provided'
-            }), 400
+        message, language, error = _read_chat_message()
+        if error:
+            return error
         
         logger.info(f"Received message: {message} in language: {language}")
         
@@ -558,6 +819,9 @@ def chat_message():
         intent = ai_orchestrator.intent_detector.detect(message)
         logger.info(f"Detected intent: {intent}")
         
+        if 'text/event-stream' in request.headers.get('Accept', ''):
+            return _stream_chat_response(message, intent)
+        
         # Generate response using agentic architecture
         start_time = time.time()
         ai_response = ai_orchestrator.route_to_agent(message, intent)
@@ -565,18 +829,10 @@ def chat_message():
         
         logger.info(f"AI response generated in {response_time:.2f}s")
         
-        # Handle redirects based on intent
-        redirect_target = None
-        intent_redirects = {
-            'nutrition_analysis': 'extract-nutrition',
-            'recipe_request': 'extract-recipe', 
-        }
-        redirect_target = intent_redirects.get(intent)
-        
         response_data = {
             'success': True,
             'response': ai_response,
-            'redirect': redirect_target,
+            'redirect': INTENT_REDIRECTS.get(intent),
             'intent': intent,
             'response_time': f"{response_time:.2f}s",
         }
@@ -591,6 +847,30 @@ def chat_message():
             'fallback_response': "I apologize, but I'm experiencing technical difficulties. Please try again in a moment."
         }), 500
 
+@chatbot_bp.route('/message/stream', methods=['POST', 'OPTIONS'])
+@cross_origin()
+def chat_message_stream():
+    """Server-Sent Events variant of /message (see _stream_chat_response for the event format)"""
+    try:
+        if request.method == 'OPTIONS':
+            return jsonify({'status': 'ok'}), 200
+        
+        message, language, error = _read_chat_message()
+        if error:
+            return error
+        
+        logger.info(f"Received streaming message: {message} in language: {language}")
+        intent = ai_orchestrator.intent_detector.detect(message)
+        return _stream_chat_response(message, intent)
+        
+    except Exception as e:
+        logger.error(f"Chat stream error: {e}")
+        return jsonify({
+            'success': False,
+            'error': f'Server error: {str(e)}',
+            'fallback_response': "I apologize, but I'm experiencing technical difficulties. Please try again in a moment."
+        }), 500
+
 @chatbot_bp.route('/health', methods=['GET'])
 @cross_origin()
 def health_check():
@@ -601,6 +881,8 @@ def health_check():
         'status': 'operational',
         'agents': list(ai_orchestrator.agents.keys()),
         'ai_services_available': len(ai_orchestrator.ai_service.clients),
+        'hedging': ai_orchestrator.ai_service.metrics.snapshot(),
+        'providers': llm_gateway.provider_health(),
         'timestamp': time.time()
     })
 
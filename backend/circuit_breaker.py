@@ -0,0 +1,174 @@
+"""
+circuit_breaker.py
+
+Per-provider circuit breakers for the LLM backends, used by llm_gateway.
+
+States:
+- closed     calls flow; outcomes go into a rolling time window
+- open       calls are rejected immediately (CircuitOpenError) for LLM_BREAKER_OPEN_S seconds
+- half_open  after the cool-down a single trial call is let through; success closes the
+             breaker, failure re-opens it
+
+A closed breaker trips when, over at least LLM_BREAKER_MIN_CALLS calls in the window, the
+error rate reaches LLM_BREAKER_ERROR_RATE or the share of calls slower than
+LLM_BREAKER_SLOW_CALL_S reaches LLM_BREAKER_SLOW_RATE.
+
+provider_order() ranks providers by state, then recent error rate, then median latency,
+so callers try the healthiest provider first.
+
+Environment:
+- LLM_BREAKER_WINDOW_S    (default 60)
+- LLM_BREAKER_MIN_CALLS   (default 5)
+- LLM_BREAKER_ERROR_RATE  (default 0.5)
+- LLM_BREAKER_SLOW_CALL_S (default 20)
+- LLM_BREAKER_SLOW_RATE   (default 0.8)
+- LLM_BREAKER_OPEN_S      (default 30)
+"""
+import os
+import time
+import threading
+from collections import deque
+from typing import Any, Dict, Iterable, List
+
+WINDOW_S = float(os.getenv("LLM_BREAKER_WINDOW_S", "60"))
+MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "5"))
+ERROR_RATE = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+SLOW_CALL_S = float(os.getenv("LLM_BREAKER_SLOW_CALL_S", "20"))
+SLOW_RATE = float(os.getenv("LLM_BREAKER_SLOW_RATE", "0.8"))
+OPEN_S = float(os.getenv("LLM_BREAKER_OPEN_S", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+_STATE_RANK = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider whose breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: deque = deque()      # (timestamp, ok, latency_s)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.counters = {"rejected": 0, "opened": 0, "successes": 0, "failures": 0}
+
+    def _prune(self, now: float):
+        while self._calls and self._calls[0][0] < now - WINDOW_S:
+            self._calls.popleft()
+
+    def _open(self, now: float):
+        self._state = OPEN
+        self._opened_at = now
+        self._trial_in_flight = False
+        self.counters["opened"] += 1
+        print(f"[circuit_breaker] 🔴 {self.name} breaker opened")
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.time() >= self._opened_at + OPEN_S:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now. Every allowed call must be followed by record() or release()."""
+        now = time.time()
+        with self._lock:
+            if self._state == OPEN and now >= self._opened_at + OPEN_S:
+                self._state = HALF_OPEN
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.counters["rejected"] += 1
+            return False
+
+    def release(self):
+        """
+        An allowed call ended without an outcome (e.g. a stream closed before any text). Frees
+        the half-open trial slot so the next call can be the trial.
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record(self, ok: bool, latency_s: float):
+        now = time.time()
+        slow = latency_s >= SLOW_CALL_S
+        with self._lock:
+            self.counters["successes" if ok else "failures"] += 1
+            if self._state == HALF_OPEN:
+                if ok and not slow:
+                    self._state = CLOSED
+                    self._calls.clear()
+                    self._trial_in_flight = False
+                    print(f"[circuit_breaker] 🟢 {self.name} breaker closed")
+                else:
+                    self._open(now)
+                return
+            self._calls.append((now, ok, latency_s))
+            self._prune(now)
+            if self._state != CLOSED or len(self._calls) < MIN_CALLS:
+                return
+            n = len(self._calls)
+            errors = sum(1 for _, good, _ in self._calls if not good)
+            slow_calls = sum(1 for _, _, lat in self._calls if lat >= SLOW_CALL_S)
+            if errors / n >= ERROR_RATE or slow_calls / n >= SLOW_RATE:
+                self._open(now)
+
+    def _window_stats(self) -> Dict[str, Any]:
+        self._prune(time.time())
+        n = len(self._calls)
+        latencies = sorted(lat for _, ok, lat in self._calls if ok)
+        return {
+            "calls": n,
+            "error_rate": round(sum(1 for _, ok, _ in self._calls if not ok) / n, 3) if n else 0.0,
+            "p50_latency_s": round(latencies[len(latencies) // 2], 3) if latencies else None,
+        }
+
+    def rank(self) -> tuple:
+        state = self.state
+        with self._lock:
+            stats = self._window_stats()
+        p50 = stats["p50_latency_s"]
+        # error rate is bucketed so small noise does not reshuffle providers on every call
+        return (_STATE_RANK[state], round(stats["error_rate"], 1), p50 if p50 is not None else float("inf"))
+
+    def snapshot(self) -> Dict[str, Any]:
+        state = self.state
+        with self._lock:
+            stats = self._window_stats()
+            return {"state": state, **stats, **self.counters}
+
+
+_registry_lock = threading.Lock()
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _registry_lock:
+            breaker = _breakers.setdefault(name, CircuitBreaker(name))
+    return breaker
+
+
+def provider_order(names: Iterable[str], skip_open: bool = False) -> List[str]:
+    """Healthiest first; ties keep the caller's preference order (sort is stable)."""
+    names = list(names)
+    if skip_open:
+        names = [n for n in names if get_breaker(n).state != OPEN]
+    return sorted(names, key=lambda n: get_breaker(n).rank())
+
+
+def snapshot(names: Iterable[str]) -> Dict[str, Any]:
+    names = list(names)
+    return {
+        "order": provider_order(names),
+        "breakers": {n: get_breaker(n).snapshot() for n in names},
+    }
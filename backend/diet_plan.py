@@ -4,41 +4,52 @@ diet_plan.py
 Flask blueprint that generates weekly diet plans nutrition-wise using Groq (Llama) when available.
 
 Endpoints:
-- POST /diet/generate-plan
+- POST /diet/generate-plan   (optional "mode": "concurrent" | "sequential" | "batched")
 - POST /diet/generate-day
 
 Environment:
 - GROQ_API_KEY  (optional; if missing, code uses deterministic fallback)
 - GROQ_MODEL    (optional, default "llama-3.3-70b-versatile")
+- DIET_PLAN_MODE          (optional, "concurrent" (default), "sequential" or "batched")
+- DIET_PLAN_CONCURRENCY   (optional, default 8) max parallel Groq meal calls
+- DIET_PLAN_DEDUPE_ROUNDS (optional, default 2) regeneration rounds for duplicate meal names
+- DIET_PLAN_CALORIE_TOLERANCE (optional, default 0.25) batched-mode calorie tolerance per meal
 """
 import os
 import json
 import uuid
 import re
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, List, Optional
 from flask import Blueprint, request, jsonify
+import llm_gateway
+import llm_json
 
 # Groq client (Llama) config
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
 
-# Initialize Groq client with error handling
-groq_client = None
-GROQ_AVAILABLE = False
-
-try:
-    if GROQ_API_KEY:
-        from groq import Groq  # may raise ImportError
-        groq_client = Groq(api_key=GROQ_API_KEY)
-        GROQ_AVAILABLE = True
-        print(f"[diet_plan] ✅ Groq client initialized with model: {GROQ_MODEL}")
-    else:
-        print("[diet_plan] ⚠️ GROQ_API_KEY not set; running in deterministic fallback mode")
-except ImportError as e:
-    print(f"[diet_plan] ❌ Groq import failed: {e}")
-except Exception as e:
-    print(f"[diet_plan] ❌ Groq client initialization failed: {e}")
+# Shared Groq client lives in llm_gateway (pooled, created once)
+GROQ_AVAILABLE = llm_gateway.is_available("groq")
+if GROQ_AVAILABLE:
+    print(f"[diet_plan] ✅ Groq client ready with model: {GROQ_MODEL}")
+else:
+    print("[diet_plan] ⚠️ Groq not available; running in deterministic fallback mode")
+
+# Meal generation mode for groq_generate_week_plan: "concurrent", "sequential" or "batched";
+# an unknown value (here or in a request's "mode") falls back to the default.
+# DIET_PLAN_CONCURRENCY bounds the shared pool, i.e. in-flight Groq meal calls across all requests.
+GENERATION_MODES = ("concurrent", "batched", "sequential")
+DIET_PLAN_MODE = os.getenv("DIET_PLAN_MODE", "concurrent").strip().lower()
+if DIET_PLAN_MODE not in GENERATION_MODES:
+    print(f"[diet_plan] ⚠️ unknown DIET_PLAN_MODE {DIET_PLAN_MODE!r}; using \"concurrent\"")
+    DIET_PLAN_MODE = "concurrent"
+DIET_PLAN_CONCURRENCY = max(1, int(os.getenv("DIET_PLAN_CONCURRENCY", "8")))
+DIET_PLAN_DEDUPE_ROUNDS = max(0, int(os.getenv("DIET_PLAN_DEDUPE_ROUNDS", "2")))
+# Batched mode: a meal is accepted when its calories are within this fraction of its allocation
+DIET_PLAN_CALORIE_TOLERANCE = float(os.getenv("DIET_PLAN_CALORIE_TOLERANCE", "0.25"))
+_meal_executor = ThreadPoolExecutor(max_workers=DIET_PLAN_CONCURRENCY, thread_name_prefix="diet-meal")
 
 # Blueprint variable must be named `diet_bp` to match server.py registration
 diet_bp = Blueprint("diet_bp", __name__)
@@ -170,23 +181,8 @@ def build_meal_from_template(meal_type: str, calories: int, preference_tags: Lis
 # ---------------- Utilities: parse calories and JSON ----------------
 
 def parse_json_from_text(text: str) -> Optional[dict]:
-    """Extract JSON from text with fallback parsing"""
-    if not text:
-        return None
-    try:
-        return json.loads(text)
-    except Exception:
-        m = re.search(r"(\{(?:.|\n)*\})", text)
-        if m:
-            candidate = m.group(1)
-            try:
-                return json.loads(candidate)
-            except Exception:
-                try:
-                    return json.loads(candidate.replace("'", '"'))
-                except Exception:
-                    return None
-    return None
+    """Extract JSON from text with fallback parsing (shared linear-time extractor + repair)"""
+    return llm_json.parse_json_from_text(text, expect=dict)
 
 def parse_calories_value(val, fallback: int) -> int:
     """
@@ -207,40 +203,229 @@ def parse_calories_value(val, fallback: int) -> int:
 
 # ---------------- Groq (Llama) helper ----------------
 
-def call_groq_chat_system(system_prompt: str, user_prompt: str, model: str = GROQ_MODEL) -> str:
+def call_groq_chat_system(system_prompt: str, user_prompt: str, model: str = GROQ_MODEL, **params) -> str:
     """Call Groq API with system and user prompts"""
-    if groq_client is None:
-        raise RuntimeError("Groq client not configured")
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": user_prompt},
-    ]
+    params = {"temperature": 0.7, "max_tokens": 4000, **params}
     try:
-        resp = groq_client.chat.completions.create(
-            messages=messages,
-            model=model,
-            temperature=0.7,
-            max_tokens=4000
-        )
-        # groq client's shape may differ across SDK versions; attempt to read safely
-        try:
-            return resp.choices[0].message.content
-        except Exception:
-            try:
-                return resp.choices[0].text
-            except Exception:
-                return str(resp)
+        return llm_gateway.call_groq_chat_system(system_prompt, user_prompt, model=model, **params)
     except Exception as e:
         print(f"[diet_plan] ❌ Groq API call failed: {e}")
         raise
 
 # ---------------- Groq-powered agent pipeline ----------------
 
-def groq_generate_week_plan(prompt: str, days: int, meals: List[str], user: dict) -> Optional[Dict[str,Any]]:
-    """Generate weekly plan using Groq AI"""
-    if not GROQ_AVAILABLE or groq_client is None:
+MEAL_GEN_SYSTEM = (
+    "You are a recipe and meal generator. Output ONLY valid JSON for a single meal with keys:\n"
+    '{"name":"Meal Name","description":"Brief description","calories":400,'
+    '"macros":{"protein_g":30,"fat_g":15,"carbs_g":40},"ingredients_hint":"ingredient1, ingredient2"}'
+)
+
+def _meal_key(name: str) -> str:
+    return " ".join((name or "").lower().split())
+
+def groq_generate_meal(mtype: str, meal_cal_target: int, prompt: str, user: dict, avoid_names: List[str]) -> Optional[Dict[str,Any]]:
+    """Generate a single meal with Groq; returns None when the output is unusable"""
+    gen_user = (
+        f"Create one {mtype} meal with constraints:\n"
+        f"- Target calories: {meal_cal_target}\n"
+        f"- User preferences: {prompt}\n"
+        f"- User profile: {json.dumps(user)}\n"
+        f"- Avoid these meal names (already used): {list(avoid_names)}\n"
+        "Return only the JSON object. Name should be unique and concise."
+    )
+    meal_text = call_groq_chat_system(MEAL_GEN_SYSTEM, gen_user, json_mode=True)
+    meal_json = parse_json_from_text(meal_text)
+    if not meal_json or not meal_json.get("name"):
         return None
+    meal_cals = parse_calories_value(meal_json.get("calories"), meal_cal_target)
+    meal_json["name"] = meal_json.get("name").strip()
+    meal_json["calories"] = int(meal_cals)
+    if "macros" not in meal_json:
+        meal_json["macros"] = macros_from_calories(meal_cals)
+    meal_json.setdefault("id", str(uuid.uuid4()))
+    return meal_json
+
+def _fallback_meal(mtype: str, meal_cal_target: int, prompt: str, d_index: int, day_name: str, used_names: set) -> Dict[str,Any]:
+    pref_tags = [t.strip().lower() for t in (prompt or "").split(",") if t.strip()]
+    fallback_meal = build_meal_from_template(mtype, meal_cal_target, pref_tags, day_index=d_index, avoid_names=list(used_names))
+    if fallback_meal["name"] in used_names:
+        fallback_meal["name"] = f"{fallback_meal['name']} ({day_name})"
+    return fallback_meal
+
+def _summarize_day(day_name: str, target_day_cals: int, notes: str, meals_obj: Dict[str,Any]) -> Dict[str,Any]:
+    day_total_calories = sum(int(parse_calories_value(m.get("calories"), 0)) for m in meals_obj.values())
+    total_macros = {"protein_g": 0.0, "fat_g": 0.0, "carbs_g": 0.0}
+    for m in meals_obj.values():
+        mm = m.get("macros", {})
+        total_macros["protein_g"] += float(mm.get("protein_g", 0))
+        total_macros["fat_g"] += float(mm.get("fat_g", 0))
+        total_macros["carbs_g"] += float(mm.get("carbs_g", 0))
+    return {
+        "day": day_name,
+        "target_calories": target_day_cals,
+        "calories": int(day_total_calories),
+        "notes": notes,
+        "meals": meals_obj,
+        "total_macros": {k: round(v, 1) for k, v in total_macros.items()}
+    }
+
+def _safe_generate_meal(slot: tuple, prompt: str, user: dict, avoid_names: List[str]) -> Optional[Dict[str,Any]]:
+    d_index, day_name, mtype, meal_cal_target = slot
     try:
+        return groq_generate_meal(mtype, meal_cal_target, prompt, user, avoid_names)
+    except Exception as e:
+        print(f"[diet_plan] ❌ Groq meal generation failed for {mtype} on {day_name}: {e}")
+        return None
+
+def _generate_meals_concurrently(slots: List[tuple], prompt: str, user: dict, reserved_names: List[str] = ()) -> Dict[tuple, Optional[Dict[str,Any]]]:
+    """
+    Generate every (day, meal) slot in parallel on the shared meal pool, then repair name
+    collisions: the first slot (in day/meal order) keeps a duplicated name and only the later
+    ones are regenerated, with the names already taken passed as the avoid list.
+    reserved_names are names already used elsewhere in the plan; they count as taken.
+    Slots still colliding after DIET_PLAN_DEDUPE_ROUNDS come back as None (template fallback).
+    """
+    reserved = list(reserved_names)
+    futures = {slot: _meal_executor.submit(_safe_generate_meal, slot, prompt, user, reserved) for slot in slots}
+    results = {slot: fut.result() for slot, fut in futures.items()}
+
+    for round_no in range(DIET_PLAN_DEDUPE_ROUNDS + 1):
+        seen = {_meal_key(n) for n in reserved}
+        colliding = []
+        for slot in slots:
+            meal = results[slot]
+            if meal is None:
+                continue
+            key = _meal_key(meal["name"])
+            if key in seen:
+                colliding.append(slot)
+            else:
+                seen.add(key)
+        if not colliding:
+            break
+        if round_no == DIET_PLAN_DEDUPE_ROUNDS:
+            for slot in colliding:
+                results[slot] = None
+            break
+        taken = reserved + sorted(results[s]["name"] for s in slots if results[s] is not None and s not in colliding)
+        print(f"[diet_plan] 🔁 Regenerating {len(colliding)} meal(s) with duplicate names")
+        retry = {slot: _meal_executor.submit(_safe_generate_meal, slot, prompt, user, taken) for slot in colliding}
+        for slot, fut in retry.items():
+            results[slot] = fut.result()
+    return results
+
+BATCH_PLAN_SYSTEM = (
+    "You are a professional nutritionist and meal planner. Output ONLY valid JSON for the whole plan. "
+    "Every meal name must be unique across the entire plan. Each meal's calories must be close to its target. "
+    "Schema: {\"days\": [{\"day\":\"Monday\",\"notes\":\"Brief notes\",\"meals\": {\"<meal type>\": "
+    "{\"name\":\"Meal Name\",\"description\":\"Brief description\",\"calories\":400,"
+    "\"macros\":{\"protein_g\":30,\"fat_g\":15,\"carbs_g\":40},\"ingredients_hint\":\"ingredient1, ingredient2\"}}}, ...]}"
+)
+
+def _validate_batched_meal(meal: Any, meal_cal_target: int, used_keys: set) -> Optional[Dict[str,Any]]:
+    """Return the normalized meal if it is usable for its slot, else None"""
+    if not isinstance(meal, dict) or not str(meal.get("name") or "").strip():
+        return None
+    name = str(meal["name"]).strip()
+    if _meal_key(name) in used_keys:
+        return None
+    meal_cals = parse_calories_value(meal.get("calories"), 0)
+    if abs(meal_cals - meal_cal_target) > meal_cal_target * DIET_PLAN_CALORIE_TOLERANCE:
+        return None
+    meal["name"] = name
+    meal["calories"] = int(meal_cals)
+    if not isinstance(meal.get("macros"), dict):
+        meal["macros"] = macros_from_calories(meal_cals)
+    meal.setdefault("id", str(uuid.uuid4()))
+    return meal
+
+def groq_generate_week_plan_batched(prompt: str, days: int, meals: List[str], user: dict) -> Optional[Dict[str,Any]]:
+    """
+    Generate the whole plan in one structured Groq call, validate each meal locally against
+    split_calories_across_meals, and send only the failing slots for per-meal repair
+    (in parallel). Round trips: 1 plan call + at most 1 + DIET_PLAN_DEDUPE_ROUNDS repair waves.
+    """
+    target_day_cals = int(user.get("target_calories", 2000))
+    allocation = split_calories_across_meals(target_day_cals, meals)
+    day_names = [WEEKDAYS[i % len(WEEKDAYS)] for i in range(days)]
+
+    plan_user = (
+        f"User profile: {json.dumps(user)}\n"
+        f"Preferences/prompt: {prompt}\n"
+        f"Days (in order): {day_names}\n"
+        f"Meal types per day: {meals}\n"
+        f"Calorie target per meal: {json.dumps(allocation)}\n"
+        "Return the complete plan JSON. Ensure day-to-day variety."
+    )
+    plan_text = call_groq_chat_system(
+        BATCH_PLAN_SYSTEM, plan_user, max_tokens=min(32000, 600 + 180 * days * len(meals)), json_mode=True
+    )
+    plan_json = parse_json_from_text(plan_text)
+    model_days = plan_json.get("days", []) if isinstance(plan_json, dict) else []
+    if not isinstance(model_days, list):
+        model_days = []
+
+    used_keys = set()
+    accepted: Dict[tuple, Dict[str,Any]] = {}
+    failed_slots = []
+    notes = {}
+    for d_index, day_name in enumerate(day_names):
+        d = model_days[d_index] if d_index < len(model_days) and isinstance(model_days[d_index], dict) else {}
+        notes[d_index] = d.get("notes", "")
+        day_meals = d.get("meals") if isinstance(d.get("meals"), dict) else {}
+        for mtype in meals:
+            slot = (d_index, day_name, mtype, allocation[mtype])
+            meal = _validate_batched_meal(day_meals.get(mtype), allocation[mtype], used_keys)
+            if meal is None:
+                failed_slots.append(slot)
+            else:
+                accepted[slot] = meal
+                used_keys.add(_meal_key(meal["name"]))
+
+    if failed_slots:
+        failed_days = sorted({slot[0] for slot in failed_slots})
+        print(f"[diet_plan] 🔧 Repairing {len(failed_slots)} meal(s) on {len(failed_days)} day(s) of the batched plan")
+        reserved = [m["name"] for m in accepted.values()]
+        accepted.update(_generate_meals_concurrently(failed_slots, prompt, user, reserved_names=reserved))
+
+    out_days = []
+    used_names_global = set()
+    for d_index, day_name in enumerate(day_names):
+        meals_obj = {}
+        for mtype in meals:
+            meal_json = accepted.get((d_index, day_name, mtype, allocation[mtype]))
+            if meal_json is None:
+                meal_json = _fallback_meal(mtype, allocation[mtype], prompt, d_index, day_name, used_names_global)
+            used_names_global.add(meal_json["name"])
+            meals_obj[mtype] = meal_json
+        out_days.append(_summarize_day(day_name, target_day_cals, notes[d_index], meals_obj))
+    return {"days": out_days}
+
+def _generation_mode(mode: Any) -> str:
+    """Requested mode when it is one of GENERATION_MODES; otherwise DIET_PLAN_MODE."""
+    if mode is None or mode == "":
+        return DIET_PLAN_MODE
+    requested = mode.strip().lower() if isinstance(mode, str) else mode
+    if requested not in GENERATION_MODES:
+        print(f"[diet_plan] ⚠️ unknown mode {mode!r}; using {DIET_PLAN_MODE!r}")
+        return DIET_PLAN_MODE
+    return requested
+
+def groq_generate_week_plan(prompt: str, days: int, meals: List[str], user: dict, mode: Optional[str] = None) -> Optional[Dict[str,Any]]:
+    """
+    Generate weekly plan using Groq AI.
+    mode: "concurrent" (meals generated in parallel, duplicates repaired afterwards),
+          "sequential" (one meal at a time, each prompt carries the names used so far) or
+          "batched" (one call for the whole plan, see groq_generate_week_plan_batched).
+    """
+    if not llm_gateway.provider_ready("groq"):
+        # not configured, or the circuit breaker is open: go straight to the template plan
+        return None
+    mode = _generation_mode(mode)
+    try:
+        if mode == "batched":
+            return groq_generate_week_plan_batched(prompt, days, meals, user)
+
         planner_system = (
             "You are a professional nutritionist and meal planner. Output ONLY valid JSON. "
             "Ensure diversity across days - do not repeat the same meal name more than once in the week. "
@@ -253,75 +438,46 @@ def groq_generate_week_plan(prompt: str, days: int, meals: List[str], user: dict
             f"Meals per day: {meals}\n"
             "Return a planner JSON with target calories for each day and brief notes. Ensure day-to-day variety."
         )
-        planner_text = call_groq_chat_system(planner_system, planner_user)
+        planner_text = call_groq_chat_system(planner_system, planner_user, json_mode=True)
         planner_json = parse_json_from_text(planner_text)
         if not planner_json:
             print("[diet_plan] ❌ Failed to parse planner JSON from Groq response")
             return None
 
-        out_days = []
-        used_names_global = set()
+        planned_days = []
+        slots = []
         for d_index, d in enumerate(planner_json.get("days", [])):
             day_name = d.get("day", WEEKDAYS[d_index % len(WEEKDAYS)])
             target_day_cals = int(d.get("calories", user.get("target_calories", 2000)))
             allocation = split_calories_across_meals(target_day_cals, meals)
-            meals_obj = {}
+            day_slots = []
             for mtype in meals:
                 meal_cal_target = allocation.get(mtype, max(200, target_day_cals // max(1, len(meals))))
-                gen_system = (
-                    "You are a recipe and meal generator. Output ONLY valid JSON for a single meal with keys:\n"
-                    '{"name":"Meal Name","description":"Brief description","calories":400,'
-                    '"macros":{"protein_g":30,"fat_g":15,"carbs_g":40},"ingredients_hint":"ingredient1, ingredient2"}'
-                )
-                gen_user = (
-                    f"Create one {mtype} meal with constraints:\n"
-                    f"- Target calories: {meal_cal_target}\n"
-                    f"- User preferences: {prompt}\n"
-                    f"- User profile: {json.dumps(user)}\n"
-                    f"- Avoid these meal names (already used): {list(used_names_global)}\n"
-                    "Return only the JSON object. Name should be unique and concise."
-                )
-                try:
-                    meal_text = call_groq_chat_system(gen_system, gen_user)
-                    meal_json = parse_json_from_text(meal_text)
-                    if meal_json and meal_json.get("name"):
-                        meal_cals = parse_calories_value(meal_json.get("calories"), meal_cal_target)
-                        name = meal_json.get("name").strip()
-                        if name in used_names_global:
-                            raise ValueError(f"Duplicate meal name from model: {name}")
-                        meal_json["calories"] = int(meal_cals)
-                        if "macros" not in meal_json:
-                            meal_json["macros"] = macros_from_calories(meal_cals)
-                        meal_json.setdefault("id", str(uuid.uuid4()))
-                        meals_obj[mtype] = meal_json
-                        used_names_global.add(name)
-                        continue
-                except Exception as e:
-                    print(f"[diet_plan] ❌ Groq meal generation failed for {mtype} on {day_name}: {e}")
-
-                # fallback deterministic
-                pref_tags = [t.strip().lower() for t in (prompt or "").split(",") if t.strip()]
-                fallback_meal = build_meal_from_template(mtype, meal_cal_target, pref_tags, day_index=d_index, avoid_names=list(used_names_global))
-                if fallback_meal["name"] in used_names_global:
-                    fallback_meal["name"] = f"{fallback_meal['name']} ({day_name})"
-                used_names_global.add(fallback_meal["name"])
-                meals_obj[mtype] = fallback_meal
-
-            day_total_calories = sum(int(parse_calories_value(m.get("calories"), 0)) for m in meals_obj.values())
-            total_macros = {"protein_g": 0.0, "fat_g": 0.0, "carbs_g": 0.0}
-            for m in meals_obj.values():
-                mm = m.get("macros", {})
-                total_macros["protein_g"] += float(mm.get("protein_g", 0))
-                total_macros["fat_g"] += float(mm.get("fat_g", 0))
-                total_macros["carbs_g"] += float(mm.get("carbs_g", 0))
-            out_days.append({
-                "day": day_name,
-                "target_calories": target_day_cals,
-                "calories": int(day_total_calories),
-                "notes": d.get("notes", ""),
-                "meals": meals_obj,
-                "total_macros": {k: round(v, 1) for k, v in total_macros.items()}
-            })
+                day_slots.append((d_index, day_name, mtype, meal_cal_target))
+            planned_days.append((d, day_name, target_day_cals, day_slots))
+            slots.extend(day_slots)
+
+        generated = _generate_meals_concurrently(slots, prompt, user) if mode == "concurrent" else {}
+
+        out_days = []
+        used_names_global = set()
+        for d, day_name, target_day_cals, day_slots in planned_days:
+            meals_obj = {}
+            for slot in day_slots:
+                d_index, _, mtype, meal_cal_target = slot
+                if mode == "concurrent":
+                    meal_json = generated.get(slot)
+                else:
+                    meal_json = _safe_generate_meal(slot, prompt, user, list(used_names_global))
+                    if meal_json and meal_json["name"] in used_names_global:
+                        print(f"[diet_plan] ❌ Duplicate meal name from model: {meal_json['name']}")
+                        meal_json = None
+                if meal_json is None:
+                    # fallback deterministic
+                    meal_json = _fallback_meal(mtype, meal_cal_target, prompt, d_index, day_name, used_names_global)
+                used_names_global.add(meal_json["name"])
+                meals_obj[mtype] = meal_json
+            out_days.append(_summarize_day(day_name, target_day_cals, d.get("notes", ""), meals_obj))
         return {"days": out_days}
     except Exception as e:
         print(f"[diet_plan] ❌ Groq weekly plan generation failed: {e}")
@@ -373,7 +529,7 @@ def generate_plan():
         # Try Groq AI generation first
         if GROQ_AVAILABLE:
             try:
-                agent_out = groq_generate_week_plan(prompt, days, meals, user)
+                agent_out = groq_generate_week_plan(prompt, days, meals, user, mode=data.get("mode"))
                 if agent_out:
                     return jsonify({
                         "success": True,
@@ -529,7 +685,10 @@ def health_check():
         "status": "healthy",
         "service": "diet_plan",
         "groq_available": GROQ_AVAILABLE,
-        "groq_model": GROQ_MODEL if GROQ_AVAILABLE else "none"
+        "groq_model": GROQ_MODEL if GROQ_AVAILABLE else "none",
+        "generation_mode": DIET_PLAN_MODE,
+        "concurrency": DIET_PLAN_CONCURRENCY,
+        "providers": llm_gateway.provider_health()
     })
 
 # Module initialization function for server.py
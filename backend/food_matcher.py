@@ -0,0 +1,152 @@
+"""
+food_matcher.py
+
+Aho-Corasick matcher for food names in free text, used by nutrition_extractor.
+
+Every food name and synonym is compiled into one automaton (a trie with failure links),
+so all mentions in a description are found in a single left-to-right pass. The cost is
+linear in the text plus the matches, whatever the size of the food table. Matches are:
+- whole words: "egg" does not match inside "eggplant" (the automaton runs over words)
+- leftmost-longest and non-overlapping: "brown rice" wins over "rice" at the same spot
+
+for_table() keeps one compiled matcher and rebuilds it only when the table's names change
+(checked with a cheap signature of the keys), not on every request.
+"""
+import re
+import threading
+from collections import deque
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+
+class FoodMatch(NamedTuple):
+    start: int          # word offsets in the text: words[start:end] matched
+    end: int
+    surface: str        # the name or synonym that matched
+    key: str            # food table key it stands for
+
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+def split_words(text: str) -> Tuple[str, ...]:
+    return tuple(_WORD_RE.findall(text.lower()))
+
+
+class FoodMatcher:
+    """
+    Aho-Corasick automaton over words rather than characters: the description is split
+    into alphanumeric words with one C-level regex pass, and the automaton steps once per
+    word. Every match therefore starts and ends on a word boundary by construction, and a
+    description costs a few dozen transitions instead of one per character.
+    """
+
+    def __init__(self, patterns: Dict[str, str]):
+        """`patterns` maps each surface form (name or synonym) to its food key."""
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, str, str]]] = [[]]     # (words, surface, key) ending at node
+        self.size = 0
+        for surface, key in patterns.items():
+            words = split_words(surface)
+            if words:
+                self._add(words, " ".join(words), key)
+        self._link()
+
+    def _add(self, words: Tuple[str, ...], surface: str, key: str):
+        node = 0
+        for word in words:
+            nxt = self._goto[node].get(word)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[node][word] = nxt
+            node = nxt
+        if not self._out[node]:
+            self.size += 1
+        self._out[node] = [(len(words), surface, key)]
+
+    def _link(self):
+        # breadth-first, so a node's failure target is final before its children are linked
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for word, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and word not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(word, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find_all(self, text: str) -> List[FoodMatch]:
+        """Leftmost-longest, non-overlapping, whole-word matches in `text` (case-insensitive)."""
+        goto, fail, out = self._goto, self._fail, self._out
+        found: List[Tuple[int, int, str, str]] = []
+        node = 0
+        for i, word in enumerate(_WORD_RE.findall(text.lower())):
+            while node and word not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(word, 0)
+            for count, surface, key in out[node]:
+                found.append((i + 1 - count, i + 1, surface, key))
+        if len(found) > 1:
+            found.sort(key=lambda m: (m[0], m[0] - m[1]))
+        matches: List[FoodMatch] = []
+        last_end = 0
+        for start, end, surface, key in found:
+            if start >= last_end:
+                matches.append(FoodMatch(start, end, surface, key))
+                last_end = end
+        return matches
+
+    def first(self, text: str) -> Optional[FoodMatch]:
+        matches = self.find_all(text)
+        return matches[0] if matches else None
+
+
+def table_signature(food_db: Dict[str, object], synonyms: Dict[str, Iterable[str]]) -> int:
+    """Changes when a food name or synonym is added, removed or renamed (not on value edits)."""
+    return hash((tuple(food_db), tuple(synonyms), tuple(map(tuple, synonyms.values()))))
+
+
+_lock = threading.Lock()
+_compiled: Optional[Tuple[int, FoodMatcher]] = None     # (table signature, matcher), swapped atomically
+_builds = 0
+
+
+def for_table(
+    food_db: Dict[str, object],
+    synonyms: Dict[str, Iterable[str]],
+    resolve: Callable[[str], Optional[str]],
+) -> FoodMatcher:
+    """
+    The compiled matcher for this food table, rebuilt only when table_signature() changes.
+    Food keys map to themselves; each synonym maps to resolve(synonym) and is left out
+    when that returns None.
+    """
+    global _compiled, _builds
+    signature = table_signature(food_db, synonyms)
+    compiled = _compiled
+    if compiled is not None and compiled[0] == signature:
+        return compiled[1]
+    with _lock:
+        if _compiled is None or _compiled[0] != signature:
+            patterns: Dict[str, str] = {}
+            for group in synonyms.values():
+                for syn in group:
+                    key = resolve(syn)
+                    if key:
+                        patterns[syn] = key
+            patterns.update({key: key for key in food_db})
+            matcher = FoodMatcher(patterns)
+            _compiled = (signature, matcher)
+            _builds += 1
+            print(f"[food_matcher] compiled {matcher.size} names")
+        return _compiled[1]
+
+
+def stats() -> Dict[str, object]:
+    compiled = _compiled
+    return {"names": compiled[1].size if compiled else 0, "builds": _builds}
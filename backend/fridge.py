@@ -1,18 +1,29 @@
 """
 fridge.py - Blueprint version with improved error handling
+
+POST /fridge/photos takes several shots of one fridge (shelves, door, freezer) as multipart
+files or {"images": [data URIs]}. It pre-processes them in parallel, sends them to Gemini
+in one multi-image request, and merges the ingredient lists. One recipe call is then made
+for the merged set, so there are 2 LLM calls instead of 2 per photo.
+
+Environment:
+- FRIDGE_MAX_PHOTOS         (default 8)
+- FRIDGE_PREPROCESS_WORKERS (default 4)
 """
 
 import os
-import re
-import io
 import json
 import uuid
-import base64
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, List, Dict, Any
 from flask import Blueprint, request, jsonify
-from PIL import Image
 from dotenv import load_dotenv
+import llm_gateway
+import llm_json
+import image_pipeline
+import image_hash
+import uploads
 
 # Load .env if present
 load_dotenv()
@@ -20,19 +31,16 @@ load_dotenv()
 # === Config / Keys ===
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash-latest")
+GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+
+MAX_PHOTOS = int(os.getenv("FRIDGE_MAX_PHOTOS", "8"))
+PREPROCESS_WORKERS = int(os.getenv("FRIDGE_PREPROCESS_WORKERS", "4"))
 
 print(f"[fridge] Gemini API Key: {'Set' if GEMINI_API_KEY else 'Not Set'}")
 print(f"[fridge] Gemini Model: {GEMINI_MODEL}")
 
-# === Import SDKs with better error handling ===
-genai_client = None
-try:
-    import google.generativeai as genai
-    # Remove the problematic ModelServiceAsyncClient import
-    GEMINI_AVAILABLE = True
-except ImportError as e:
-    GEMINI_AVAILABLE = False
-    print(f"❌ Gemini import failed: {e}")
+# === Shared Gemini client (pooled, created once in llm_gateway) ===
+GEMINI_AVAILABLE = llm_gateway.is_available("gemini")
 
 # === Create Blueprint ===
 fridge_bp = Blueprint('fridge_bp', __name__)
@@ -40,69 +48,107 @@ fridge_bp = Blueprint('fridge_bp', __name__)
 # In-memory recipe store
 RECIPE_STORE = {}
 
+# Fans the photos of one request out to image_pipeline (process pool) so they prepare in parallel
+_preprocess_executor = ThreadPoolExecutor(max_workers=PREPROCESS_WORKERS, thread_name_prefix="fridge-preprocess")
+
+INGREDIENTS_PROMPT = """Analyze this food image and list all visible ingredients. 
+Return ONLY a JSON array of ingredient names, like: ["tomato", "onion", "chicken"]"""
+
 # === Helpers ===
 def parse_json_from_text(text: str) -> Any:
-    """Improved JSON parser with better error handling"""
-    if not text:
-        return None
-        
-    text = text.strip()
-    
-    # Remove code blocks
-    if text.startswith('```json'):
-        text = text[7:].strip()
-    if text.startswith('```'):
-        text = text[3:].strip()
-    if text.endswith('```'):
-        text = text[:-3].strip()
-    
-    # Try direct parse first
-    try:
-        return json.loads(text)
-    except:
-        pass
-    
-    # Try to extract JSON from text
-    try:
-        # Look for array pattern
-        match = re.search(r'\[[^]]*\][^]]*\]', text)
-        if not match:
-            match = re.search(r'\[.*\]', text, re.DOTALL)
-        
-        if match:
-            candidate = match.group(0)
-            return json.loads(candidate)
-    except:
-        pass
-    
-    return None
+    """Extract the first JSON object or array from model output (see llm_json)"""
+    return llm_json.parse_json_from_text(text)
 
-def call_gemini_image_to_text(pil_image: Image.Image, prompt_text: str) -> str:
-    """Call Gemini vision API with error handling"""
-    if genai_client is None:
+def call_gemini_image_to_text(image: Any, prompt_text: str, json_mode: bool = False,
+                              cache: Optional[str] = None, cache_validate=None) -> str:
+    """Call Gemini vision API with error handling; cache="<namespace>" reuses answers for near-identical photos (image_hash)"""
+    if not GEMINI_AVAILABLE:
         raise RuntimeError("Gemini client not available. Please check API key and installation.")
     
+    def call() -> str:
+        return llm_gateway.call_gemini_image_to_text(image, prompt_text, model=GEMINI_MODEL, json_mode=json_mode)
+
     try:
-        model = genai_client.GenerativeModel(GEMINI_MODEL)
-        response = model.generate_content([prompt_text, pil_image])
-        return response.text
+        if cache:
+            return image_hash.cached_call(image, cache, call, cache_validate)
+        return call()
     except Exception as e:
         print(f"[fridge] Gemini vision error: {e}")
         raise RuntimeError(f"Gemini API error: {str(e)}")
 
-def call_gemini_text(prompt_text: str) -> str:
+def call_gemini_text(prompt_text: str, **params) -> str:
     """Call Gemini text API with error handling"""
-    if genai_client is None:
+    if not GEMINI_AVAILABLE:
         raise RuntimeError("Gemini client not available. Please check API key and installation.")
     
     try:
-        model = genai_client.GenerativeModel(GEMINI_MODEL)
-        response = model.generate_content(prompt_text)
-        return response.text
+        return llm_gateway.call_gemini_text(prompt_text, model=GEMINI_MODEL, **params)
     except Exception as e:
         print(f"[fridge] Gemini text error: {e}")
         raise RuntimeError(f"Gemini API error: {str(e)}")
 
+def clean_ingredients(items: List[Any]) -> List[str]:
+    return [" ".join(str(item).split()).lower() for item in items if item and not isinstance(item, (list, dict))]
+
+def merge_ingredients(lists: List[List[str]]) -> List[str]:
+    """Union of several ingredient lists in first-seen order; "tomatoes" and "tomato" count once."""
+    merged: List[str] = []
+    seen = set()
+    for items in lists:
+        for name in clean_ingredients(items):
+            forms = {name, name[:-1] if name.endswith("s") else name + "s", name[:-2] if name.endswith("es") else name + "es"}
+            if forms & seen:
+                continue
+            seen.add(name)
+            merged.append(name)
+    return merged
+
+def _multi_photo_prompt(count: int) -> str:
+    return f"""These {count} photos show different parts of the same fridge (shelves, door, freezer).
+For each photo, in order, list all visible ingredients.
+Return ONLY a JSON array with one array of ingredient names per photo, like: [["tomato", "onion"], ["milk", "eggs"]]"""
+
+def analyze_fridge_photos(images: List[Any]) -> Dict[str, Any]:
+    """
+    Ingredient lists for several prepared photos. Photos already answered (image_hash
+    "fridge.ingredients") are reused; the rest go to Gemini in one multi-image call whose
+    per-photo answers are cached for later single or batch uploads.
+    Returns {"per_photo": [list or None], "cached": [bool], "merged": [...], "vision_calls": n}.
+    """
+    per_photo: List[Optional[List[str]]] = [None] * len(images)
+    cached = [False] * len(images)
+    for i, image in enumerate(images):
+        hit = parse_json_from_text(image_hash.lookup(image, "fridge.ingredients") or "")
+        if isinstance(hit, list):
+            per_photo[i] = clean_ingredients(hit)
+            cached[i] = True
+
+    pending = [i for i in range(len(images)) if per_photo[i] is None]
+    merged_extra: List[str] = []
+    vision_calls = 0
+    if pending:
+        vision_calls = 1
+        gemini_text = llm_gateway.call_gemini_images_to_text(
+            [images[i] for i in pending], _multi_photo_prompt(len(pending)), model=GEMINI_MODEL, json_mode=True
+        )
+        parsed = parse_json_from_text(gemini_text)
+        if isinstance(parsed, list) and len(parsed) == len(pending) and all(isinstance(p, list) for p in parsed):
+            for i, items in zip(pending, parsed):
+                per_photo[i] = clean_ingredients(items)
+                image_hash.store(images[i], "fridge.ingredients", json.dumps(per_photo[i]))
+        elif isinstance(parsed, list):
+            # a single flat list (or a count mismatch): usable for the merge, not per photo
+            merged_extra = clean_ingredients([x for p in parsed for x in (p if isinstance(p, list) else [p])])
+        else:
+            merged_extra = extract_ingredients_fallback(gemini_text)
+
+    return {
+        "per_photo": per_photo,
+        "cached": cached,
+        "merged": merge_ingredients([p for p in per_photo if p] + [merged_extra]),
+        "vision_calls": vision_calls,
+    }
+
 def extract_ingredients_fallback(image_description: str) -> List[str]:
     """Fallback ingredient extraction when Gemini fails"""
     # Simple keyword-based fallback
@@ -188,9 +234,9 @@ def generate_sample_recipes(ingredients: List[str]) -> List[Dict[str, Any]]:
     return sample_recipes
 
 def generate_recipes_from_ingredients(ingredients: List[str]) -> List[Dict[str, Any]]:
-    """Generate recipes using Gemini or fallback to samples"""
-    if not genai_client:
-        print("[fridge] Gemini not available, using sample recipes")
+    """Generate recipes using Gemini (Groq as backup) or fallback to samples"""
+    if not llm_gateway.provider_order(("gemini", "groq")):
+        print("[fridge] No LLM provider ready, using sample recipes")
         return generate_sample_recipes(ingredients)
     
     try:
@@ -215,8 +261,17 @@ Return ONLY valid JSON with this exact structure:
   ]
 }}"""
 
-        gemini_text = call_gemini_text(prompt)
-        parsed = parse_json_from_text(gemini_text)
+        llm_text = llm_gateway.complete(
+            "You are a recipe expert. Return only valid JSON.",
+            prompt,
+            providers=("gemini", "groq"),
+            models={"gemini": GEMINI_MODEL, "groq": GROQ_MODEL},
+            cache="fridge.recipes",
+            cache_validate=lambda t: bool((llm_json.parse_strict_json(t, expect=dict) or {}).get("recipes")),
+            json_mode=True,
+            temperature=0.7,
+        )
+        parsed = parse_json_from_text(llm_text)
         
         if parsed and 'recipes' in parsed:
             recipes = parsed['recipes'][:3]  # Take first 3 recipes
@@ -225,7 +280,7 @@ Return ONLY valid JSON with this exact structure:
                 RECIPE_STORE[recipe["id"]] = recipe
             return recipes
         else:
-            raise ValueError("Invalid response format from Gemini")
+            raise ValueError("Invalid response format from LLM")
             
     except Exception as e:
         print(f"[fridge] Recipe generation failed: {e}")
@@ -238,45 +293,50 @@ def health():
     return jsonify({
         "success": True, 
         "message": "fridge backend running",
-        "gemini_available": genai_client is not None
+        "gemini_available": GEMINI_AVAILABLE,
+        "providers": llm_gateway.provider_health(),
+        "image_pipeline": image_pipeline.stats(),
+        "photo_cache": image_hash.stats()
     }), 200
 
 @fridge_bp.route("/photo", methods=["POST"])
 def fridge_photo():
     try:
-        data = request.get_json(force=True)
-        if not data or "image" not in data:
-            return jsonify({"success": False, "error": "Missing 'image' in request body"}), 400
-
-        data_uri = data["image"]
-        m = re.match(r"data:(?P<mime>image/[^;]+);base64,(?P<b64>.+)$", data_uri)
-        if not m:
-            return jsonify({"success": False, "error": "Invalid image data URI"}), 400
+        # multipart/form-data, raw image bytes, or the original JSON data URI (see uploads.py)
+        try:
+            upload = uploads.read_photo("image")
+        except uploads.UploadError as e:
+            return jsonify({"success": False, "error": str(e)}), e.status
 
-        img_b64 = m.group("b64")
-        img_bytes = base64.b64decode(img_b64)
-        pil_image = Image.open(io.BytesIO(img_bytes)).convert("RGB")
+        # Downscale + re-encode before upload (image_pipeline); Gemini gets compact JPEG bytes
+        try:
+            with upload:
+                image = image_pipeline.preprocess_file(upload.fileobj, upload.mime_type, upload.size)
+        except image_pipeline.PipelineBusy as e:
+            return jsonify({"success": False, "error": str(e)}), 503, {"Retry-After": "2"}
 
-        # If Gemini is not available, use fallback
-        if not genai_client:
+        # If Gemini is not available (or its breaker is open), use fallback
+        if not llm_gateway.provider_ready("gemini"):
             ingredients = ['fresh vegetables', 'produce']  # Default fallback
             recipes = generate_sample_recipes(ingredients)
             return jsonify({
                 "success": True, 
                 "ingredients": ingredients,
                 "recipes": recipes,
-                "message": "Using sample data (Gemini not configured)"
+                "message": "Using sample data (Gemini unavailable)"
             }), 200
 
-        prompt = """Analyze this food image and list all visible ingredients. 
-Return ONLY a JSON array of ingredient names, like: ["tomato", "onion", "chicken"]"""
-
         try:
-            gemini_text = call_gemini_image_to_text(pil_image, prompt)
+            # retries / re-shots of the same fridge reuse the earlier ingredient list
+            gemini_text = call_gemini_image_to_text(
+                image, INGREDIENTS_PROMPT, json_mode=True,
+                cache="fridge.ingredients",
+                cache_validate=lambda t: llm_json.parse_strict_json(t, expect=list) is not None,
+            )
             parsed = parse_json_from_text(gemini_text)
             
             if isinstance(parsed, list):
-                ingredients = [str(item).strip().lower() for item in parsed if item]
+                ingredients = clean_ingredients(parsed)
             else:
                 # Fallback extraction
                 ingredients = extract_ingredients_fallback(gemini_text)
@@ -292,7 +352,61 @@ Return ONLY a JSON array of ingredient names, like: ["tomato", "onion", "chicken
             "success": True, 
             "ingredients": ingredients,
             "recipes": recipes,
-            "gemini_used": genai_client is not None
+            "gemini_used": GEMINI_AVAILABLE
+        }), 200
+
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@fridge_bp.route("/photos", methods=["POST"])
+def fridge_photos():
+    try:
+        try:
+            photo_uploads = uploads.read_photos("images", max_count=MAX_PHOTOS)
+        except uploads.UploadError as e:
+            return jsonify({"success": False, "error": str(e)}), e.status
+
+        def prepare(upload):
+            with upload:
+                return image_pipeline.preprocess_file(upload.fileobj, upload.mime_type, upload.size)
+
+        try:
+            images = list(_preprocess_executor.map(prepare, photo_uploads))
+        except image_pipeline.PipelineBusy as e:
+            return jsonify({"success": False, "error": str(e)}), 503, {"Retry-After": "2"}
+
+        if not llm_gateway.provider_ready("gemini"):
+            ingredients = ['fresh vegetables', 'produce']
+            return jsonify({
+                "success": True,
+                "ingredients": ingredients,
+                "recipes": generate_sample_recipes(ingredients),
+                "photo_count": len(images),
+                "message": "Using sample data (Gemini unavailable)"
+            }), 200
+
+        try:
+            analysis = analyze_fridge_photos(images)
+            ingredients = analysis["merged"] or ['mixed vegetables', 'fresh produce']
+        except Exception as e:
+            print(f"[fridge] Multi-photo analysis failed: {e}")
+            analysis = {"per_photo": [None] * len(images), "cached": [False] * len(images), "vision_calls": 1}
+            ingredients = ['mixed vegetables', 'fresh produce']
+
+        recipes = generate_recipes_from_ingredients(ingredients)
+        print(f"[fridge] {len(images)} photos -> {len(ingredients)} ingredients, {analysis['vision_calls']} vision call(s)")
+
+        return jsonify({
+            "success": True,
+            "ingredients": ingredients,
+            "recipes": recipes,
+            "photos": [
+                {"ingredients": items or [], "cached": hit}
+                for items, hit in zip(analysis["per_photo"], analysis["cached"])
+            ],
+            "photo_count": len(images),
+            "gemini_used": GEMINI_AVAILABLE
         }), 200
 
     except Exception as e:
@@ -320,7 +434,7 @@ def fridge_text():
             "success": True, 
             "ingredients": ingredients,
             "recipes": recipes,
-            "gemini_used": genai_client is not None
+            "gemini_used": GEMINI_AVAILABLE
         }), 200
 
     except Exception as e:
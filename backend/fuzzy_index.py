@@ -0,0 +1,380 @@
+"""
+fuzzy_index.py
+
+Typo-tolerant food-name lookup ("chiken brest", "banannas") for nutrition_extractor.
+
+Typos happen inside words, so the index is over the *vocabulary*: the distinct words of all
+food names and synonyms. The vocabulary grows far more slowly than the table: 100k+ food
+names share a few tens of thousands of words. A phrase is corrected word by word, and the
+corrected phrase is then looked up exactly among the names. A phrase is a food only when
+that whole combination exists; the first existing combination with the smallest total
+distance wins.
+
+Words are indexed by character trigrams (padded with one space each side, so a word of n
+characters has n trigrams), in posting lists partitioned by word length. One edit changes
+at most 4 trigrams (3 for a substitution or deletion, 4 for swapped neighbours). So a word
+within k edits of the query:
+- has a length within k of the query's
+- shares at least T - 4k of the query's T distinct trigrams
+- by the pigeonhole principle, appears in one of the query's 4k + 1 rarest lists at its
+  length
+
+Candidates are collected from those lists only and filtered by their letter sets (each
+letter only one side has costs an edit) and the shared-trigram count. Only the survivors get a banded edit-distance
+check, which gives up as soon as k is exceeded.
+
+The edit budget grows with the length (edit_budget): exact only below 5 characters, 1 edit
+up to 8 characters, 2 from 9 characters, capped by FUZZY_MAX_EDITS. A phrase gets the same
+budget for its total.
+
+Free text is full of ordinary words one edit away from a food ("paste" -> pasta, "salon"
+-> salmon, "break" -> bread). is_common_word() tells those apart (COMMON_WORDS and their
+inflections), so callers can leave them alone unless a quantity says a food follows.
+
+for_table() keeps the index over FOOD_DB names and synonyms, rebuilt when the names change
+(food_matcher.table_signature). for_names() builds one over a large name list once, e.g.
+the nutrient database index, optionally in a background thread.
+
+Environment:
+- FUZZY_MAX_EDITS (default 2)
+"""
+import os
+import time
+import functools
+import itertools
+import threading
+from array import array
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import food_matcher
+
+MAX_EDITS = int(os.getenv("FUZZY_MAX_EDITS", "2"))
+GRAMS_PER_EDIT = 4
+MAX_PHRASE_WORDS = 4
+CANDIDATES_PER_WORD = 4
+LOOKUP_MEMO_SIZE = 8192     # per index: descriptions keep repeating the same words
+
+# ordinary words of 5+ letters (shorter ones are never corrected) common in meal descriptions:
+# never corrected into a table food, even those that are foods themselves ("toast", "soup");
+# inflections are covered by is_common_word()
+COMMON_WORDS = frozenset("""
+    about above absolutely actually added after afternoon again against almost alone along
+    already always amount another anyway apply around arrive aside asked attach avoid awake
+    aware baked bakery before began begin behind being below beside better between bigger
+    birthday bottle bought boxes brand break breakfast brief bring broke brought brunch
+    build bunch burnt buying canteen careful carry cause chain chair change cheap check
+    cheer chill choice choose chose chunk class clean clear close coach coffee color colour
+    comes coming cooked cooker cooking corner could count couple course cover crisp cross
+    crowd crush daily dance dates dealt decide dining dinner dinners doing double dozen
+    drank drink drive earlier early eaten eating either empty enjoy enough entire evening
+    every exactly extra family fancy feast feeling fetch fewer field filled final finish
+    first flavor flavour floor flour follow fresh fried friend friends front froze frozen
+    fruit fully gather giant given glass going grabbed grand grant gravy great green group
+    guess guest habit happy heavy hello helped hence herbs higher homemade hotel hours house
+    hungry instead kitchen large later least leave leftover leftovers lemon light liked
+    little local longer lunch maybe meals means medium might minute minutes mixed month
+    morning mostly motel mother mouth movie night noodle often order other ought outside
+    packet paint pancake paper party paste pause place plain plant plate please plenty point
+    portion prefer press price quick quite rather reach ready really recipe relax right
+    roast round salad salon salted sauce school serve served serving share shared sharp
+    shelf short should shower simple since skipped slept small smaller snack snacks sources
+    spent spice spicy spoon sport stand start started steak stick still store storm straight
+    strong stuff sugar super supper sweet table taste tasty teach their there these thick
+    thicken thing things think those three thrown tired toast today together tonight total
+    track train treat truly under until usual usually walked warmed watch water weekend
+    weight where which while whole would wrote yesterday young
+""".split())
+
+
+def edit_budget(text: str) -> int:
+    n = len(text)
+    return min(MAX_EDITS, 0 if n < 5 else 1 if n < 9 else 2)
+
+
+def is_common_word(word: str) -> bool:
+    """Whether word is an ordinary (non-food) word, also as a plural or -ed/-ing form."""
+    if word in COMMON_WORDS:
+        return True
+    for suffix in ("s", "es", "ed", "d", "ing"):
+        if word.endswith(suffix):
+            stem = word[:-len(suffix)]
+            if stem in COMMON_WORDS or stem + "e" in COMMON_WORDS:
+                return True
+    return False
+
+
+def trigrams(text: str) -> List[str]:
+    padded = f" {text} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def letter_mask(text: str) -> int:
+    """64-bit set of the characters in text (ord mod 64; collisions only weaken the bound)."""
+    mask = 0
+    for ch in text:
+        mask |= 1 << (ord(ch) & 63)
+    return mask
+
+
+def bounded_levenshtein(a: str, b: str, k: int) -> Optional[int]:
+    """
+    Edit distance between a and b (insertions, deletions, substitutions and adjacent
+    transpositions: "letnils" -> "lentils" is one edit) when it is at most k, else None.
+    Only the diagonal band |i - j| <= k is computed, and it gives up as soon as a whole row
+    exceeds k.
+    """
+    if abs(len(a) - len(b)) > k:
+        return None
+    if len(a) > len(b):
+        a, b = b, a
+    n = len(a)
+    far = k + 1
+    before = [far] * (n + 1)
+    previous = [i if i <= k else far for i in range(n + 1)]
+    for j in range(1, len(b) + 1):
+        cb = b[j - 1]
+        current = [far] * (n + 1)
+        if j <= k:
+            current[0] = j
+        best = current[0]
+        for i in range(max(1, j - k), min(n, j + k) + 1):
+            ca = a[i - 1]
+            value = previous[i - 1] + (ca != cb)
+            if previous[i] + 1 < value:
+                value = previous[i] + 1
+            if current[i - 1] + 1 < value:
+                value = current[i - 1] + 1
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb and before[i - 2] + 1 < value:
+                value = before[i - 2] + 1
+            current[i] = value
+            if value < best:
+                best = value
+        if best > k:
+            return None
+        before, previous = previous, current
+    return previous[n] if previous[n] <= k else None
+
+
+class TrigramIndex:
+    """Posting lists (trigram, word length) -> word ids."""
+
+    def __init__(self, words: Iterable[str]):
+        self.words: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._postings: Dict[Tuple[str, int], array] = {}
+        self._masks = array("Q")
+        for word in words:
+            self._add(word)
+        self.queries = 0
+        self.candidates = 0
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self._ids
+
+    def _add(self, word: str):
+        if word in self._ids:
+            return
+        word_id = self._ids[word] = len(self.words)
+        self.words.append(word)
+        self._masks.append(letter_mask(word))
+        for gram in set(trigrams(word)):
+            postings = self._postings.get((gram, len(word)))
+            if postings is None:
+                postings = self._postings[(gram, len(word))] = array("i")
+            postings.append(word_id)
+
+    def search(self, query: str, max_edits: Optional[int] = None, limit: int = 3) -> List[Tuple[str, int]]:
+        """Up to `limit` (word, distance) pairs within the edit budget, closest first (an exact hit included)."""
+        k = edit_budget(query) if max_edits is None else max_edits
+        self.queries += 1
+        found = [(0, query)] if query in self._ids else []
+        grams = set(trigrams(query))
+        need = len(grams) - GRAMS_PER_EDIT * k      # distinct query trigrams any match still contains
+        if k > 0 and need > 0:
+            postings = self._postings
+            ids = set()
+            for length in range(max(1, len(query) - k), len(query) + k + 1):
+                rarest = sorted(grams, key=lambda g: len(postings.get((g, length), ())))[:GRAMS_PER_EDIT * k + 1]
+                for gram in rarest:
+                    ids.update(postings.get((gram, length), ()))
+            mask = letter_mask(query)
+            masks = self._masks
+            for word_id in ids:
+                # letters only one side has each need an edit: a lower bound of the distance
+                other = masks[word_id]
+                if bin(mask & ~other).count("1") > k or bin(other & ~mask).count("1") > k:
+                    continue
+                word = self.words[word_id]
+                if word == query or len(grams.intersection(trigrams(word))) < need:
+                    continue
+                self.candidates += 1
+                distance = bounded_levenshtein(query, word, k)
+                if distance is not None:
+                    found.append((distance, word))
+            found.sort()
+        if found:
+            self.hits += 1
+        return [(word, distance) for distance, word in found[:limit]]
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "words": len(self.words),
+            "posting_lists": len(self._postings),
+            "queries": self.queries,
+            "hits": self.hits,
+            "avg_candidates": round(self.candidates / self.queries, 2) if self.queries else 0.0,
+        }
+
+
+def _normalise(name: str) -> str:
+    return " ".join(food_matcher.split_words(name))
+
+
+class FoodIndex:
+    """Normalised food names -> food keys, with a TrigramIndex over their words."""
+
+    def __init__(self, patterns: Dict[str, str]):
+        self.keys: Dict[str, str] = {}
+        for surface, key in patterns.items():
+            name = _normalise(surface)
+            # queries are letters only, so names with numbers or codes can never be reached
+            if name and name.replace(" ", "").isalpha():
+                self.keys[name] = key
+        self.index = TrigramIndex(word for name in self.keys for word in name.split())
+        # the index never changes after construction, so lookups are memoised per instance
+        self.lookup = functools.lru_cache(maxsize=LOOKUP_MEMO_SIZE)(self._lookup)
+
+    def _options(self, word: str) -> List[Tuple[str, int]]:
+        options = self.index.search(word, limit=CANDIDATES_PER_WORD)
+        # plural of a misspelt word: "banannas" -> "bananna" -> "banana"
+        if word.endswith("s") and (not options or options[0][1] > 0):
+            options = sorted(options + self.index.search(word[:-1], limit=CANDIDATES_PER_WORD), key=lambda o: o[1])
+        return options
+
+    def _lookup(self, name: str) -> Optional[str]:
+        """Food key of the closest existing name within the phrase's edit budget, else None."""
+        query = _normalise(name)
+        words = query.split()
+        if not words or len(words) > MAX_PHRASE_WORDS:
+            return None
+        budget = edit_budget(query)
+        options = []
+        for word in words:
+            found = self._options(word)
+            if not found:
+                return None
+            options.append(found)
+        best = None
+        for combo in itertools.product(*options):
+            distance = sum(d for _, d in combo)
+            if distance > budget or (best is not None and distance >= best[0]):
+                continue
+            phrase = " ".join(w for w, _ in combo)
+            if phrase in self.keys:
+                best = (distance, phrase)
+        return self.keys[best[1]] if best else None
+
+    def stats(self) -> Dict[str, object]:
+        memo = self.lookup.cache_info()
+        return {"names": len(self.keys), **self.index.stats(), "memo_hits": memo.hits, "memo_size": memo.currsize}
+
+
+_lock = threading.Lock()
+_compiled: Optional[Tuple[int, FoodIndex]] = None       # (table signature, index), swapped atomically
+_large: Dict[str, Tuple[Hashable, FoodIndex]] = {}     # label -> (version, index)
+_building = set()                   # (label, version) pairs with a background build running
+_failed: Dict[Tuple[str, Hashable], float] = {}         # (label, version) -> time of the last failed build
+_build_lock = threading.Lock()      # large builds, so they never block for_table()
+RETRY_FAILED_S = 60.0
+
+
+def for_table(
+    food_db: Dict[str, object],
+    synonyms: Dict[str, Iterable[str]],
+    resolve: Callable[[str], Optional[str]],
+) -> FoodIndex:
+    """Index over the food table's keys and synonyms (synonym -> resolve(synonym)), rebuilt on name changes."""
+    global _compiled
+    signature = food_matcher.table_signature(food_db, synonyms)
+    compiled = _compiled
+    if compiled is not None and compiled[0] == signature:
+        return compiled[1]
+    with _lock:
+        if _compiled is None or _compiled[0] != signature:
+            patterns: Dict[str, str] = {}
+            for group in synonyms.values():
+                for syn in group:
+                    key = resolve(syn)
+                    if key:
+                        patterns[syn] = key
+            patterns.update({key: key for key in food_db})
+            _compiled = (signature, FoodIndex(patterns))
+        return _compiled[1]
+
+
+def _built(label: str, version: Hashable) -> Optional[FoodIndex]:
+    entry = _large.get(label)
+    return entry[1] if entry is not None and entry[0] == version else None
+
+
+def for_names(
+    label: str,
+    names: Callable[[], Iterable[str]],
+    wait: bool = True,
+    version: Hashable = None,
+) -> Optional[FoodIndex]:
+    """
+    Index over a large, fixed name list (each name its own key), built once per label and
+    version; pass the identity of the names' source as version so a changed source replaces
+    the index. With wait=False the build runs in a background thread and None is returned
+    until it is done (and for RETRY_FAILED_S after a failed build).
+    """
+    index = _built(label, version)
+    key = (label, version)
+    if index is not None or (not wait and key in _building):
+        return index
+    if not wait:
+        with _lock:
+            if key not in _building and time.time() - _failed.get(key, 0.0) >= RETRY_FAILED_S:
+                _building.add(key)
+                threading.Thread(target=_build_in_background, args=(label, names, version),
+                                 daemon=True, name=f"fuzzy-{label}").start()
+        return _built(label, version)
+    with _build_lock:
+        index = _built(label, version)
+        if index is None:
+            t = time.perf_counter()
+            index = FoodIndex({name: name for name in names()})
+            _large[label] = (version, index)
+            print(f"[fuzzy_index] indexed {len(index.keys)} {label} names ({len(index.index)} words) in {time.perf_counter() - t:.1f}s")
+    return index
+
+
+def _build_in_background(label: str, names: Callable[[], Iterable[str]], version: Hashable):
+    key = (label, version)
+    try:
+        for_names(label, names, version=version)
+        _failed.pop(key, None)
+    except Exception as e:
+        _failed[key] = time.time()
+        print(f"[fuzzy_index] ❌ building the {label} index failed: {e}")
+    finally:
+        with _lock:
+            _building.discard(key)
+
+
+def is_ready(label: str, version: Hashable = None) -> bool:
+    """Whether the for_names() index for label and version has been built."""
+    return _built(label, version) is not None
+
+
+def stats() -> Dict[str, object]:
+    compiled = _compiled
+    out = {"max_edits": MAX_EDITS, "table": compiled[1].stats() if compiled else None}
+    for label, (_version, index) in list(_large.items()):
+        out[label] = index.stats()
+    return out
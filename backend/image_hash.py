@@ -0,0 +1,281 @@
+"""
+image_hash.py
+
+Perceptual-hash cache for photo analysis (fridge ingredients, recipe-from-photo).
+
+Retries, double taps and the same shelf photographed a minute later produce images that
+differ byte-for-byte but look the same, so a content hash never hits. Instead each photo
+gets a 64-bit difference hash (dHash: grayscale, shrink to 9x8, one bit per "left pixel
+brighter than right pixel"). Near-identical photos land within a few bits of each other,
+and a lookup returns the stored Gemini answer for the closest hash within
+IMAGE_CACHE_DISTANCE bits.
+
+Lookups use multi-index hashing: the hash is cut into 8 one-byte chunks, and each chunk
+has its own table of entries keyed by (namespace, chunk value). By the pigeonhole principle,
+two hashes that differ in at most 7 bits agree exactly on at least one chunk. So the
+candidates for a lookup are the union of 8 dict hits. Only those candidates are compared
+with a popcount, not the whole cache. Entries expire after IMAGE_CACHE_TTL and are
+evicted LRU beyond IMAGE_CACHE_MAX_ENTRIES.
+
+Environment:
+- IMAGE_CACHE_ENABLED     (default "1")
+- IMAGE_CACHE_MAX_ENTRIES (default 512)
+- IMAGE_CACHE_DISTANCE    (default 6)    max Hamming distance (bits of 64) counted as a hit
+- IMAGE_CACHE_TTL         (default 21600) seconds
+"""
+import io
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+CACHE_ENABLED = os.getenv("IMAGE_CACHE_ENABLED", "1") == "1"
+CACHE_MAX_ENTRIES = int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "512"))
+# multi-index lookup is exact up to CHUNKS - 1 differing bits; larger values fall back to a scan
+MAX_DISTANCE = int(os.getenv("IMAGE_CACHE_DISTANCE", "6"))
+CACHE_TTL = float(os.getenv("IMAGE_CACHE_TTL", str(6 * 3600)))
+
+HASH_BITS = 64
+CHUNKS = 8
+CHUNK_BITS = HASH_BITS // CHUNKS
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+
+# ---------------- Hashing ----------------
+
+def dhash(im: "Image.Image") -> int:
+    """64-bit difference hash of a PIL image."""
+    small = im.convert("L").resize((9, 8), Image.LANCZOS)
+    px = small.load()
+    value = 0
+    for y in range(8):
+        for x in range(8):
+            value = (value << 1) | (px[x, y] > px[x + 1, y])
+    return value
+
+
+def image_dhash(image: Any) -> Optional[int]:
+    """
+    dHash of what the photo routes hand to Gemini: a PreparedImage (uses the hash computed
+    during pre-processing when present), raw bytes, or a PIL image. None when unavailable.
+    """
+    precomputed = getattr(image, "dhash", None)
+    if precomputed is not None:
+        return precomputed
+    if not PIL_AVAILABLE:
+        return None
+    try:
+        if isinstance(image, Image.Image):
+            return dhash(image)
+        data = getattr(image, "data", image)
+        if isinstance(data, (bytes, bytearray)):
+            with Image.open(io.BytesIO(data)) as im:
+                im.draft("L", (64, 64))
+                return dhash(im)
+    except Exception as e:
+        print(f"[image_hash] dHash failed: {e}")
+    return None
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _chunks(value: int) -> List[int]:
+    return [(value >> (i * CHUNK_BITS)) & CHUNK_MASK for i in range(CHUNKS)]
+
+
+# ---------------- Cache ----------------
+
+class _Entry:
+    __slots__ = ("hash", "namespace", "value", "expires_at")
+
+    def __init__(self, hash_value: int, namespace: str, value: str, expires_at: float):
+        self.hash = hash_value
+        self.namespace = namespace
+        self.value = value
+        self.expires_at = expires_at
+
+
+class PerceptualCache:
+    """LRU of (namespace, 64-bit hash) -> value, looked up by Hamming distance."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, max_distance: int = MAX_DISTANCE, ttl: float = CACHE_TTL):
+        self.max_entries = max(1, max_entries)
+        self.max_distance = max(0, max_distance)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()   # entry id -> entry, LRU order
+        self._tables: List[Dict[Tuple[str, int], Set[int]]] = [{} for _ in range(CHUNKS)]
+        self._next_id = 0
+        self.counters = {"exact_hits": 0, "near_hits": 0, "misses": 0, "sets": 0,
+                         "evictions": 0, "expired": 0, "candidates": 0}
+        self.namespaces: Dict[str, Dict[str, int]] = {}
+
+    def _index(self, entry_id: int, entry: _Entry):
+        for table, chunk in zip(self._tables, _chunks(entry.hash)):
+            table.setdefault((entry.namespace, chunk), set()).add(entry_id)
+
+    def _drop(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        for table, chunk in zip(self._tables, _chunks(entry.hash)):
+            key = (entry.namespace, chunk)
+            ids = table.get(key)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del table[key]
+
+    def _candidates(self, hash_value: int, namespace: str) -> Iterable[int]:
+        if self.max_distance >= CHUNKS:
+            return [i for i, e in self._entries.items() if e.namespace == namespace]
+        found: Set[int] = set()
+        for table, chunk in zip(self._tables, _chunks(hash_value)):
+            ids = table.get((namespace, chunk))
+            if ids:
+                found.update(ids)
+        return found
+
+    def _nearest(self, hash_value: int, namespace: str, now: float) -> Tuple[Optional[int], int, int]:
+        """(closest live entry id, its distance, candidates examined); expired candidates are dropped."""
+        best_id, best_distance = None, HASH_BITS + 1
+        expired = []
+        candidates = self._candidates(hash_value, namespace)
+        for entry_id in candidates:
+            entry = self._entries[entry_id]
+            if entry.expires_at < now:
+                expired.append(entry_id)
+                continue
+            distance = hamming(hash_value, entry.hash)
+            if distance < best_distance:
+                best_id, best_distance = entry_id, distance
+        for entry_id in expired:
+            self._drop(entry_id)
+            self.counters["expired"] += 1
+        return best_id, best_distance, len(candidates)
+
+    def _count(self, namespace: str, field: str):
+        self.counters[field] += 1
+        ns = self.namespaces.setdefault(namespace, {"hits": 0, "misses": 0})
+        ns["hits" if field.endswith("hits") else "misses"] += 1
+
+    def get(self, hash_value: int, namespace: str = "default") -> Optional[Tuple[str, int]]:
+        """(value, distance) of the closest live entry within max_distance, else None."""
+        with self._lock:
+            entry_id, distance, examined = self._nearest(hash_value, namespace, time.time())
+            self.counters["candidates"] += examined
+            if entry_id is None or distance > self.max_distance:
+                self._count(namespace, "misses")
+                return None
+            self._entries.move_to_end(entry_id)
+            self._count(namespace, "exact_hits" if distance == 0 else "near_hits")
+            return self._entries[entry_id].value, distance
+
+    def set(self, hash_value: int, value: str, namespace: str = "default"):
+        with self._lock:
+            # a re-upload of the same photo replaces its entry instead of adding a twin
+            entry_id, distance, _ = self._nearest(hash_value, namespace, time.time())
+            if entry_id is not None and distance == 0:
+                self._drop(entry_id)
+            entry_id = self._next_id
+            self._next_id += 1
+            entry = _Entry(hash_value, namespace, value, time.time() + self.ttl)
+            self._entries[entry_id] = entry
+            self._index(entry_id, entry)
+            self.counters["sets"] += 1
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.counters["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for table in self._tables:
+                table.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            c = dict(self.counters)
+            hits = c["exact_hits"] + c["near_hits"]
+            lookups = hits + c["misses"]
+            return {
+                "enabled": CACHE_ENABLED and PIL_AVAILABLE,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "max_distance": self.max_distance,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "avg_candidates": round(c["candidates"] / lookups, 2) if lookups else 0.0,
+                **c,
+                "namespaces": {k: dict(v) for k, v in self.namespaces.items()},
+            }
+
+
+cache = PerceptualCache()
+
+
+def stats() -> Dict[str, Any]:
+    return cache.stats()
+
+
+# ---------------- Call wrappers ----------------
+
+def lookup(image: Any, namespace: str) -> Optional[str]:
+    """Cached answer for a perceptually similar photo, or None."""
+    hash_value = image_dhash(image) if CACHE_ENABLED else None
+    if hash_value is None:
+        return None
+    hit = cache.get(hash_value, namespace)
+    if hit is None:
+        return None
+    print(f"[image_hash] {namespace} hit at distance {hit[1]}")
+    return hit[0]
+
+
+def store(image: Any, namespace: str, value: str):
+    hash_value = image_dhash(image) if CACHE_ENABLED else None
+    if hash_value is not None and value:
+        cache.set(hash_value, value, namespace)
+
+
+def cached_call(
+    image: Any,
+    namespace: str,
+    compute: Callable[[], str],
+    validate: Optional[Callable[[str], bool]] = None,
+) -> str:
+    """Serve a vision call from the cache when a perceptually similar photo was answered
+    before; store only answers that pass `validate`."""
+    hit = lookup(image, namespace)
+    if hit is not None:
+        return hit
+    value = compute()
+    if value and (validate is None or validate(value)):
+        store(image, namespace, value)
+    return value
+
+
+def cached_stream(
+    image: Any,
+    namespace: str,
+    open_stream: Callable[[], Iterator[str]],
+    validate: Optional[Callable[[str], bool]] = None,
+) -> Iterator[str]:
+    """Streaming twin of cached_call: a hit is yielded whole, a completed miss is stored."""
+    hit = lookup(image, namespace)
+    if hit is not None:
+        yield hit
+        return
+    parts: List[str] = []
+    for chunk in open_stream():
+        parts.append(chunk)
+        yield chunk
+    value = "".join(parts)
+    if value and (validate is None or validate(value)):
+        store(image, namespace, value)
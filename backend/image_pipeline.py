@@ -0,0 +1,426 @@
+"""
+image_pipeline.py
+
+Pre-processing for photos before they are sent to Gemini vision (fridge, recipe extractor).
+
+A 12 MP phone photo decoded to RGB is ~36 MB and uploads as several MB of base64, while
+vision models work from a ~1 MP view anyway. preprocess_file() / preprocess_bytes():
+1. opens the image lazily (header only)
+2. asks the JPEG decoder for a reduced-scale decode with Image.draft (DCT scaling 1/2..1/8),
+   so the full-resolution frame is never materialised
+3. applies the EXIF orientation, then drops all metadata (EXIF, GPS, ICC)
+4. caps the long edge with thumbnail() and takes the perceptual hash (image_hash.dhash)
+   used by the photo cache
+5. re-encodes to JPEG or WebP, stepping quality down until the output fits IMAGE_MAX_BYTES
+
+Each stage is timed; per-request numbers are logged and running totals (including bytes
+saved) are exposed through stats() for the /health routes.
+
+Decoding and resizing a large JPEG holds the GIL for hundreds of milliseconds, which under
+app.run(threaded=True) stalls every other request in the process. So the work runs in a
+bounded ProcessPoolExecutor. The upload is copied into a shared-memory block, the worker
+writes the encoded output to another block, and only block names and small metadata
+cross the pipe. When IMAGE_PROCESS_MAX_PENDING photos are already queued,
+preprocess_file fails fast with PipelineBusy instead of queueing without limit. Queue
+depth, wait time (submit -> worker start) and run time are reported under
+stats()["process_pool"].
+
+Environment:
+- IMAGE_PREPROCESS_ENABLED (default "1")
+- IMAGE_MAX_EDGE           (default 1024)   long edge in pixels
+- IMAGE_FORMAT             (default "JPEG") JPEG or WEBP
+- IMAGE_QUALITY            (default 82)     starting encoder quality
+- IMAGE_MIN_QUALITY        (default 50)     lowest quality tried before giving up on the byte cap
+- IMAGE_MAX_BYTES          (default 400000) target size of the re-encoded image
+- IMAGE_PROCESS_WORKERS    (default min(4, cpu count)) pool processes; 0 prepares in the request thread
+- IMAGE_PROCESS_MAX_PENDING (default 4 x workers) queued + running photos before PipelineBusy
+- IMAGE_PROCESS_TIMEOUT    (default 30) seconds to wait for one photo
+"""
+import io
+import os
+import time
+import threading
+import multiprocessing as mp
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import IO, Any, Dict, Optional
+
+import image_hash
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+PREPROCESS_ENABLED = os.getenv("IMAGE_PREPROCESS_ENABLED", "1") == "1"
+MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "1024"))
+OUTPUT_FORMAT = os.getenv("IMAGE_FORMAT", "JPEG").upper()
+QUALITY = int(os.getenv("IMAGE_QUALITY", "82"))
+MIN_QUALITY = int(os.getenv("IMAGE_MIN_QUALITY", "50"))
+MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", "400000"))
+POOL_WORKERS = int(os.getenv("IMAGE_PROCESS_WORKERS", str(min(4, os.cpu_count() or 1))))
+POOL_MAX_PENDING = int(os.getenv("IMAGE_PROCESS_MAX_PENDING", str(POOL_WORKERS * 4)))
+POOL_TIMEOUT = float(os.getenv("IMAGE_PROCESS_TIMEOUT", "30"))
+CHUNK_SIZE = 256 * 1024
+
+_MIME = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png", "GIF": "image/gif"}
+STAGES = ("open", "decode", "resize", "encode")
+
+
+class PipelineBusy(RuntimeError):
+    """The process pool already has IMAGE_PROCESS_MAX_PENDING photos queued; answer 503."""
+
+
+class PreparedImage:
+    """Re-encoded image bytes ready for the LLM, plus what it cost to produce them."""
+    __slots__ = ("data", "mime_type", "size", "original_size", "original_bytes", "quality", "timings_ms", "dhash")
+
+    def __init__(self, data: bytes, mime_type: str, size: tuple, original_size: tuple,
+                 original_bytes: int, quality: Optional[int], timings_ms: Dict[str, float],
+                 dhash: Optional[int] = None):
+        self.data = data
+        self.mime_type = mime_type
+        self.size = size
+        self.original_size = original_size
+        self.original_bytes = original_bytes
+        self.quality = quality
+        self.timings_ms = timings_ms
+        self.dhash = dhash
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "original": {"size": list(self.original_size), "bytes": self.original_bytes},
+            "sent": {"size": list(self.size), "bytes": len(self.data), "mime": self.mime_type, "quality": self.quality},
+            "bytes_saved": self.original_bytes - len(self.data),
+            "timings_ms": self.timings_ms,
+        }
+
+
+class _PipelineStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.images = 0
+        self.passthrough = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.stage_ms = {stage: 0.0 for stage in STAGES}
+
+    def record(self, prepared: PreparedImage, passthrough: bool = False):
+        with self._lock:
+            self.images += 1
+            self.passthrough += int(passthrough)
+            self.bytes_in += prepared.original_bytes
+            self.bytes_out += len(prepared.data)
+            for stage, ms in prepared.timings_ms.items():
+                if stage in self.stage_ms:
+                    self.stage_ms[stage] += ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            n = self.images or 1
+            return {
+                "enabled": PREPROCESS_ENABLED and PIL_AVAILABLE,
+                "max_edge": MAX_EDGE,
+                "format": OUTPUT_FORMAT,
+                "images": self.images,
+                "passthrough": self.passthrough,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "bytes_saved": self.bytes_in - self.bytes_out,
+                "avg_bytes_saved": round((self.bytes_in - self.bytes_out) / n),
+                "avg_stage_ms": {stage: round(ms / n, 2) for stage, ms in self.stage_ms.items()},
+                "process_pool": _pool.snapshot() if _pool is not None else None,
+            }
+
+
+_stats = _PipelineStats()
+
+
+def stats() -> Dict[str, Any]:
+    return _stats.snapshot()
+
+
+def _to_rgb(im: "Image.Image") -> "Image.Image":
+    if im.mode == "RGB":
+        return im
+    if im.mode in ("RGBA", "LA") or (im.mode == "P" and "transparency" in im.info):
+        # flatten transparency onto white instead of the black a plain convert() gives
+        im = im.convert("RGBA")
+        background = Image.new("RGB", im.size, (255, 255, 255))
+        background.paste(im, mask=im.getchannel("A"))
+        return background
+    return im.convert("RGB")
+
+
+def _encode(im: "Image.Image", fmt: str, quality: int, max_bytes: int):
+    quality = max(quality, MIN_QUALITY)
+    while True:
+        buf = io.BytesIO()
+        if fmt == "WEBP":
+            im.save(buf, format="WEBP", quality=quality, method=4)
+        else:
+            im.save(buf, format="JPEG", quality=quality, optimize=True, progressive=True)
+        data = buf.getvalue()
+        if len(data) <= max_bytes or quality <= MIN_QUALITY:
+            return data, quality
+        quality = max(MIN_QUALITY, quality - 10)
+
+
+def _passthrough(fileobj: IO[bytes], mime_type: str, started: float) -> PreparedImage:
+    fileobj.seek(0)
+    raw = fileobj.read()
+    prepared = PreparedImage(raw, mime_type, (0, 0), (0, 0), len(raw), None,
+                             {"open": round((time.perf_counter() - started) * 1000, 2)})
+    _stats.record(prepared, passthrough=True)
+    return prepared
+
+
+def _prepare(
+    fileobj: IO[bytes],
+    mime_type: str,
+    size: int,
+    max_edge: Optional[int] = None,
+    fmt: Optional[str] = None,
+    quality: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+) -> PreparedImage:
+    """The decode -> resize -> encode work itself; runs in a pool worker or the calling thread."""
+    max_edge = max_edge or MAX_EDGE
+    fmt = (fmt or OUTPUT_FORMAT).upper()
+    if fmt not in ("JPEG", "WEBP"):
+        fmt = "JPEG"
+    timings: Dict[str, float] = {}
+
+    t = time.perf_counter()
+    im = Image.open(fileobj)
+    original_size = im.size
+    timings["open"] = (time.perf_counter() - t) * 1000
+
+    t = time.perf_counter()
+    scale = max_edge / max(original_size) if max(original_size) > max_edge else 1.0
+    if im.format == "JPEG" and scale < 1.0:
+        # draft() only picks a DCT scale that keeps the result >= the requested size
+        im.draft("RGB", (max(1, int(original_size[0] * scale)), max(1, int(original_size[1] * scale))))
+    im = ImageOps.exif_transpose(im)
+    im = _to_rgb(im)
+    timings["decode"] = (time.perf_counter() - t) * 1000
+
+    t = time.perf_counter()
+    im.thumbnail((max_edge, max_edge), Image.LANCZOS, reducing_gap=2.0)
+    dhash = image_hash.dhash(im)
+    timings["resize"] = (time.perf_counter() - t) * 1000
+
+    t = time.perf_counter()
+    data, used_quality = _encode(im, fmt, quality or QUALITY, max_bytes or MAX_BYTES)
+    timings["encode"] = (time.perf_counter() - t) * 1000
+
+    timings = {stage: round(ms, 2) for stage, ms in timings.items()}
+    return PreparedImage(data, _MIME[fmt], im.size, original_size, size, used_quality, timings, dhash)
+
+
+# ---------------- Process pool ----------------
+
+def _unlink(block: shared_memory.SharedMemory):
+    block.close()
+    block.unlink()
+
+
+def _pool_worker(in_name: str, in_size: int, mime_type: str, options: Dict[str, Any], submitted_at: float):
+    """
+    Runs in a pool process. The upload is read from shared memory block `in_name` and the
+    encoded output is written to a new block, so only names and small metadata are pickled.
+    """
+    started_at = time.time()
+    block = shared_memory.SharedMemory(name=in_name)
+    try:
+        prepared = _prepare(io.BytesIO(block.buf[:in_size]), mime_type, in_size, **options)
+    finally:
+        block.close()
+    out = shared_memory.SharedMemory(create=True, size=max(1, len(prepared.data)))
+    out.buf[:len(prepared.data)] = prepared.data
+    out_name = out.name
+    out.close()
+    meta = (prepared.mime_type, prepared.size, prepared.original_size, prepared.quality,
+            prepared.timings_ms, prepared.dhash)
+    return out_name, len(prepared.data), meta, started_at - submitted_at, time.time() - started_at
+
+
+class _ProcessPool:
+    """Bounded ProcessPoolExecutor wrapper with queue-depth and wait-time counters."""
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max(workers, max_pending)
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.pending = 0
+        self.peak_pending = 0
+        self.counters = {"submitted": 0, "completed": 0, "rejected": 0, "failed": 0, "restarts": 0}
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self.run_ms_total = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a threaded server can copy locks held by other threads
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=mp.get_context("spawn"))
+        return self._executor
+
+    def _acquire(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.counters["rejected"] += 1
+                raise PipelineBusy(f"Image pipeline saturated ({self.pending} photos queued)")
+            self.pending += 1
+            self.peak_pending = max(self.peak_pending, self.pending)
+            self.counters["submitted"] += 1
+            return self._get_executor()
+
+    def _release(self, wait_s: float = 0.0, run_s: float = 0.0, failed: bool = False):
+        with self._lock:
+            self.pending -= 1
+            if failed:
+                self.counters["failed"] += 1
+                return
+            self.counters["completed"] += 1
+            self.wait_ms_total += wait_s * 1000
+            self.wait_ms_max = max(self.wait_ms_max, wait_s * 1000)
+            self.run_ms_total += run_s * 1000
+
+    def _restart(self, executor: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+                self.counters["restarts"] += 1
+        executor.shutdown(wait=False)
+
+    def _abandon(self, future: Future, block: shared_memory.SharedMemory):
+        """
+        Clean-up for a submitted job whose result the caller will not read (timeout, worker
+        error). A job still queued is cancelled. Otherwise the job keeps its input block and its
+        pending slot until it has finished; then its output block (if any) is unlinked too.
+        """
+        if future.cancel():
+            _unlink(block)
+            self._release(failed=True)
+            return
+
+        def finished(done: Future):
+            try:
+                if not done.cancelled() and done.exception() is None:
+                    _unlink(shared_memory.SharedMemory(name=done.result()[0]))
+            finally:
+                _unlink(block)
+                self._release(failed=True)
+
+        future.add_done_callback(finished)
+
+    def run(self, fileobj: IO[bytes], mime_type: str, size: int, options: Dict[str, Any]) -> PreparedImage:
+        executor = self._acquire()
+        block = None
+        future = None
+        try:
+            block = shared_memory.SharedMemory(create=True, size=max(1, size))
+            fileobj.seek(0)
+            offset = 0
+            while offset < size:
+                chunk = fileobj.read(min(CHUNK_SIZE, size - offset))
+                if not chunk:
+                    break
+                block.buf[offset:offset + len(chunk)] = chunk
+                offset += len(chunk)
+            future = executor.submit(_pool_worker, block.name, offset, mime_type, options, time.time())
+            out_name, out_size, meta, wait_s, run_s = future.result(timeout=POOL_TIMEOUT)
+        except BaseException as e:
+            if future is not None:
+                self._abandon(future, block)
+            else:
+                if block is not None:
+                    _unlink(block)
+                self._release(failed=True)
+            if isinstance(e, BrokenProcessPool):
+                self._restart(executor)
+            raise
+        _unlink(block)
+        self._release(wait_s, run_s)
+
+        out = shared_memory.SharedMemory(name=out_name)
+        try:
+            data = bytes(out.buf[:out_size])
+        finally:
+            _unlink(out)
+        mime, out_dims, original_size, used_quality, timings, dhash = meta
+        timings = dict(timings, queue_wait=round(wait_s * 1000, 2))
+        return PreparedImage(data, mime, out_dims, original_size, size, used_quality, timings, dhash)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            done = self.counters["completed"] or 1
+            return {
+                "workers": self.workers,
+                "started": self._executor is not None,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "peak_pending": self.peak_pending,
+                **self.counters,
+                "avg_wait_ms": round(self.wait_ms_total / done, 2),
+                "max_wait_ms": round(self.wait_ms_max, 2),
+                "avg_run_ms": round(self.run_ms_total / done, 2),
+            }
+
+
+_pool = _ProcessPool(POOL_WORKERS, POOL_MAX_PENDING) if POOL_WORKERS > 0 else None
+
+
+# ---------------- Public API ----------------
+
+def preprocess_bytes(raw: bytes, mime_type: str = "image/jpeg", **options) -> PreparedImage:
+    """preprocess_file for an image already held in memory."""
+    return preprocess_file(io.BytesIO(raw), mime_type, len(raw), **options)
+
+
+def preprocess_file(
+    fileobj: IO[bytes],
+    mime_type: str = "image/jpeg",
+    size: Optional[int] = None,
+    max_edge: Optional[int] = None,
+    fmt: Optional[str] = None,
+    quality: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+) -> PreparedImage:
+    """
+    Downscale and re-encode an uploaded photo (see module docstring). `fileobj` is any
+    seekable binary file (BytesIO, spooled upload). With IMAGE_PROCESS_WORKERS > 0 the work
+    runs in the process pool and PipelineBusy is raised when IMAGE_PROCESS_MAX_PENDING photos
+    are already queued; otherwise PIL reads `fileobj` lazily in the calling thread. When
+    pre-processing is disabled or Pillow is missing the original bytes are passed through
+    unchanged; an undecodable image raises, like Image.open would.
+    """
+    started = time.perf_counter()
+    if not PREPROCESS_ENABLED or not PIL_AVAILABLE:
+        return _passthrough(fileobj, mime_type, started)
+    if size is None:
+        fileobj.seek(0, io.SEEK_END)
+        size = fileobj.tell()
+    fileobj.seek(0)
+
+    options = {"max_edge": max_edge, "fmt": fmt, "quality": quality, "max_bytes": max_bytes}
+    if _pool is not None:
+        try:
+            prepared = _pool.run(fileobj, mime_type, size, options)
+        except BrokenProcessPool as e:
+            print(f"[image_pipeline] ❌ process pool broke ({e}); preparing in-thread")
+            fileobj.seek(0)
+            prepared = _prepare(fileobj, mime_type, size, **options)
+    else:
+        prepared = _prepare(fileobj, mime_type, size, **options)
+
+    _stats.record(prepared)
+    print(
+        f"[image_pipeline] {prepared.original_size[0]}x{prepared.original_size[1]} {size}B -> "
+        f"{prepared.size[0]}x{prepared.size[1]} {len(prepared.data)}B "
+        f"({prepared.mime_type} q{prepared.quality}) stages(ms)={prepared.timings_ms}"
+    )
+    return prepared
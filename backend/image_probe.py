@@ -0,0 +1,232 @@
+"""
+image_probe.py
+
+Header-only image probing: format and pixel size read from the first bytes of an image,
+used by nutrition_extractor for its size-based image estimate.
+
+The JSON route gets the photo as a base64 data URI. Decoding all of it (and having PIL
+parse it) just to read `im.size` cost a full-size bytes object per request. probe_base64()
+decodes only a leading slice of the base64 text (PROBE_INITIAL_BYTES, growing x4 up to
+PROBE_MAX_BYTES). From that slice it parses the:
+- JPEG SOFn segment (walking APPn/EXIF segments before it)
+- PNG IHDR chunk
+- GIF logical screen descriptor
+- WebP VP8 / VP8L / VP8X header
+
+A full decode happens only when the format is none of these, the header is not found
+within PROBE_MAX_BYTES, or the prefix is not clean base64. probe_file() does the same for spooled uploads.
+
+Environment:
+- IMAGE_PROBE_INITIAL_BYTES (default 2048)
+- IMAGE_PROBE_MAX_BYTES     (default 262144)
+"""
+import binascii
+import io
+import os
+import struct
+import threading
+from typing import IO, Any, Dict, Optional, Tuple
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+PROBE_INITIAL_BYTES = int(os.getenv("IMAGE_PROBE_INITIAL_BYTES", "2048"))
+PROBE_MAX_BYTES = int(os.getenv("IMAGE_PROBE_MAX_BYTES", str(256 * 1024)))
+
+# SOFn markers carry the frame size; C4 (DHT), C8 (JPG) and CC (DAC) share the range but do not
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_JPEG_STANDALONE = {0x01} | set(range(0xD0, 0xD8))
+
+ProbeResult = Tuple[str, int, int]      # (format, width, height)
+
+
+class _NeedMore(Exception):
+    """The header continues past the bytes decoded so far."""
+
+
+def _need(buf: bytes, end: int):
+    if len(buf) < end:
+        raise _NeedMore()
+
+
+def _probe_jpeg(buf: bytes) -> Optional[ProbeResult]:
+    i = 2
+    while True:
+        _need(buf, i + 2)
+        if buf[i] != 0xFF:
+            return None
+        marker = buf[i + 1]
+        if marker == 0xFF:              # fill byte
+            i += 1
+            continue
+        if marker in _JPEG_STANDALONE:
+            i += 2
+            continue
+        if marker in (0xD9, 0xDA):      # EOI / start of scan before any SOF
+            return None
+        _need(buf, i + 4)
+        (length,) = struct.unpack(">H", buf[i + 2:i + 4])
+        if marker in _JPEG_SOF:
+            _need(buf, i + 9)
+            height, width = struct.unpack(">HH", buf[i + 5:i + 9])
+            return ("JPEG", width, height) if width and height else None
+        i += 2 + length
+
+
+def _probe_png(buf: bytes) -> Optional[ProbeResult]:
+    _need(buf, 24)
+    if buf[12:16] != b"IHDR":
+        return None
+    width, height = struct.unpack(">II", buf[16:24])
+    return "PNG", width, height
+
+
+def _probe_gif(buf: bytes) -> Optional[ProbeResult]:
+    _need(buf, 10)
+    width, height = struct.unpack("<HH", buf[6:10])
+    return "GIF", width, height
+
+
+def _probe_webp(buf: bytes) -> Optional[ProbeResult]:
+    _need(buf, 30)
+    chunk = buf[12:16]
+    if chunk == b"VP8 ":
+        if buf[23:26] != b"\x9d\x01\x2a":
+            return None
+        width, height = struct.unpack("<HH", buf[26:30])
+        return "WEBP", width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L":
+        if buf[20] != 0x2F:
+            return None
+        (bits,) = struct.unpack("<I", buf[21:25])
+        return "WEBP", (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X":
+        width = int.from_bytes(buf[24:27], "little") + 1
+        height = int.from_bytes(buf[27:30], "little") + 1
+        return "WEBP", width, height
+    return None
+
+
+def probe_bytes(buf: bytes) -> Optional[ProbeResult]:
+    """(format, width, height) from the start of an encoded image; None when unrecognised.
+    Raises _NeedMore when `buf` stops inside the header."""
+    _need(buf, 12)
+    if buf[:3] == b"\xff\xd8\xff":
+        return _probe_jpeg(buf)
+    if buf[:8] == b"\x89PNG\r\n\x1a\n":
+        return _probe_png(buf)
+    if buf[:6] in (b"GIF87a", b"GIF89a"):
+        return _probe_gif(buf)
+    if buf[:4] == b"RIFF" and buf[8:12] == b"WEBP":
+        return _probe_webp(buf)
+    return None
+
+
+# ---------------- Counters ----------------
+
+class _ProbeStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {"header": 0, "fallback": 0, "unknown": 0, "bytes_decoded": 0, "bytes_total": 0}
+
+    def record(self, outcome: str, decoded: int, total: int):
+        with self._lock:
+            self.counters[outcome] += 1
+            self.counters["bytes_decoded"] += decoded
+            self.counters["bytes_total"] += total
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            c = dict(self.counters)
+            probes = c["header"] + c["fallback"] + c["unknown"]
+            c["header_rate"] = round(c["header"] / probes, 4) if probes else 0.0
+            c["decoded_fraction"] = round(c["bytes_decoded"] / c["bytes_total"], 4) if c["bytes_total"] else 0.0
+            return c
+
+
+_stats = _ProbeStats()
+
+
+def stats() -> Dict[str, Any]:
+    return _stats.snapshot()
+
+
+# ---------------- Probes ----------------
+
+def _pil_size(fileobj: IO[bytes]) -> Optional[ProbeResult]:
+    if not PIL_AVAILABLE:
+        return None
+    try:
+        fileobj.seek(0)
+        im = Image.open(fileobj)
+        return im.format or "", im.size[0], im.size[1]
+    except Exception:
+        return None
+
+
+def probe_base64(b64: str, start: int = 0) -> Optional[ProbeResult]:
+    """
+    Probe the base64 payload that begins at b64[start] (e.g. just after a data URI's comma,
+    so the caller need not copy the payload out) by decoding only its first bytes; fall back to decoding the whole payload when the header is not found that way
+    (unknown format, header past PROBE_MAX_BYTES, whitespace in the base64).
+    """
+    length = len(b64) - start
+    total = length * 3 // 4
+    want = PROBE_INITIAL_BYTES
+    while True:
+        chars = -(-want // 3) * 4           # whole 4-char groups covering `want` bytes
+        try:
+            head = binascii.a2b_base64(b64[start:start + chars])
+            result = probe_bytes(head)
+        except _NeedMore:
+            if chars < length and want < PROBE_MAX_BYTES:
+                want *= 4
+                continue
+            result = None
+        except (binascii.Error, ValueError):
+            result = None
+        break
+    if result:
+        _stats.record("header", len(head), total)
+        return result
+
+    try:
+        raw = binascii.a2b_base64(b64[start:])
+    except (binascii.Error, ValueError):
+        _stats.record("unknown", 0, total)
+        return None
+    try:
+        result = probe_bytes(raw)
+    except _NeedMore:
+        result = None
+    result = result or _pil_size(io.BytesIO(raw))
+    _stats.record("fallback" if result else "unknown", len(raw), len(raw))
+    return result
+
+
+def probe_file(fileobj: IO[bytes], size: Optional[int] = None) -> Optional[ProbeResult]:
+    """probe_base64 for a seekable binary upload: reads a growing head, PIL as the fallback."""
+    if size is None:
+        fileobj.seek(0, os.SEEK_END)
+        size = fileobj.tell()
+    want = PROBE_INITIAL_BYTES
+    while True:
+        fileobj.seek(0)
+        head = fileobj.read(want)
+        try:
+            result = probe_bytes(head)
+        except _NeedMore:
+            if len(head) == want and want < PROBE_MAX_BYTES:
+                want *= 4
+                continue
+            result = None
+        break
+    if result:
+        _stats.record("header", len(head), size)
+        return result
+    result = _pil_size(fileobj)
+    _stats.record("fallback" if result else "unknown", size, size)
+    return result
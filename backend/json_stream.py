@@ -0,0 +1,187 @@
+"""
+json_stream.py
+
+Push-style incremental parser for the recipe JSON that the LLMs stream back
+(title, ingredients, instructions, nutritional_info, ...).
+
+Feed it text chunks as they arrive; it returns events as soon as something closes:
+- {"type": "field", "field": "title", "value": "Dal Tadka"}           a top-level member
+- {"type": "item",  "field": "ingredients", "index": 0, "value": {...}} an element of a top-level array
+- {"type": "end",   "field": "ingredients", "count": 7}               a top-level array closed
+
+Text before the root object (code fences, prose) is ignored. The scanner's working buffer
+holds only the current top-level member, so re-slicing a value costs at most the largest
+single field. The full text is kept as well (text()), so memory grows with the whole
+response: result() parses it with llm_json (including repair) once the stream is over, so
+members the events could not name (e.g. unquoted keys) still end up in the final recipe.
+"""
+import json
+from typing import Any, Dict, List, Optional
+
+import llm_json
+
+_WS = " \t\r\n"
+
+
+def _decode(raw: str) -> Any:
+    raw = raw.strip()
+    try:
+        return json.loads(raw, strict=False)
+    except Exception:
+        value = llm_json.parse_json_from_text(raw)
+        return value if value is not None else raw
+
+
+class RecipeStreamParser:
+    def __init__(self):
+        self._chunks: List[str] = []
+        self._buf = ""            # text of the current top-level member
+        self._base = 0            # absolute offset of _buf[0]
+        self._pos = 0             # absolute offset of the next unread char
+        self._started = False
+        self.finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._str_start = -1
+        # current top-level member
+        self._expect_key = True
+        self._key_start = -1
+        self._key: Optional[str] = None
+        self._value_start = -1
+        self._value_is_array = False
+        self._item_start = -1
+        self._item_index = 0
+
+    def _slice(self, start: int, end: int) -> str:
+        return self._buf[start - self._base:end - self._base]
+
+    def _emit_field(self, end: int, events: List[Dict[str, Any]]):
+        if self._key is not None:
+            events.append({"type": "field", "field": self._key, "value": _decode(self._slice(self._value_start, end))})
+        self._value_start = -1
+
+    def _emit_item(self, end: int, events: List[Dict[str, Any]]):
+        if self._key is not None:
+            events.append({
+                "type": "item",
+                "field": self._key,
+                "index": self._item_index,
+                "value": _decode(self._slice(self._item_start, end)),
+            })
+        self._item_index += 1
+        self._item_start = -1
+
+    def _next_member(self, offset: int):
+        self._expect_key = True
+        self._key = None
+        self._value_start = -1
+        self._value_is_array = False
+        self._item_start = -1
+        self._item_index = 0
+        # nothing before `offset` is needed any more
+        self._buf = self._buf[offset - self._base:]
+        self._base = offset
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Consume a chunk of model output; return the events it completed."""
+        events: List[Dict[str, Any]] = []
+        if not chunk or self.finished:
+            return events
+        self._chunks.append(chunk)
+        self._buf += chunk
+        i = self._pos
+        end_of_data = self._base + len(self._buf)
+        while i < end_of_data:
+            c = self._buf[i - self._base]
+            i += 1
+            at = i - 1
+
+            if not self._started:
+                if c == "{":
+                    self._started = True
+                    self._depth = 1
+                    self._next_member(i)
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._string_closed(at, events)
+                continue
+
+            depth = self._depth
+            in_array_member = depth == 2 and self._value_is_array
+
+            if c == '"':
+                self._in_string = True
+                self._str_start = at
+                if depth == 1:
+                    if self._expect_key:
+                        self._key_start = at
+                    elif self._value_start < 0:
+                        self._value_start = at
+                elif in_array_member and self._item_start < 0:
+                    self._item_start = at
+            elif c == "{" or c == "[":
+                if depth == 1 and not self._expect_key and self._value_start < 0:
+                    self._value_start = at
+                    self._value_is_array = c == "["
+                elif in_array_member and self._item_start < 0:
+                    self._item_start = at
+                self._depth += 1
+            elif c == "}" or c == "]":
+                if in_array_member and self._item_start >= 0:
+                    self._emit_item(at, events)           # trailing primitive element
+                elif depth == 1 and self._value_start >= 0:
+                    self._emit_field(at, events)          # trailing primitive member
+                self._depth -= 1
+                if self._depth == 0:
+                    self.finished = True
+                    break
+                if self._depth == 2 and self._value_is_array and self._item_start >= 0:
+                    self._emit_item(i, events)
+                elif self._depth == 1 and self._value_start >= 0:
+                    if self._value_is_array:
+                        if self._key is not None:
+                            events.append({"type": "end", "field": self._key, "count": self._item_index})
+                        self._value_start = -1
+                    else:
+                        self._emit_field(i, events)
+            elif c == ",":
+                if depth == 1:
+                    if self._value_start >= 0:
+                        self._emit_field(at, events)
+                    self._next_member(i)
+                elif in_array_member and self._item_start >= 0:
+                    self._emit_item(at, events)
+            elif c == ":" or c in _WS:
+                pass
+            elif depth == 1 and not self._expect_key and self._value_start < 0:
+                self._value_start = at
+            elif in_array_member and self._item_start < 0:
+                self._item_start = at
+        self._pos = i
+        return events
+
+    def _string_closed(self, at: int, events: List[Dict[str, Any]]):
+        if self._depth == 1:
+            if self._expect_key and self._key_start >= 0:
+                self._key = _decode(self._slice(self._key_start, at + 1))
+                self._key_start = -1
+                self._expect_key = False
+            elif self._value_start == self._str_start:
+                self._emit_field(at + 1, events)
+        elif self._depth == 2 and self._value_is_array and self._item_start == self._str_start:
+            self._emit_item(at + 1, events)
+
+    def text(self) -> str:
+        return "".join(self._chunks)
+
+    def result(self) -> Optional[dict]:
+        """The complete object, parsed (and repaired if needed) from everything fed so far."""
+        return llm_json.parse_json_from_text(self.text(), expect=dict)
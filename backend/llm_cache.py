@@ -0,0 +1,172 @@
+"""
+llm_cache.py
+
+Content-addressed cache for LLM responses, used by llm_gateway.
+
+Keys are a SHA-256 over (model, system prompt, user prompt, temperature), so the same
+request from any endpoint maps to the same entry. Two tiers:
+- a bounded in-memory LRU (always on)
+- an optional SQLite file that survives restarts (LLM_CACHE_DB)
+
+Every entry carries its own expiry taken from the per-namespace TTL table, and hit/miss
+counters are kept globally and per namespace.
+
+Environment:
+- LLM_CACHE_ENABLED      (default "1")
+- LLM_CACHE_MAX_ENTRIES  (default 2048)
+- LLM_CACHE_DB           (optional path to the SQLite tier, e.g. "llm_cache.sqlite3")
+- LLM_CACHE_TTL_DEFAULT  (seconds, default 3600)
+- LLM_CACHE_TTL_<NAMESPACE>  per-namespace override, e.g. LLM_CACHE_TTL_EXTRACTOR_DISH_NAME=86400
+"""
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2048"))
+CACHE_DB_PATH = os.getenv("LLM_CACHE_DB", "")
+DEFAULT_TTL = float(os.getenv("LLM_CACHE_TTL_DEFAULT", "3600"))
+
+# Per-endpoint TTLs (seconds). Recipes for a dish name barely change; chat answers should rotate.
+NAMESPACE_TTLS: Dict[str, float] = {
+    "extractor.dish_name": 7 * 24 * 3600,
+    "extractor.url": 24 * 3600,
+    "fridge.recipes": 6 * 3600,
+    "chatbot": 15 * 60,
+}
+
+
+def ttl_for(namespace: str) -> float:
+    env_key = "LLM_CACHE_TTL_" + namespace.upper().replace(".", "_").replace("-", "_")
+    if os.getenv(env_key):
+        return float(os.getenv(env_key))
+    return NAMESPACE_TTLS.get(namespace, DEFAULT_TTL)
+
+
+def make_key(
+    model: str,
+    system_prompt: str,
+    user_prompt: str,
+    temperature: Optional[float],
+    json_mode: bool = False,
+    max_tokens: Optional[int] = None,
+) -> str:
+    """Everything that changes the answer: a JSON-mode or shorter-capped answer is a different entry."""
+    payload = json.dumps(
+        [model or "", system_prompt or "", user_prompt or "", temperature, bool(json_mode), max_tokens],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Two-tier (memory LRU + optional SQLite) response cache with per-entry expiry."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, db_path: str = CACHE_DB_PATH):
+        self.max_entries = max(1, max_entries)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._mem: "OrderedDict[str, tuple]" = OrderedDict()   # key -> (expires_at, value)
+        self._db: Optional[sqlite3.Connection] = None
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "evictions": 0, "expired": 0}
+        self.namespaces: Dict[str, Dict[str, int]] = {}
+        if db_path:
+            self._open_db()
+
+    def _open_db(self):
+        try:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM llm_cache WHERE expires_at < ?", (time.time(),))
+            print(f"[llm_cache] ✅ SQLite tier at {self.db_path}")
+        except Exception as e:
+            print(f"[llm_cache] ❌ SQLite tier disabled: {e}")
+            self._db = None
+
+    def _count(self, namespace: str, field: str):
+        self.counters[field] += 1
+        ns = self.namespaces.setdefault(namespace, {"hits": 0, "misses": 0})
+        if field.endswith("hits"):
+            ns["hits"] += 1
+        elif field == "misses":
+            ns["misses"] += 1
+
+    def _remember(self, key: str, expires_at: float, value: str):
+        self._mem[key] = (expires_at, value)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def get(self, key: str, namespace: str = "default") -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                if entry[0] >= now:
+                    self._mem.move_to_end(key)
+                    self._count(namespace, "memory_hits")
+                    return entry[1]
+                del self._mem[key]
+                self.counters["expired"] += 1
+            if self._db is not None:
+                try:
+                    row = self._db.execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                except Exception as e:
+                    print(f"[llm_cache] SQLite read failed: {e}")
+                    row = None
+                if row is not None:
+                    if row[1] >= now:
+                        self._remember(key, row[1], row[0])
+                        self._count(namespace, "disk_hits")
+                        return row[0]
+                    self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    self.counters["expired"] += 1
+            self._count(namespace, "misses")
+            return None
+
+    def set(self, key: str, value: str, namespace: str = "default", ttl: Optional[float] = None):
+        expires_at = time.time() + (ttl if ttl is not None else ttl_for(namespace))
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self.counters["sets"] += 1
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                        (key, value, expires_at),
+                    )
+                except Exception as e:
+                    print(f"[llm_cache] SQLite write failed: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            c = dict(self.counters)
+            hits = c["memory_hits"] + c["disk_hits"]
+            total = hits + c["misses"]
+            return {
+                "enabled": CACHE_ENABLED,
+                "entries": len(self._mem),
+                "max_entries": self.max_entries,
+                "sqlite": self.db_path if self._db is not None else None,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+                **c,
+                "namespaces": {k: dict(v) for k, v in self.namespaces.items()},
+            }
+
+
+cache = LLMCache()
@@ -0,0 +1,690 @@
+"""
+llm_gateway.py
+
+Shared LLM gateway used by every blueprint (recipe extractor, fridge, diet plan, chatbot).
+
+One long-lived SDK client is kept per provider. Each client owns a keep-alive HTTP
+connection pool, so requests reuse warm TLS connections instead of paying for client
+construction and a fresh handshake on every call. Gemini model handles are cached
+per model name.
+
+Environment:
+- GEMINI_API_KEY / GOOGLE_API_KEY, GROQ_API_KEY, OPENAI_API_KEY
+- GEMINI_MODEL              (default "gemini-2.5-flash")
+- GROQ_MODEL                (default "llama-3.3-70b-versatile")
+- LLM_HTTP_MAX_CONNECTIONS  (default 20)  connections per provider pool
+- LLM_HTTP_KEEPALIVE        (default 10)  idle keep-alive connections per pool
+- LLM_HTTP_KEEPALIVE_EXPIRY (default 120) seconds an idle connection is kept
+- LLM_HTTP_TIMEOUT          (default 60)  request timeout in seconds
+"""
+import os
+import json
+import time
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from dotenv import load_dotenv
+
+import llm_cache
+import circuit_breaker
+from singleflight import SingleFlight
+from circuit_breaker import CircuitOpenError
+
+load_dotenv()
+
+DEFAULT_GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+DEFAULT_GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+DEFAULT_OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "20"))
+HTTP_KEEPALIVE = int(os.getenv("LLM_HTTP_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "120"))
+HTTP_TIMEOUT = float(os.getenv("LLM_HTTP_TIMEOUT", "60"))
+
+# Provider preference order used when callers ask "what is available?"
+PROVIDERS = ["gemini", "groq", "openai"]
+
+_lock = threading.Lock()
+_clients: Dict[str, Any] = {}
+_init_errors: Dict[str, str] = {}
+_gemini_flavor: Optional[str] = None          # "genai" (google-genai) or "legacy" (google-generativeai)
+_gemini_models: Dict[str, Any] = {}           # legacy SDK model handles keyed by model name
+_openai_flavor: Optional[str] = None          # "v1" (openai.OpenAI) or "legacy" (module-level API)
+
+
+# ---------------- Client construction ----------------
+
+def _http_client():
+    """Build a pooled keep-alive httpx client (httpx ships with the groq/openai SDKs)."""
+    import httpx
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=10.0),
+    )
+
+
+def _gemini_key() -> Optional[str]:
+    return os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+
+
+def _create_groq():
+    key = os.getenv("GROQ_API_KEY")
+    if not key:
+        return None
+    from groq import Groq
+    try:
+        return Groq(api_key=key, http_client=_http_client())
+    except ImportError:
+        return Groq(api_key=key)
+
+
+def _create_gemini():
+    global _gemini_flavor
+    key = _gemini_key()
+    if not key:
+        return None
+    try:
+        from google import genai
+        from google.genai import types
+        # google-genai keeps a single httpx client per Client instance
+        client = genai.Client(api_key=key, http_options=types.HttpOptions(timeout=int(HTTP_TIMEOUT * 1000)))
+        _gemini_flavor = "genai"
+        return client
+    except ImportError:
+        import google.generativeai as legacy_genai
+        legacy_genai.configure(api_key=key)
+        _gemini_flavor = "legacy"
+        return legacy_genai
+
+
+def _create_openai():
+    global _openai_flavor
+    key = os.getenv("OPENAI_API_KEY")
+    if not key:
+        return None
+    import openai
+    if hasattr(openai, "OpenAI"):
+        _openai_flavor = "v1"
+        return openai.OpenAI(api_key=key, http_client=_http_client())
+    openai.api_key = key
+    _openai_flavor = "legacy"
+    return openai
+
+
+_FACTORIES = {
+    "groq": _create_groq,
+    "gemini": _create_gemini,
+    "openai": _create_openai,
+}
+
+
+def get_client(provider: str):
+    """Return the shared client for a provider, creating it once on first use."""
+    client = _clients.get(provider)
+    if client is not None or provider in _init_errors:
+        return client
+    with _lock:
+        if provider in _clients or provider in _init_errors:
+            return _clients.get(provider)
+        try:
+            client = _FACTORIES[provider]()
+        except Exception as e:
+            _init_errors[provider] = str(e)
+            print(f"[llm_gateway] ❌ {provider} client initialization failed: {e}")
+            return None
+        if client is None:
+            _init_errors[provider] = "API key not set"
+            return None
+        _clients[provider] = client
+        print(f"[llm_gateway] ✅ {provider} client initialized (pooled)")
+        return client
+
+
+def is_available(provider: str) -> bool:
+    return get_client(provider) is not None
+
+
+def available_providers() -> List[str]:
+    return [p for p in PROVIDERS if is_available(p)]
+
+
+def _gemini_model_handle(model: str):
+    """Legacy SDK only: reuse GenerativeModel objects instead of rebuilding them per call."""
+    handle = _gemini_models.get(model)
+    if handle is None:
+        with _lock:
+            handle = _gemini_models.get(model)
+            if handle is None:
+                handle = _clients["gemini"].GenerativeModel(model)
+                _gemini_models[model] = handle
+    return handle
+
+
+def _response_text(resp) -> str:
+    try:
+        return resp.choices[0].message.content
+    except Exception:
+        pass
+    try:
+        return resp.choices[0].text
+    except Exception:
+        pass
+    text = getattr(resp, "text", None)
+    return text if text is not None else str(resp)
+
+
+# ---------------- Circuit breakers ----------------
+
+def _guarded(provider: str, fn: Callable[[], Any]) -> Any:
+    """Run one provider call through its circuit breaker (fails fast while open)."""
+    breaker = circuit_breaker.get_breaker(provider)
+    if not breaker.allow():
+        raise CircuitOpenError(f"{provider} circuit open")
+    start = time.time()
+    try:
+        result = fn()
+    except Exception:
+        breaker.record(False, time.time() - start)
+        raise
+    breaker.record(True, time.time() - start)
+    return result
+
+
+def _guarded_stream(provider: str, open_stream: Callable[[], Iterable[str]]) -> Iterator[str]:
+    """
+    Streaming twin of _guarded; the call counts as done when the stream is exhausted. A stream
+    the consumer closes early (client disconnect) counts as a success once it produced text;
+    otherwise it has no outcome and only gives back the breaker's half-open trial slot.
+    """
+    breaker = circuit_breaker.get_breaker(provider)
+    if not breaker.allow():
+        raise CircuitOpenError(f"{provider} circuit open")
+    start = time.time()
+    emitted = False
+    recorded = False
+    try:
+        for piece in open_stream():
+            emitted = emitted or bool(piece)
+            yield piece
+        recorded = True
+        breaker.record(True, time.time() - start)
+    except Exception:
+        recorded = True
+        breaker.record(False, time.time() - start)
+        raise
+    finally:
+        if not recorded:
+            if emitted:
+                breaker.record(True, time.time() - start)
+            else:
+                breaker.release()
+
+
+def provider_ready(provider: str) -> bool:
+    """Configured and not currently short-circuited."""
+    return is_available(provider) and circuit_breaker.get_breaker(provider).state != circuit_breaker.OPEN
+
+
+def provider_order(candidates: Optional[Iterable[str]] = None) -> List[str]:
+    """Available providers, healthiest first, with open breakers left out."""
+    names = [p for p in (candidates or PROVIDERS) if is_available(p)]
+    return circuit_breaker.provider_order(names, skip_open=True)
+
+
+def provider_health() -> Dict[str, Any]:
+    """Current ordering and breaker state, for the blueprints' /health routes."""
+    return circuit_breaker.snapshot(available_providers())
+
+
+# ---------------- Response cache ----------------
+
+def _split_messages(messages: List[Dict[str, str]]):
+    system = "\n".join(m.get("content", "") for m in messages if m.get("role") == "system")
+    rest = [m for m in messages if m.get("role") != "system"]
+    user = rest[0].get("content", "") if len(rest) == 1 else json.dumps(rest, ensure_ascii=False)
+    return system, user
+
+
+def _key_parts(
+    model: str, system: str, user: str, json_mode: bool, params: Optional[Dict[str, Any]] = None
+) -> tuple:
+    """llm_cache.make_key arguments of one call (generation params the providers honour)."""
+    params = params or {}
+    return (model, system, user, params.get("temperature"), json_mode, params.get("max_tokens"))
+
+
+_inflight = SingleFlight("llm")
+_last_call = threading.local()
+
+
+def served_from_cache() -> bool:
+    """Whether the last cache-enabled call made by this thread was answered by llm_cache."""
+    return getattr(_last_call, "cache_hit", False)
+
+
+def _cached_call(
+    namespace: Optional[str],
+    key_parts: tuple,
+    compute: Callable[[], str],
+    validate: Optional[Callable[[str], bool]] = None,
+) -> str:
+    """
+    Serve from llm_cache when a namespace is given; store only results that pass `validate`.
+    Concurrent misses for the same key share one provider call (single-flight), so a burst
+    of identical prompts costs one request; every waiter gets its result or its error.
+    """
+    _last_call.cache_hit = False
+    if not namespace:
+        return compute()
+    key = llm_cache.make_key(*key_parts)
+    if llm_cache.CACHE_ENABLED:
+        hit = llm_cache.cache.get(key, namespace)
+        if hit is not None:
+            _last_call.cache_hit = True
+            return hit
+
+    def compute_and_store() -> str:
+        value = compute()
+        if llm_cache.CACHE_ENABLED and value and (validate is None or validate(value)):
+            llm_cache.cache.set(key, value, namespace)
+        return value
+
+    value, _shared = _inflight.do(f"{namespace}:{key}", compute_and_store)
+    return value
+
+
+def _cached_stream(
+    namespace: Optional[str],
+    key_parts: tuple,
+    open_stream: Callable[[], Iterable[str]],
+    validate: Optional[Callable[[str], bool]] = None,
+) -> Iterator[str]:
+    """
+    Streaming twin of _cached_call: a hit is yielded whole, a completed miss is stored if it
+    passes `validate` (the same check the non-streaming callers of the namespace apply).
+    """
+    key = llm_cache.make_key(*key_parts) if namespace and llm_cache.CACHE_ENABLED else None
+    if key is not None:
+        hit = llm_cache.cache.get(key, namespace)
+        if hit is not None:
+            yield hit
+            return
+    parts = []
+    for piece in open_stream():
+        if piece:
+            parts.append(piece)
+            yield piece
+    if key is not None and parts:
+        value = "".join(parts)
+        if validate is None or validate(value):
+            llm_cache.cache.set(key, value, namespace)
+
+
+def _delta_text(chunk) -> str:
+    """Text of one streamed chunk (OpenAI-style delta, dict delta, or Gemini .text)."""
+    try:
+        return chunk.choices[0].delta.content or ""
+    except Exception:
+        pass
+    try:
+        return chunk["choices"][0]["delta"].get("content") or ""
+    except Exception:
+        pass
+    return getattr(chunk, "text", None) or ""
+
+
+# ---------------- Provider calls ----------------
+# Passing cache="<namespace>" serves repeat prompts from llm_cache (TTL per namespace);
+# cache_validate can veto storing a response (e.g. output that did not parse as JSON).
+# json_mode=True asks the provider for a JSON-only response (Groq/OpenAI response_format,
+# Gemini response_mime_type); callers still parse with llm_json.parse_json_from_text.
+
+JSON_MIME = "application/json"
+
+
+def _groq_failed_generation(err: Exception) -> Optional[str]:
+    """Groq rejects JSON-mode output that does not validate (400 json_validate_failed) but
+    returns the text in the error body; it is usually repairable locally by llm_json."""
+    body = getattr(err, "body", None)
+    if isinstance(body, dict):
+        detail = body.get("error", body)
+        if isinstance(detail, dict) and detail.get("failed_generation"):
+            return detail["failed_generation"]
+    return None
+
+
+def groq_chat(
+    messages: List[Dict[str, str]],
+    model: Optional[str] = None,
+    cache: Optional[str] = None,
+    cache_validate: Optional[Callable[[str], bool]] = None,
+    json_mode: bool = False,
+    **params,
+) -> str:
+    """Chat completion on the shared Groq client. Extra params (temperature, max_tokens...) pass through."""
+    client = get_client("groq")
+    if client is None:
+        raise RuntimeError("Groq client not configured (groq).")
+    model = model or DEFAULT_GROQ_MODEL
+    if json_mode:
+        params["response_format"] = {"type": "json_object"}
+
+    def call():
+        try:
+            return client.chat.completions.create(messages=messages, model=model, **params)
+        except Exception as e:
+            failed = _groq_failed_generation(e) if json_mode else None
+            if failed is None:
+                raise
+            return failed
+
+    def compute() -> str:
+        resp = _guarded("groq", call)
+        return resp if isinstance(resp, str) else _response_text(resp)
+
+    system, user = _split_messages(messages)
+    return _cached_call(cache, _key_parts(model, system, user, json_mode, params), compute, cache_validate)
+
+
+def call_groq_chat_system(system_prompt: str, user_prompt: str, model: Optional[str] = None, **params) -> str:
+    """System + user prompt convenience wrapper around groq_chat."""
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
+    return groq_chat(messages, model=model, **params)
+
+
+def gemini_generate(contents: List[Any], model: Optional[str] = None, json_mode: bool = False) -> str:
+    """generate_content on the shared Gemini client; contents may mix text and PIL images."""
+    client = get_client("gemini")
+    if client is None:
+        raise RuntimeError("Gemini client not configured (google-genai).")
+    model = model or DEFAULT_GEMINI_MODEL
+    config = {"response_mime_type": JSON_MIME} if json_mode else None
+    if _gemini_flavor == "genai":
+        resp = _guarded("gemini", lambda: client.models.generate_content(model=model, contents=contents, config=config))
+    else:
+        resp = _guarded(
+            "gemini", lambda: _gemini_model_handle(model).generate_content(contents, generation_config=config)
+        )
+    return _response_text(resp)
+
+
+def call_gemini_text(
+    prompt_text: str,
+    model: Optional[str] = None,
+    cache: Optional[str] = None,
+    cache_validate: Optional[Callable[[str], bool]] = None,
+    json_mode: bool = False,
+) -> str:
+    model = model or DEFAULT_GEMINI_MODEL
+    return _cached_call(
+        cache, _key_parts(model, "", prompt_text, json_mode),
+        lambda: gemini_generate([prompt_text], model=model, json_mode=json_mode), cache_validate
+    )
+
+
+def groq_chat_stream(
+    messages: List[Dict[str, str]],
+    model: Optional[str] = None,
+    cache: Optional[str] = None,
+    cache_validate: Optional[Callable[[str], bool]] = None,
+    **params,
+) -> Iterator[str]:
+    """Yield Groq completion text as it is generated."""
+    client = get_client("groq")
+    if client is None:
+        raise RuntimeError("Groq client not configured (groq).")
+    model = model or DEFAULT_GROQ_MODEL
+
+    def open_stream() -> Iterator[str]:
+        for chunk in client.chat.completions.create(messages=messages, model=model, stream=True, **params):
+            yield _delta_text(chunk)
+
+    system, user = _split_messages(messages)
+    return _cached_stream(
+        cache, _key_parts(model, system, user, False, params), lambda: _guarded_stream("groq", open_stream),
+        cache_validate,
+    )
+
+
+def gemini_generate_stream(contents: List[Any], model: Optional[str] = None, json_mode: bool = False) -> Iterator[str]:
+    client = get_client("gemini")
+    if client is None:
+        raise RuntimeError("Gemini client not configured (google-genai).")
+    model = model or DEFAULT_GEMINI_MODEL
+    config = {"response_mime_type": JSON_MIME} if json_mode else None
+
+    def open_stream() -> Iterator[str]:
+        if _gemini_flavor == "genai":
+            stream = client.models.generate_content_stream(model=model, contents=contents, config=config)
+        else:
+            stream = _gemini_model_handle(model).generate_content(contents, stream=True, generation_config=config)
+        for chunk in stream:
+            yield _delta_text(chunk)
+
+    return _guarded_stream("gemini", open_stream)
+
+
+def call_gemini_text_stream(
+    prompt_text: str,
+    model: Optional[str] = None,
+    cache: Optional[str] = None,
+    cache_validate: Optional[Callable[[str], bool]] = None,
+) -> Iterator[str]:
+    model = model or DEFAULT_GEMINI_MODEL
+    return _cached_stream(
+        cache, _key_parts(model, "", prompt_text, False), lambda: gemini_generate_stream([prompt_text], model=model),
+        cache_validate,
+    )
+
+
+def image_part(image: Any, mime_type: str = "image/jpeg") -> Any:
+    """
+    Gemini content part for an image. Accepts a PIL image (passed as is), raw encoded bytes,
+    or anything with .data/.mime_type (image_pipeline.PreparedImage). Sending the encoded
+    bytes avoids the SDK re-encoding a full-size PIL frame on every call.
+    """
+    if hasattr(image, "data") and hasattr(image, "mime_type"):
+        image, mime_type = image.data, image.mime_type
+    if not isinstance(image, (bytes, bytearray)):
+        return image
+    get_client("gemini")
+    if _gemini_flavor == "genai":
+        from google.genai import types
+        return types.Part.from_bytes(data=bytes(image), mime_type=mime_type)
+    return {"mime_type": mime_type, "data": bytes(image)}
+
+
+def call_gemini_image_to_text(image, prompt_text: str, model: Optional[str] = None, json_mode: bool = False) -> str:
+    return gemini_generate([image_part(image), prompt_text], model=model, json_mode=json_mode)
+
+
+def call_gemini_images_to_text(images: List[Any], prompt_text: str, model: Optional[str] = None, json_mode: bool = False) -> str:
+    """One generate_content call carrying several images (in order) followed by the prompt."""
+    return gemini_generate([image_part(image) for image in images] + [prompt_text], model=model, json_mode=json_mode)
+
+
+def call_gemini_image_to_text_stream(
+    image, prompt_text: str, model: Optional[str] = None, json_mode: bool = False
+) -> Iterator[str]:
+    return gemini_generate_stream([image_part(image), prompt_text], model=model, json_mode=json_mode)
+
+
+def openai_chat(
+    messages: List[Dict[str, str]],
+    model: Optional[str] = None,
+    cache: Optional[str] = None,
+    cache_validate: Optional[Callable[[str], bool]] = None,
+    json_mode: bool = False,
+    **params,
+) -> str:
+    client = get_client("openai")
+    if client is None:
+        raise RuntimeError("OpenAI client not configured (openai).")
+    model = model or DEFAULT_OPENAI_MODEL
+    if json_mode and _openai_flavor == "v1":
+        params["response_format"] = {"type": "json_object"}
+
+    def call():
+        if _openai_flavor == "v1":
+            return client.chat.completions.create(model=model, messages=messages, **params)
+        return client.ChatCompletion.create(model=model, messages=messages, **params)
+
+    def compute() -> str:
+        return _response_text(_guarded("openai", call))
+
+    system, user = _split_messages(messages)
+    return _cached_call(cache, _key_parts(model, system, user, json_mode, params), compute, cache_validate)
+
+
+def openai_chat_stream(
+    messages: List[Dict[str, str]],
+    model: Optional[str] = None,
+    cache: Optional[str] = None,
+    cache_validate: Optional[Callable[[str], bool]] = None,
+    **params,
+) -> Iterator[str]:
+    client = get_client("openai")
+    if client is None:
+        raise RuntimeError("OpenAI client not configured (openai).")
+    model = model or DEFAULT_OPENAI_MODEL
+
+    def open_stream() -> Iterator[str]:
+        if _openai_flavor == "v1":
+            stream = client.chat.completions.create(model=model, messages=messages, stream=True, **params)
+        else:
+            stream = client.ChatCompletion.create(model=model, messages=messages, stream=True, **params)
+        for chunk in stream:
+            yield _delta_text(chunk)
+
+    system, user = _split_messages(messages)
+    return _cached_stream(
+        cache, _key_parts(model, system, user, False, params), lambda: _guarded_stream("openai", open_stream),
+        cache_validate,
+    )
+
+
+def complete(
+    system_prompt: str,
+    user_prompt: str,
+    providers: Iterable[str] = ("groq", "gemini", "openai"),
+    models: Optional[Dict[str, str]] = None,
+    json_mode: bool = False,
+    **params,
+) -> str:
+    """
+    Provider-agnostic system+user completion. Providers are tried healthiest first
+    (provider_order); open breakers are skipped outright and a failing provider hands over
+    to the next. Raises the last error when every provider fails.
+    Generation params (temperature, max_tokens...) apply to the chat-style providers only;
+    json_mode is honoured by all of them.
+    """
+    models = models or {}
+    cache = params.pop("cache", None)
+    cache_validate = params.pop("cache_validate", None)
+    order = provider_order(providers)
+    if not order:
+        raise RuntimeError(f"No LLM provider available (tried {list(providers)})")
+    last_error: Optional[Exception] = None
+    for provider in order:
+        try:
+            if provider == "groq":
+                return call_groq_chat_system(
+                    system_prompt, user_prompt, model=models.get("groq"),
+                    cache=cache, cache_validate=cache_validate, json_mode=json_mode, **params
+                )
+            if provider == "gemini":
+                return call_gemini_text(
+                    f"{system_prompt}\n\n{user_prompt}", model=models.get("gemini"),
+                    cache=cache, cache_validate=cache_validate, json_mode=json_mode
+                )
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ]
+            return openai_chat(
+                messages, model=models.get("openai"),
+                cache=cache, cache_validate=cache_validate, json_mode=json_mode, **params
+            )
+        except Exception as e:
+            print(f"[llm_gateway] ⚠️ {provider} failed, trying next provider: {e}")
+            last_error = e
+    raise last_error
+
+
+def complete_stream(
+    system_prompt: str,
+    user_prompt: str,
+    providers: Iterable[str] = ("groq", "gemini", "openai"),
+    models: Optional[Dict[str, str]] = None,
+    cache: Optional[str] = None,
+    cache_validate: Optional[Callable[[str], bool]] = None,
+    **params,
+) -> Iterator[str]:
+    """
+    Streaming twin of complete(): yields text from the healthiest provider. A provider that
+    fails before producing any text hands over to the next; a failure mid-stream is raised,
+    since the caller has already consumed part of the answer. cache_validate works as in
+    complete(): a streamed answer that fails it is not stored.
+    """
+    models = models or {}
+    order = provider_order(providers)
+    if not order:
+        raise RuntimeError(f"No LLM provider available (tried {list(providers)})")
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
+    last_error: Optional[Exception] = None
+    for provider in order:
+        emitted = False
+        try:
+            if provider == "groq":
+                stream = groq_chat_stream(
+                    messages, model=models.get("groq"), cache=cache, cache_validate=cache_validate, **params
+                )
+            elif provider == "gemini":
+                stream = call_gemini_text_stream(
+                    f"{system_prompt}\n\n{user_prompt}", model=models.get("gemini"),
+                    cache=cache, cache_validate=cache_validate
+                )
+            else:
+                stream = openai_chat_stream(
+                    messages, model=models.get("openai"), cache=cache, cache_validate=cache_validate, **params
+                )
+            for piece in stream:
+                if piece:
+                    emitted = True
+                    yield piece
+            return
+        except Exception as e:
+            if emitted:
+                raise
+            print(f"[llm_gateway] ⚠️ {provider} stream failed, trying next provider: {e}")
+            last_error = e
+    raise last_error
+
+
+def status() -> Dict[str, Any]:
+    """Snapshot for /health routes."""
+    return {
+        "providers": {
+            p: {"available": p in _clients, "error": _init_errors.get(p)}
+            for p in PROVIDERS
+        },
+        "gemini_sdk": _gemini_flavor,
+        "pool": {
+            "max_connections": HTTP_MAX_CONNECTIONS,
+            "keepalive": HTTP_KEEPALIVE,
+            "timeout_s": HTTP_TIMEOUT,
+        },
+        "cache": llm_cache.cache.stats(),
+        "circuit": provider_health(),
+        "singleflight": _inflight.stats(),
+    }
@@ -0,0 +1,365 @@
+"""
+llm_json.py
+
+JSON extraction and local repair for LLM output, shared by recipe_extractor, fridge and
+diet_plan.
+
+iter_json_candidates() scans the text once (linear time, no regex backtracking). It is
+brace- and string-aware and yields every outermost balanced {...} / [...] span in order.
+parse_json_from_text() tries those candidates, then repair, so a malformed response can be
+fixed in-process instead of costing a second "please output valid JSON" round-trip.
+parse_strict_json() accepts only output that is valid JSON as is; callers use it to decide
+whether a response may be cached, so a repaired guess at a truncated answer is never stored.
+
+repair_json() makes one pass over the text, tracking strings and open containers, and fixes:
+- markdown code fences and prose before/after the JSON value
+- trailing commas before } or ]
+- unquoted object keys and single-quoted strings
+- Python literals (True / False / None) and NaN / Infinity
+- bare-word values ("calories": 450 kcal -> "450 kcal")
+- raw newlines inside strings
+- truncation: an unterminated string is closed, a dangling key or "key": is dropped,
+  and every open array/object is closed
+"""
+import json
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+_LITERALS = {"true": "true", "false": "false", "null": "null",
+             "True": "true", "False": "false", "None": "null",
+             "NaN": "null", "Infinity": "null", "-Infinity": "null"}
+_NUMBER_RE = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?$")
+_BARE_STOP = ",}]\n"
+_CLOSERS = {"{": "}", "[": "]"}
+_OPEN_RE = re.compile(r"[{\[]")
+_SPECIAL_RE = re.compile(r'[\[\]{}"\\]')
+
+
+def _strip_fences(text: str) -> str:
+    """Drop a leading ```lang fence and a trailing ``` (string operations: no regex backtracking)."""
+    text = text.strip()
+    if text.startswith("```"):
+        i = 3
+        while i < len(text) and text[i].isascii() and text[i].isalpha():
+            i += 1
+        text = text[i:].lstrip()
+    if text.endswith("```"):
+        text = text[:-3].rstrip()
+    return text
+
+
+def _bare_value(word: str) -> str:
+    word = word.strip()
+    if word in _LITERALS:
+        return _LITERALS[word]
+    if _NUMBER_RE.match(word):
+        return word
+    return json.dumps(word)
+
+
+class _Frame:
+    __slots__ = ("kind", "state", "member_start")
+
+    def __init__(self, kind: str, member_start: int):
+        self.kind = kind                    # "{" or "["
+        self.state = "key" if kind == "{" else "value"
+        self.member_start = member_start    # output offset where the current member began
+
+
+def repair_json(text: str) -> Optional[str]:
+    """Best-effort rewrite of `text` into valid JSON text; None when there is no JSON value at all."""
+    if not text:
+        return None
+    text = _strip_fences(text)
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return None
+    i = min(starts)
+    n = len(text)
+    out: List[str] = []
+    stack: List[_Frame] = []
+
+    def value_done():
+        if stack:
+            stack[-1].state = "comma"
+
+    def drop_trailing_comma():
+        while out and out[-1] in " \t\r\n":
+            out.pop()
+        if out and out[-1] == ",":
+            out.pop()
+
+    while i < n:
+        ch = text[i]
+        top = stack[-1] if stack else None
+
+        if ch in "\"'":
+            # copy a string, normalising quotes and escaping raw control characters
+            quote = ch
+            is_key = top is not None and top.kind == "{" and top.state == "key"
+            buf = ['"']
+            i += 1
+            closed = False
+            while i < n:
+                c = text[i]
+                if c == "\\" and i + 1 < n:
+                    nxt = text[i + 1]
+                    buf.append(nxt if (quote == "'" and nxt == "'") else c + nxt)
+                    i += 2
+                    continue
+                if c == quote:
+                    closed = True
+                    i += 1
+                    break
+                if c == '"':
+                    buf.append('\\"')
+                elif c == "\n":
+                    buf.append("\\n")
+                elif c == "\r":
+                    buf.append("\\r")
+                elif c == "\t":
+                    buf.append("\\t")
+                else:
+                    buf.append(c)
+                i += 1
+            if not closed and is_key:
+                break  # truncated inside a key: the partial member is rolled back below
+            buf.append('"')
+            out.append("".join(buf))
+            if is_key:
+                top.state = "colon"
+            else:
+                value_done()
+            if not closed:
+                break
+            continue
+
+        if ch in "{[":
+            if top is not None and top.kind == "{" and top.state != "value":
+                i += 1
+                continue  # stray container where a key belongs; skip the bracket
+            out.append(ch)
+            stack.append(_Frame(ch, len(out)))
+            i += 1
+            continue
+
+        if ch in "}]":
+            if not stack:
+                break
+            drop_trailing_comma()
+            frame = stack[-1]
+            if frame.kind == "{" and frame.state in ("colon", "value"):
+                del out[frame.member_start:]
+                drop_trailing_comma()
+            stack.pop()
+            out.append("}" if frame.kind == "{" else "]")
+            value_done()
+            i += 1
+            if not stack:
+                break
+            continue
+
+        if ch == ",":
+            if top is not None and top.state == "comma":
+                out.append(",")
+                top.state = "key" if top.kind == "{" else "value"
+                top.member_start = len(out)
+            i += 1
+            continue
+
+        if ch == ":":
+            if top is not None and top.kind == "{" and top.state == "colon":
+                out.append(":")
+                top.state = "value"
+            i += 1
+            continue
+
+        if ch in " \t\r\n":
+            i += 1
+            continue
+
+        if top is None:
+            i += 1
+            continue
+
+        # bare word: an unquoted key or an unquoted value
+        j = i
+        if top.kind == "{" and top.state == "key":
+            while j < n and text[j] not in ":,}]\n":
+                j += 1
+            out.append(json.dumps(text[i:j].strip()))
+            top.state = "colon"
+        elif top.state == "value":
+            while j < n and text[j] not in _BARE_STOP:
+                j += 1
+            out.append(_bare_value(text[i:j]))
+            value_done()
+        else:
+            # junk between members (e.g. a comment or missing comma); skip to a delimiter
+            while j < n and text[j] not in _BARE_STOP:
+                j += 1
+        i = j
+
+    # close whatever the text left open (truncated output)
+    while stack:
+        frame = stack.pop()
+        drop_trailing_comma()
+        if frame.kind == "{" and frame.state in ("key", "colon", "value") and len(out) > frame.member_start:
+            del out[frame.member_start:]
+            drop_trailing_comma()
+        out.append("}" if frame.kind == "{" else "]")
+        value_done()
+    return "".join(out) if out else None
+
+
+def _scan(text: str) -> Iterator[Tuple[str, str]]:
+    """
+    Single left-to-right pass yielding (kind, span):
+    - "balanced": an outermost {...} / [...] that closes properly
+    - "interior": a balanced span nested inside a region that never closed or hit a
+                  mismatched closer (e.g. a real object after a stray "{" in prose)
+    - "partial":  the still-open tail at the end of the text, from the first opener that
+                  looks like JSON (truncated output)
+    The scanner hops between structural characters with one compiled regex, ignores
+    brackets inside double-quoted strings and never moves backwards, so the cost is linear.
+    """
+    n = len(text)
+    pos = 0
+    while pos < n:
+        m = _OPEN_RE.search(text, pos)
+        if m is None:
+            return
+        start = m.start()
+        opened = [start]                 # offsets of currently open brackets
+        completed: List[Tuple[int, int]] = []   # outermost closed spans inside this region
+        in_string = False
+        escape_at = -1
+        end = n
+        mismatch = False
+        for tok in _SPECIAL_RE.finditer(text, start + 1):
+            j = tok.start()
+            c = text[j]
+            if j == escape_at:
+                continue
+            if c == "\\":
+                escape_at = j + 1
+                continue
+            if in_string:
+                if c == '"':
+                    in_string = False
+                continue
+            if c == '"':
+                in_string = True
+            elif c == "{" or c == "[":
+                opened.append(j)
+            elif c != _CLOSERS[text[opened[-1]]]:
+                end = j
+                mismatch = True
+                break
+            else:
+                s = opened.pop()
+                if not opened:
+                    end = j + 1
+                    break
+                while completed and completed[-1][0] > s:
+                    completed.pop()
+                completed.append((s, j + 1))
+        if not opened:
+            yield "balanced", text[start:end]
+            pos = end
+            continue
+        for s, e in completed:
+            yield "interior", text[s:e]
+        if not mismatch:
+            for s in opened:
+                if _looks_like_json(text, s):
+                    yield "partial", text[s:]
+                    break
+            return
+        pos = end + 1
+
+
+def _looks_like_json(text: str, offset: int) -> bool:
+    rest = text[offset + 1:offset + 64].lstrip()
+    return not rest or rest[0] in '"{[]}' or (text[offset] == "[" and rest[0] in "-0123456789tfn")
+
+
+def iter_json_candidates(text: str, include_partial: bool = False) -> Iterator[str]:
+    """
+    Yield JSON-looking spans of `text` in order, in one linear pass (see _scan): every
+    outermost balanced {...} / [...], balanced spans rescued from inside unclosed or
+    mismatched regions, and, with include_partial, a truncated trailing span last.
+    """
+    if not text:
+        return
+    for kind, span in _scan(text):
+        if kind != "partial" or include_partial:
+            yield span
+
+
+def _matches(value: Any, expect: Optional[type]) -> bool:
+    return value is not None and (expect is None or isinstance(value, expect))
+
+
+def _loads(candidate: str, expect: Optional[type], repair: bool = False) -> Any:
+    if repair:
+        candidate = repair_json(candidate)
+        if candidate is None:
+            return None
+    try:
+        value = json.loads(candidate, strict=False)
+    except Exception:
+        return None
+    return value if _matches(value, expect) else None
+
+
+def parse_json_from_text(text: str, expect: Optional[type] = None) -> Any:
+    """
+    First JSON value in `text` (optionally of type `expect`, e.g. dict or list).
+    Order: the whole text; balanced candidates; the repaired truncated tail; spans rescued
+    from broken regions; finally repair of the balanced candidates. None when nothing parses.
+    """
+    if not text:
+        return None
+    stripped = _strip_fences(text)
+    value = _loads(stripped, expect)
+    if value is not None:
+        return value
+    spans: Dict[str, List[str]] = {"balanced": [], "interior": [], "partial": []}
+    for kind, span in _scan(stripped):
+        if kind == "balanced":
+            # balanced candidates come first in priority, so try them while scanning
+            value = _loads(span, expect)
+            if value is not None:
+                return value
+        spans[kind].append(span)
+    attempts = (
+        [(c, True) for c in spans["partial"]]
+        + [(c, False) for c in spans["interior"]]
+        + [(c, True) for c in spans["balanced"] + spans["interior"]]
+    )
+    for candidate, repair in attempts:
+        value = _loads(candidate, expect, repair)
+        if value is not None:
+            return value
+    return None
+
+
+def parse_strict_json(text: str, expect: Optional[type] = None) -> Any:
+    """
+    First JSON value in `text` that needs no repair: the whole (fence-stripped) text or an
+    outermost balanced candidate. Truncated tails and spans rescued from broken regions do not
+    count. None when there is no such value.
+    """
+    if not text:
+        return None
+    stripped = _strip_fences(text)
+    value = _loads(stripped, expect)
+    if value is not None:
+        return value
+    for kind, span in _scan(stripped):
+        if kind == "balanced":
+            value = _loads(span, expect)
+            if value is not None:
+                return value
+    return None
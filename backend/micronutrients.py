@@ -0,0 +1,180 @@
+"""
+micronutrients.py
+
+Micronutrient totals, %DV and suggestions for nutrition_extractor, computed from nutrient
+vectors instead of keyword rules.
+
+Every food has a fixed-length vector of FIELDS (vitamins, minerals, fiber, sugar):
+- FOOD_DB foods from FOOD_MICROS
+- nutrient_db rows from their columns
+Nutrients a source does not report count as 0. Item vectors are the food's per-unit
+vector scaled by the units eaten. A meal's totals are their sum (total). In the batch path
+the micronutrient columns ride along in the same quantity-matrix product as the macros.
+
+Percent of daily value is one division by the reference-intake vector DAILY_VALUES (US
+adult daily values) and works on a single meal or a whole batch at once (daily_percent).
+Suggestions come from the numbers (suggestions):
+- limits (sugar, sodium) above a meal's share of the day
+- the least-covered nutrients, each with the food that supplies the most of it per calorie
+
+Environment:
+- MICRO_MEAL_SHARE (default 0.33): share of the daily value one meal is expected to cover
+"""
+import os
+from typing import Any, Dict, List, Sequence, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+import nutrition_matrix
+
+# field -> (label, unit, daily value); units as in nutrient_db.COLUMNS
+NUTRIENTS: Dict[str, Tuple[str, str, float]] = {
+    "fiber": ("Fiber", "g", 28.0),
+    "sugar": ("Sugar", "g", 50.0),
+    "sodium": ("Sodium", "mg", 2300.0),
+    "potassium": ("Potassium", "mg", 4700.0),
+    "calcium": ("Calcium", "mg", 1300.0),
+    "iron": ("Iron", "mg", 18.0),
+    "magnesium": ("Magnesium", "mg", 420.0),
+    "zinc": ("Zinc", "mg", 11.0),
+    "vitamin_a": ("Vitamin A", "mcg", 900.0),
+    "vitamin_c": ("Vitamin C", "mg", 90.0),
+    "vitamin_d": ("Vitamin D", "mcg", 20.0),
+    "vitamin_b12": ("Vitamin B12", "mcg", 2.4),
+    "folate": ("Folate", "mcg", 400.0),
+}
+FIELDS = tuple(NUTRIENTS)
+DAILY_VALUES = [daily for _, _, daily in NUTRIENTS.values()]
+LIMITS = ("sugar", "sodium")        # daily values that are upper limits, not targets
+MEAL_SHARE = float(os.getenv("MICRO_MEAL_SHARE", "0.33"))
+LOW_SHARE = 0.10                    # a meal below this share of a target is worth a suggestion
+MAX_ADD_SUGGESTIONS = 2
+VECTORISE_MIN_ROWS = 32             # numpy's per-call overhead only pays off for batches
+
+
+def _vectorise(rows: Sequence[Any]) -> bool:
+    return NUMPY_AVAILABLE and len(rows) >= VECTORISE_MIN_ROWS and isinstance(rows[0], (list, tuple))
+
+
+def vector(values: Dict[str, float]) -> List[float]:
+    """values (any subset of FIELDS) as a vector in FIELDS order; missing = 0."""
+    return [float(values.get(f, 0.0)) for f in FIELDS]
+
+
+def scaled(vec: Sequence[float], factor: float) -> List[float]:
+    return [v * factor for v in vec]
+
+
+def as_dict(vec: Sequence[float], decimals: int = 2) -> Dict[str, float]:
+    """Non-zero entries of vec by field name, rounded (per-ingredient "micros")."""
+    return {f: round(v, decimals) for f, v in zip(FIELDS, vec) if v}
+
+
+def settled(totals: Sequence[Any], decimals: int = 2) -> List[Any]:
+    """
+    Totals (one vector, or a meals x FIELDS matrix) of `decimals`-rounded item values,
+    rounded once more to the same places. The exact sum has no more places, so this removes
+    the float noise of the summation order (numpy and plain loops then report the same
+    %DV and labels).
+    """
+    if _vectorise(totals):
+        return nutrition_matrix.py_round(totals, decimals).tolist()
+    if totals and isinstance(totals[0], (list, tuple)):
+        return [settled(row, decimals) for row in totals]
+    return [round(v, decimals) for v in totals]
+
+
+def total(vectors: Sequence[Sequence[float]]) -> List[float]:
+    """Element-wise sum of one meal's item vectors (settled)."""
+    if not vectors:
+        return [0.0] * len(FIELDS)
+    return settled([sum(column) for column in zip(*vectors)])
+
+
+def daily_percent(totals: Sequence[Any]) -> List[Any]:
+    """%DV of one totals vector, or of every row of a (meals x FIELDS) matrix."""
+    if _vectorise(totals):
+        return (np.asarray(totals, dtype=np.float64) / np.asarray(DAILY_VALUES) * 100.0).tolist()
+    if totals and isinstance(totals[0], (list, tuple)):
+        return [daily_percent(row) for row in totals]
+    return [v / d * 100.0 for v, d in zip(totals, DAILY_VALUES)]
+
+
+def panels(rows: Sequence[Sequence[float]]) -> List[List[Dict[str, str]]]:
+    """
+    Response "micronutrients" of many meals (rows of totals): every nutrient a meal has a
+    measurable amount of, in FIELDS order. For a batch, values and %DV are rounded for all
+    meals at once.
+    """
+    labels = list(NUTRIENTS.values())
+    if not _vectorise(rows):
+        return [
+            [{"name": label, "value": f"{round(v, 1)}{unit}", "daily": f"{round(v / daily * 100.0)}%"}
+             for (label, unit, daily), v in zip(labels, row) if round(v, 1) > 0]
+            for row in rows
+        ]
+    totals = np.asarray(rows, dtype=np.float64)
+    values = nutrition_matrix.py_round(totals, 1).tolist()
+    percents = nutrition_matrix.py_round(totals / np.asarray(DAILY_VALUES) * 100.0, 0).tolist()
+    return [
+        [{"name": labels[j][0], "value": f"{v}{labels[j][1]}", "daily": f"{int(p)}%"}
+         for j, (v, p) in enumerate(zip(row_values, row_percents)) if v > 0]
+        for row_values, row_percents in zip(values, percents)
+    ]
+
+
+def panel(totals: Sequence[float]) -> List[Dict[str, str]]:
+    """Response "micronutrients" of one meal."""
+    return panels([totals])[0]
+
+
+def best_sources(foods: Dict[str, Tuple[Sequence[float], float]]) -> Dict[str, Tuple[str, float]]:
+    """
+    foods: name -> (vector per 100 g, kcal per 100 g). For every field, the food with the most
+    of it per calorie, with its amount per 100 g.
+    """
+    sources: Dict[str, Tuple[str, float]] = {}
+    for j, f in enumerate(FIELDS):
+        best = None
+        for name, (vec, kcal) in foods.items():
+            if vec[j] > 0 and kcal > 0 and (best is None or vec[j] / kcal > best[0]):
+                best = (vec[j] / kcal, name, vec[j])
+        if best:
+            sources[f] = (best[1], best[2])
+    return sources
+
+
+def suggestions(
+    totals: Sequence[float],
+    sources: Dict[str, Tuple[str, float]],
+    first_id: int = 20,
+) -> List[Dict[str, Any]]:
+    """Suggestion cards from the meal's totals: limits exceeded first, then the weakest targets."""
+    if not any(totals):
+        return []
+    percents = daily_percent(totals)
+    out = []
+    for f in LIMITS:
+        j = FIELDS.index(f)
+        if percents[j] > MEAL_SHARE * 100:
+            label, unit, _ = NUTRIENTS[f]
+            out.append({"type": "reduce", "title": f"Watch {label}",
+                        "description": f"{round(totals[j], 1)}{unit} is {round(percents[j])}% of the daily limit in one meal",
+                        "impact": "Stay under the daily limit", "icon": "🧂"})
+    low = sorted((pct, j) for j, (f, pct) in enumerate(zip(FIELDS, percents))
+                 if f not in LIMITS and f in sources and pct < LOW_SHARE * 100)
+    for pct, j in low[:MAX_ADD_SUGGESTIONS]:
+        f = FIELDS[j]
+        label, unit, _ = NUTRIENTS[f]
+        food, amount = sources[f]
+        has = f"{round(totals[j], 1)}{unit} ({round(pct)}% DV)" if round(totals[j], 1) > 0 else "none"
+        out.append({"type": "add", "title": f"More {label}",
+                    "description": f"This meal has {has}; {food} has {round(amount, 1)}{unit} per 100 g",
+                    "impact": "Closer to the daily value", "icon": "🥦"})
+    for i, s in enumerate(out):
+        s["id"] = first_id + i
+    return out
@@ -0,0 +1,293 @@
+"""
+nutrient_db.py
+
+Memory-mapped nutrient table used by nutrition_extractor when a food is not in FOOD_DB.
+
+A USDA-style CSV (one row per food, per-100g nutrient columns; hundreds of thousands of
+rows) is imported once into a compact columnar directory:
+- nutrients.npy    float32 matrix [foods x columns] in Fortran order, so each nutrient
+                   column is contiguous on disk (NaN = not reported)
+- names.npy        display names, fixed-width UTF-8, in row order
+- index_keys.npy   normalised names and aliases, sorted, fixed-width UTF-8
+- index_rows.npy   int32 row for each index key
+- meta.json        column names and units, row count, source file
+
+At startup the server opens the arrays with np.load(mmap_mode="r"), so nothing is parsed.
+Opening costs the same for 100 rows or 500k, and every worker process shares the same
+page-cache pages. A name lookup is a binary search (np.searchsorted) over index_keys.
+
+Import:
+    python nutrient_db.py import foods.csv [--out data/nutrient_db] [--map protein="Protein (g)"]
+
+Environment:
+- NUTRIENT_DB_PATH (default "data/nutrient_db" next to this file); missing -> FOOD_DB only
+"""
+import os
+import csv
+import sys
+import json
+import argparse
+import threading
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+import food_matcher
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "nutrient_db")
+NUTRIENT_DB_PATH = os.getenv("NUTRIENT_DB_PATH", DEFAULT_PATH)
+
+# canonical column -> (unit, CSV headers it is imported from, case-insensitive)
+COLUMNS: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "calories": ("kcal", ("calories", "energy (kcal)", "energy", "energ_kcal", "kcal")),
+    "protein": ("g", ("protein", "protein (g)", "protein_(g)")),
+    "carbs": ("g", ("carbs", "carbohydrate", "carbohydrate, by difference (g)", "carbohydrt_(g)")),
+    "fat": ("g", ("fat", "total lipid (fat) (g)", "lipid_tot_(g)", "total_fat")),
+    "fiber": ("g", ("fiber", "fiber, total dietary (g)", "fiber_td_(g)")),
+    "sugar": ("g", ("sugar", "sugars, total (g)", "sugar_tot_(g)", "sugars")),
+    "sodium": ("mg", ("sodium", "sodium, na (mg)", "sodium_(mg)")),
+    "potassium": ("mg", ("potassium", "potassium, k (mg)", "potassium_(mg)")),
+    "calcium": ("mg", ("calcium", "calcium, ca (mg)", "calcium_(mg)")),
+    "iron": ("mg", ("iron", "iron, fe (mg)", "iron_(mg)")),
+    "magnesium": ("mg", ("magnesium", "magnesium, mg (mg)", "magnesium_(mg)")),
+    "zinc": ("mg", ("zinc", "zinc, zn (mg)", "zinc_(mg)")),
+    "vitamin_a": ("mcg", ("vitamin_a", "vitamin a, rae (µg)", "vit_a_rae", "vitamin a")),
+    "vitamin_c": ("mg", ("vitamin_c", "vitamin c, total ascorbic acid (mg)", "vit_c_(mg)", "vitamin c")),
+    "vitamin_d": ("mcg", ("vitamin_d", "vitamin d (d2 + d3) (µg)", "vit_d_mcg", "vitamin d")),
+    "vitamin_b12": ("mcg", ("vitamin_b12", "vitamin b-12 (µg)", "vit_b12_(µg)", "vitamin b12")),
+    "folate": ("mcg", ("folate", "folate, dfe (µg)", "folate_dfe_(µg)")),
+}
+NAME_HEADERS = ("name", "description", "food", "food_name", "long_desc", "shrt_desc")
+ALIAS_HEADERS = ("aliases", "common_name", "comname")
+# optional portion columns (grams)
+PORTION_HEADERS = {"grams_per_piece": ("grams_per_piece", "gmwt_1", "portion_grams")}
+
+
+def normalise(name: str) -> str:
+    """Lookup key for a food name: lowercase words joined by single spaces (as food_matcher splits them)."""
+    return " ".join(food_matcher.split_words(name))
+
+
+# ---------------- Import ----------------
+
+def _resolve_headers(headers: List[str], overrides: Dict[str, str]) -> Dict[str, int]:
+    lowered = {h.strip().lower(): i for i, h in enumerate(headers)}
+    found: Dict[str, int] = {}
+    wanted = {col: spec[1] for col, spec in COLUMNS.items()}
+    wanted.update(PORTION_HEADERS)
+    wanted["_name"] = NAME_HEADERS
+    wanted["_aliases"] = ALIAS_HEADERS
+    for col, candidates in wanted.items():
+        if col in overrides:
+            candidates = (overrides[col].strip().lower(),)
+        for candidate in candidates:
+            if candidate in lowered:
+                found[col] = lowered[candidate]
+                break
+    if "_name" not in found:
+        raise ValueError(f"No name column found (tried {', '.join(NAME_HEADERS)}; use --map _name=<header>)")
+    return found
+
+
+def _number(cell: str) -> float:
+    try:
+        return float(cell.replace(",", "")) if cell.strip() else float("nan")
+    except ValueError:
+        return float("nan")
+
+
+def _fixed_width(strings: List[str]) -> "np.ndarray":
+    encoded = [s.encode("utf-8") for s in strings]
+    width = max(1, max((len(b) for b in encoded), default=1))
+    return np.array(encoded, dtype=f"S{width}")
+
+
+def import_csv(csv_path: str, out_dir: str, overrides: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Stream `csv_path` into the columnar layout described above; returns the written meta."""
+    if not NUMPY_AVAILABLE:
+        raise RuntimeError("numpy is required to import a nutrient database")
+    overrides = overrides or {}
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        headers = next(reader)
+        where = _resolve_headers(headers, overrides)
+        columns = [c for c in list(COLUMNS) + list(PORTION_HEADERS) if c in where]
+        values = {c: array("f") for c in columns}        # compact while streaming
+        names: List[str] = []
+        keys: Dict[str, int] = {}
+        for cells in reader:
+            if len(cells) <= where["_name"]:
+                continue
+            name = cells[where["_name"]].strip()
+            key = normalise(name)
+            if not key or key in keys:
+                continue
+            row = len(names)
+            names.append(name)
+            keys[key] = row
+            for c in columns:
+                i = where[c]
+                values[c].append(_number(cells[i]) if i < len(cells) else float("nan"))
+            if "_aliases" in where and where["_aliases"] < len(cells):
+                for alias in cells[where["_aliases"]].replace(";", "|").split("|"):
+                    alias_key = normalise(alias)
+                    if alias_key and alias_key not in keys:
+                        keys[alias_key] = row
+
+    os.makedirs(out_dir, exist_ok=True)
+    matrix = np.empty((len(names), len(columns)), dtype=np.float32, order="F")
+    for j, c in enumerate(columns):
+        matrix[:, j] = np.frombuffer(values[c], dtype=np.float32)
+    np.save(os.path.join(out_dir, "nutrients.npy"), matrix)
+    np.save(os.path.join(out_dir, "names.npy"), _fixed_width(names))
+    sorted_keys = sorted(keys)
+    np.save(os.path.join(out_dir, "index_keys.npy"), _fixed_width(sorted_keys))
+    np.save(os.path.join(out_dir, "index_rows.npy"), np.array([keys[k] for k in sorted_keys], dtype=np.int32))
+    meta = {
+        "version": 1,
+        "rows": len(names),
+        "index_keys": len(sorted_keys),
+        "columns": columns,
+        "units": {c: COLUMNS[c][0] if c in COLUMNS else "g" for c in columns},
+        "source": os.path.basename(csv_path),
+    }
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+# ---------------- Read side ----------------
+
+class NutrientDB:
+    """Read-only view over an imported directory; every array is memory-mapped."""
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.path = path
+        self.columns: List[str] = self.meta["columns"]
+        self.column_index = {c: j for j, c in enumerate(self.columns)}
+        self.nutrients = np.load(os.path.join(path, "nutrients.npy"), mmap_mode="r")
+        self.names = np.load(os.path.join(path, "names.npy"), mmap_mode="r")
+        self.index_keys = np.load(os.path.join(path, "index_keys.npy"), mmap_mode="r")
+        self.index_rows = np.load(os.path.join(path, "index_rows.npy"), mmap_mode="r")
+        self._key_width = self.index_keys.dtype.itemsize
+        self.max_words = max(1, int(self.meta.get("max_words", 8)))
+        # tells a re-import apart from the database indexes were built for (fuzzy_index version)
+        self.identity = (os.path.abspath(path), self.meta.get("rows"), self.meta.get("source"),
+                         os.path.getmtime(os.path.join(path, "meta.json")))
+
+    def __len__(self) -> int:
+        return int(self.nutrients.shape[0])
+
+    def find(self, name: str) -> Optional[int]:
+        """Row of a food by name or alias (normalised), via binary search; None when absent."""
+        key = normalise(name).encode("utf-8")
+        if not key or len(key) > self._key_width:
+            return None
+        i = int(np.searchsorted(self.index_keys, key))
+        if i < len(self.index_keys) and self.index_keys[i] == key:
+            return int(self.index_rows[i])
+        return None
+
+    def name(self, row: int) -> str:
+        return self.names[row].decode("utf-8")
+
+    def per_100g(self, row: int) -> Dict[str, float]:
+        """Reported nutrients of one row (NaN columns left out)."""
+        values = self.nutrients[row]
+        return {c: float(values[j]) for j, c in enumerate(self.columns) if not np.isnan(values[j])}
+
+    def match_phrases(self, words: List[str], covered: Iterable[int] = ()) -> List[Tuple[int, int, int]]:
+        """
+        Leftmost-longest runs of `words` that name a food: (start, end, row) word offsets.
+        Positions in `covered` (already matched elsewhere) are skipped.
+        """
+        blocked = set(covered)
+        found: List[Tuple[int, int, int]] = []
+        i = 0
+        while i < len(words):
+            if i in blocked:
+                i += 1
+                continue
+            hit = None
+            for end in range(min(len(words), i + self.max_words), i, -1):
+                if any(j in blocked for j in range(i, end)):
+                    continue
+                row = self.find(" ".join(words[i:end]))
+                if row is not None:
+                    hit = (i, end, row)
+                    break
+            if hit:
+                found.append(hit)
+                i = hit[1]
+            else:
+                i += 1
+        return found
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "rows": len(self),
+            "index_keys": int(len(self.index_keys)),
+            "columns": self.columns,
+            "source": self.meta.get("source"),
+        }
+
+
+_lock = threading.Lock()
+_db: Optional[NutrientDB] = None
+_load_error: Optional[str] = None
+_loaded = False
+
+
+def get_db() -> Optional[NutrientDB]:
+    """The memory-mapped database at NUTRIENT_DB_PATH, opened once; None when unavailable."""
+    global _db, _load_error, _loaded
+    if _loaded:
+        return _db
+    with _lock:
+        if not _loaded:
+            if not NUMPY_AVAILABLE:
+                _load_error = "numpy not installed"
+            elif not os.path.exists(os.path.join(NUTRIENT_DB_PATH, "meta.json")):
+                _load_error = f"no database at {NUTRIENT_DB_PATH}"
+            else:
+                try:
+                    _db = NutrientDB(NUTRIENT_DB_PATH)
+                    print(f"[nutrient_db] ✅ mapped {len(_db)} foods from {NUTRIENT_DB_PATH}")
+                except Exception as e:
+                    _load_error = str(e)
+            if _db is None:
+                print(f"[nutrient_db] ⚠️ disabled: {_load_error}")
+            _loaded = True
+    return _db
+
+
+def stats() -> Dict[str, Any]:
+    db = get_db()
+    return db.stats() if db is not None else {"enabled": False, "reason": _load_error}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import a per-100g nutrient CSV into the memory-mapped format")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import")
+    imp.add_argument("csv_path")
+    imp.add_argument("--out", default=NUTRIENT_DB_PATH)
+    imp.add_argument("--map", action="append", default=[], metavar="COLUMN=HEADER",
+                     help=f"header for a column ({', '.join(COLUMNS)}, _name, _aliases)")
+    args = parser.parse_args()
+    overrides = dict(item.split("=", 1) for item in args.map)
+    meta = import_csv(args.csv_path, args.out, overrides)
+    print(f"[nutrient_db] imported {meta['rows']} foods ({meta['index_keys']} names) -> {args.out}")
+    print(f"[nutrient_db] columns: {', '.join(meta['columns'])}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
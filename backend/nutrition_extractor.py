@@ -5,28 +5,32 @@ Deterministic local nutrition estimator with compatible response shape.
 
 Routes (server.py mounts blueprint at /api):
  - GET  /api/health
- - POST /api/analyze-nutrition   body: { "description": "..."} or { "imageBase64": "data:...,..." }
+ - POST /api/analyze-nutrition   body: { "description": "..."} or { "imageBase64": "data:...,..." },
+                                  or the photo as multipart/form-data ("image" file) / raw image bytes
+ - POST /api/analyze-nutrition/batch  body: { "descriptions": ["...", ...] }
  - POST /api/enhance-nutrition   body: { "nutritionId": "...", "enhancementType": "...", ... }
 
 Compatibility notes:
  - Response includes: success, message, fallback, nutrition, data (data === nutrition)
  - nutrition contains both totalCalories and calories keys to satisfy various frontends.
 """
+import os
 import re
-import io
 import json
 import uuid
-import base64
+import functools
 import traceback
 from typing import Optional, List, Dict, Any
 from flask import Blueprint, request, jsonify
-
-# optional PIL usage for image dimension heuristics
-try:
-    from PIL import Image
-    PIL_AVAILABLE = True
-except Exception:
-    PIL_AVAILABLE = False
+import uploads
+import image_probe
+import food_matcher
+import fuzzy_index
+import nutrient_db
+import nutrition_matrix
+import nutrition_store
+import nutrition_memo
+import micronutrients
 
 bp = Blueprint("nutrition_extractor", __name__)
 
@@ -41,14 +45,14 @@ FOOD_DB = {
     "lentils": {"per_100g": {"calories": 116, "protein": 9.0, "carbs": 20.0, "fat": 0.4}},
     "mixed vegetables": {"per_100g": {"calories": 40, "protein": 2.0, "carbs": 7.0, "fat": 0.3}},
     "oats": {"per_100g": {"calories": 389, "protein": 17.0, "carbs": 66.0, "fat": 7.0}},
-    "banana": {"per_piece": {"calories": 105, "protein": 1.3, "carbs": 27.0, "fat": 0.3}},
+    "banana": {"per_piece": {"calories": 105, "protein": 1.3, "carbs": 27.0, "fat": 0.3}, "default_grams": 118},
     "potato": {"per_100g": {"calories": 77, "protein": 2.0, "carbs": 17.0, "fat": 0.1}},
     "yogurt": {"per_100g": {"calories": 59, "protein": 10.0, "carbs": 3.6, "fat": 0.4}},
     "bread": {"per_slice": {"calories": 80, "protein": 3.0, "carbs": 14.0, "fat": 1.0}},
     "nuts": {"per_100g": {"calories": 607, "protein": 20.0, "carbs": 21.0, "fat": 54.0}},
     "beef": {"per_100g": {"calories": 250, "protein": 26.0, "carbs": 0, "fat": 15.0}},
     "pasta": {"per_100g": {"calories": 131, "protein": 5.0, "carbs": 25.0, "fat": 1.1}},
-    "apple": {"per_piece": {"calories": 95, "protein": 0.5, "carbs": 25.0, "fat": 0.3}},
+    "apple": {"per_piece": {"calories": 95, "protein": 0.5, "carbs": 25.0, "fat": 0.3}, "default_grams": 182},
 }
 
 SYNONYMS = {
@@ -66,27 +70,139 @@ UNIT_TO_GRAMS = {
     "tsp": 5.0, "slice": 30.0, "piece": None
 }
 
-NUTRITION_STORE: Dict[str, Dict[str, Any]] = {}
+NUTRITION_STORE = nutrition_store.NutritionStore()
+
+BATCH_MAX_DESCRIPTIONS = int(os.getenv("NUTRITION_BATCH_MAX", "5000"))
+
+# FOOD_DB micronutrients per 100 g (approximate USDA values), in micronutrients.FIELDS order:
+#                    fiber sugar sodium potass calcium iron  magnes zinc  vit_a vit_c vit_d  b12   folate
+#                    g     g     mg     mg     mg      mg    mg     mg    mcg   mg    mcg    mcg   mcg
+FOOD_MICROS = {
+    "chicken breast":   (0.0,  0.0,  74,    256,   15,     1.0,  29,    1.0,  6,    0.0,  0.1,   0.34, 4),
+    "salmon":           (0.0,  0.0,  61,    384,   15,     0.3,  30,    0.4,  13,   0.0,  13.1,  2.8,  34),
+    "egg":              (0.0,  0.4,  142,   138,   56,     1.75, 12,    1.3,  160,  0.0,  2.0,   0.89, 47),
+    "rice":             (0.4,  0.1,  1,     35,    10,     1.2,  12,    0.5,  0,    0.0,  0.0,   0.0,  58),
+    "brown rice":       (1.8,  0.4,  5,     43,    10,     0.4,  43,    0.6,  0,    0.0,  0.0,   0.0,  4),
+    "tofu":             (0.3,  0.6,  7,     121,   350,    5.4,  30,    0.8,  0,    0.1,  0.0,   0.0,  15),
+    "lentils":          (7.9,  1.8,  2,     369,   19,     3.3,  36,    1.3,  0,    1.5,  0.0,   0.0,  181),
+    "mixed vegetables": (4.4,  3.1,  35,    169,   25,     0.8,  22,    0.5,  389,  3.2,  0.0,   0.0,  19),
+    "oats":             (10.6, 1.0,  2,     429,   54,     4.7,  177,   4.0,  0,    0.0,  0.0,   0.0,  56),
+    "banana":           (2.6,  12.2, 1,     358,   5,      0.26, 27,    0.15, 3,    8.7,  0.0,   0.0,  20),
+    "potato":           (2.1,  0.8,  6,     425,   12,     0.8,  23,    0.3,  0,    19.7, 0.0,   0.0,  15),
+    "yogurt":           (0.0,  3.2,  36,    141,   110,    0.07, 11,    0.5,  1,    0.0,  0.0,   0.75, 7),
+    "nuts":             (9.0,  4.6,  12,    597,   70,     3.7,  225,   3.8,  1,    0.4,  0.0,   0.0,  50),
+    "beef":             (0.0,  0.0,  72,    305,   18,     2.6,  21,    6.3,  0,    0.0,  0.1,   2.6,  9),
+    "pasta":            (1.8,  0.6,  1,     44,    7,      1.3,  18,    0.5,  0,    0.0,  0.0,   0.0,  72),
+    "apple":            (2.4,  10.4, 1,     107,   6,      0.12, 5,     0.04, 3,    4.6,  0.0,   0.0,  3),
+}
 
 # --- parsing & estimating helpers ---
 
-def identify_food_key(name: str) -> Optional[str]:
+def _resolve_synonym(name: str) -> Optional[str]:
+    """Food key a synonym stands for (its group's food first); only run when the matcher is compiled"""
     n = name.lower().strip()
     if n in FOOD_DB:
         return n
-    for k in FOOD_DB.keys():
-        if n == k or n in k or k in n:
-            return k
     for canon, syns in SYNONYMS.items():
         if n in syns:
             for k in FOOD_DB.keys():
                 if canon in k:
                     return k
+    for k in FOOD_DB.keys():
+        if n in k or k in n:
+            return k
     return None
 
+def _matcher() -> food_matcher.FoodMatcher:
+    """Compiled matcher over FOOD_DB keys and SYNONYMS, rebuilt only when the names change"""
+    return food_matcher.for_table(FOOD_DB, SYNONYMS, _resolve_synonym)
+
+def identify_food_key(name: str, matcher: Optional[food_matcher.FoodMatcher] = None) -> Optional[str]:
+    n = name.lower().strip()
+    if n in FOOD_DB:
+        return n
+    match = (matcher or _matcher()).first(n)
+    if match:
+        return match.key
+    return fuzzy_index.for_table(FOOD_DB, SYNONYMS, _resolve_synonym).lookup(n)
+
+def _db_fuzzy(db: "nutrient_db.NutrientDB") -> Optional[fuzzy_index.FoodIndex]:
+    """Trigram index over the nutrient database names; None while it is built in the background"""
+    return fuzzy_index.for_names(
+        "nutrient_db", lambda: (k.decode("utf-8") for k in db.index_keys), wait=False, version=db.identity
+    )
+
+def _db_match(name: str) -> Optional[Dict[str, Any]]:
+    """First food of the nutrient database named in `name`, as food_key/db_row; None without a database"""
+    db = nutrient_db.get_db()
+    if db is None:
+        return None
+    found = db.match_phrases(list(food_matcher.split_words(name)))
+    if found:
+        row = found[0][2]
+    else:
+        index = _db_fuzzy(db)
+        key = index.lookup(name) if index else None
+        row = db.find(key) if key else None
+        if row is None:
+            return None
+    return {"food_key": nutrient_db.normalise(db.name(row)), "db_row": row}
+
+def _fuzzy_match(phrase: str, table: Optional[fuzzy_index.FoodIndex] = None) -> Optional[Dict[str, Any]]:
+    """Food for a misspelt phrase: FOOD_DB names and synonyms first, then the nutrient database"""
+    key = (table or fuzzy_index.for_table(FOOD_DB, SYNONYMS, _resolve_synonym)).lookup(phrase)
+    if key:
+        return {"food_key": key}
+    db = nutrient_db.get_db()
+    if db is None:
+        return None
+    index = _db_fuzzy(db)
+    key = index.lookup(phrase) if index else None
+    row = db.find(key) if key else None
+    return {"food_key": nutrient_db.normalise(db.name(row)), "db_row": row} if row is not None else None
+
+QUANTITY_WORDS = {"g", "gram", "grams", "kg", "cup", "cups", "tbsp", "tablespoon", "tsp", "slice", "slices",
+                  "piece", "pieces", "oz", "ounce", "ounces"}
+
+def _after_quantity(words: List[str], i: int) -> bool:
+    """Whether words[i] follows a number or unit ("2 salon", "150g of chiken")"""
+    j = i - 1
+    if j >= 0 and words[j] == "of":
+        j -= 1
+    return j >= 0 and (words[j][0].isdigit() or words[j] in QUANTITY_WORDS)
+
+def _fuzzy_mentions(words: List[str], covered: set) -> List[tuple]:
+    """
+    (start, end, match) for misspelt food names among uncovered words, two-word spans first.
+    Ordinary words ("paste", "salon", "break") are only corrected right after a quantity.
+    """
+    table = fuzzy_index.for_table(FOOD_DB, SYNONYMS, _resolve_synonym)
+    free = [i not in covered and w.isalpha() and (not fuzzy_index.is_common_word(w) or _after_quantity(words, i))
+            for i, w in enumerate(words)]
+    found = []
+    i = 0
+    while i < len(words):
+        if not free[i]:
+            i += 1
+            continue
+        step = 1
+        for n in (2, 1):
+            if n == 2 and not (i + 1 < len(words) and free[i + 1]):
+                continue
+            phrase = " ".join(words[i:i + n])
+            match = _fuzzy_match(phrase, table) if fuzzy_index.edit_budget(phrase) else None
+            if match:
+                found.append((i, i + n, match))
+                step = n
+                break
+        i += step
+    return found
+
 def find_food_matches(description: str) -> List[Dict[str, Any]]:
     desc = description.lower()
     matches = []
+    seen = set()
+    matcher = _matcher()
     pattern = r"(\d+(?:[.,]\d+)?)\s*(g|grams|gram|kg|cup|cups|tbsp|tablespoon|tsp|slice|slices|piece|pieces|oz|ounce|ounces)?\s*(of\s+)?([a-zA-Z\s]+?)(?:$|,|\band\b|\.)"
     for m in re.finditer(pattern, desc):
         num_s = m.group(1)
@@ -96,7 +212,7 @@ def find_food_matches(description: str) -> List[Dict[str, Any]]:
             num = float(num_s.replace(",", "."))
         except Exception:
             continue
-        food_key = identify_food_key(raw_food)
+        food_key = identify_food_key(raw_food, matcher)
         quantity_g = None
         count = None
         if unit in ("g", "gram", "grams"):
@@ -118,76 +234,120 @@ def find_food_matches(description: str) -> List[Dict[str, Any]]:
                 count = int(num)
             else:
                 quantity_g = num
-        if food_key:
-            matches.append({"food_key": food_key, "raw": raw_food, "quantity_g": quantity_g, "count": count})
-    # append words present without quantities
-    for k in FOOD_DB.keys():
-        if k in desc and not any(m["food_key"] == k for m in matches):
-            matches.append({"food_key": k, "raw": k, "quantity_g": None, "count": None})
-    for group in SYNONYMS.values():
-        for syn in group:
-            if syn in desc:
-                fk = identify_food_key(syn)
-                if fk and not any(m["food_key"] == fk for m in matches):
-                    matches.append({"food_key": fk, "raw": syn, "quantity_g": None, "count": None})
+        found = {"food_key": food_key} if food_key else _db_match(raw_food)
+        if found and found["food_key"] not in seen:
+            matches.append({**found, "raw": raw_food, "quantity_g": quantity_g, "count": count})
+            seen.add(found["food_key"])
+    # append foods mentioned without quantities (one automaton pass over the text)
+    covered = set()
+    for m in matcher.find_all(desc):
+        covered.update(range(m.start, m.end))
+        if m.key not in seen:
+            seen.add(m.key)
+            matches.append({"food_key": m.key, "raw": m.surface, "quantity_g": None, "count": None})
+    # then the nutrient database, over the words the automaton left unmatched
+    words = list(food_matcher.split_words(desc))
+    db = nutrient_db.get_db()
+    if db is not None:
+        for start, end, row in db.match_phrases(words, covered):
+            covered.update(range(start, end))
+            key = nutrient_db.normalise(db.name(row))
+            if key not in seen:
+                seen.add(key)
+                matches.append({"food_key": key, "db_row": row, "raw": " ".join(words[start:end]), "quantity_g": None, "count": None})
+    # finally misspelt names ("chiken brest") among the words still unmatched
+    for start, end, found in _fuzzy_mentions(words, covered):
+        if found["food_key"] not in seen:
+            seen.add(found["food_key"])
+            matches.append({**found, "raw": " ".join(words[start:end]), "quantity_g": None, "count": None})
     return matches
 
-def estimate_item(item: Dict[str, Any]) -> Dict[str, Any]:
+def _food_entry(item: Dict[str, Any]) -> Dict[str, Any]:
+    """FOOD_DB entry for the item, else its nutrient_db row in the same shape (plus its "micros" vector per 100 g)"""
     key = item["food_key"]
-    db = FOOD_DB.get(key, {})
+    if key in FOOD_DB:
+        return FOOD_DB[key]
+    db = nutrient_db.get_db()
+    row = item.get("db_row")
+    if db is None or (row is None and (row := db.find(key)) is None):
+        return {}
+    values = db.per_100g(row)
+    entry: Dict[str, Any] = {
+        "per_100g": {n: values.get(n, 0.0) for n in ("calories", "protein", "carbs", "fat")},
+        "micros": micronutrients.vector(values),
+        "name": db.name(row),
+    }
+    if values.get("grams_per_piece"):
+        entry["default_grams"] = values["grams_per_piece"]
+    return entry
+
+MACRO_FIELDS = ("calories", "protein", "carbs", "fat")
+# batch quantity-matrix columns: macros, then the micronutrient vector (rounded as estimate_item does)
+NUTRIENT_FIELDS = MACRO_FIELDS + micronutrients.FIELDS
+NUTRIENT_DECIMALS = (1,) * len(MACRO_FIELDS) + (2,) * len(micronutrients.FIELDS)
+NO_MICROS = [0.0] * len(micronutrients.FIELDS)
+FALLBACK_VALUES = {"calories": 100, "protein": 5, "carbs": 10, "fat": 5}
+
+def _portion(item: Dict[str, Any], db: Dict[str, Any]) -> tuple:
+    """(basis, units, quantity text): the item eats `units` of db[basis] ("per_piece"/"per_100g"); basis None = unknown food"""
     qty_g = item.get("quantity_g")
     count = item.get("count")
-    calories = protein = carbs = fat = 0.0
-    qty_desc = ""
     if count and "per_piece" in db:
-        piece = db["per_piece"]
-        calories = piece["calories"] * count
-        protein = piece["protein"] * count
-        carbs = piece.get("carbs", 0) * count
-        fat = piece.get("fat", 0) * count
-        qty_desc = f"{count} piece(s)"
-    elif qty_g and "per_100g" in db:
-        factor = qty_g / 100.0
-        base = db["per_100g"]
-        calories = base["calories"] * factor
-        protein = base["protein"] * factor
-        carbs = base["carbs"] * factor
-        fat = base["fat"] * factor
-        qty_desc = f"{int(qty_g)} g"
-    elif count and "per_100g" in db and db.get("default_grams"):
+        return "per_piece", float(count), f"{count} piece(s)"
+    if qty_g and "per_100g" in db:
+        return "per_100g", qty_g / 100.0, f"{int(qty_g)} g"
+    if count and "per_100g" in db and db.get("default_grams"):
         grams = db.get("default_grams") * count
-        factor = grams / 100.0
-        base = db["per_100g"]
-        calories = base["calories"] * factor
-        protein = base["protein"] * factor
-        carbs = base["carbs"] * factor
-        fat = base["fat"] * factor
-        qty_desc = f"{count} serving(s) (~{int(grams)} g)"
-    elif "per_100g" in db:
-        base = db["per_100g"]
-        calories = base["calories"]
-        protein = base["protein"]
-        carbs = base["carbs"]
-        fat = base["fat"]
-        qty_desc = "100 g (assumed)"
-    elif "per_piece" in db:
-        piece = db["per_piece"]
-        calories = piece["calories"]
-        protein = piece["protein"]
-        carbs = piece.get("carbs", 0)
-        fat = piece.get("fat", 0)
-        qty_desc = "1 piece (assumed)"
-    else:
-        calories = 100; protein = 5; carbs = 10; fat = 5; qty_desc = "assumed"
-    return {
+        return "per_100g", grams / 100.0, f"{count} serving(s) (~{int(grams)} g)"
+    if "per_100g" in db:
+        return "per_100g", 1.0, "100 g (assumed)"
+    if "per_piece" in db:
+        return "per_piece", 1.0, "1 piece (assumed)"
+    return None, 1.0, "assumed"
+
+def _unit_micros(key: str, db: Dict[str, Any], basis: Optional[str]) -> Optional[List[float]]:
+    """Micronutrient vector per unit of db[basis], or None when the food's vector or grams are unknown"""
+    per_100g = db.get("micros") or FOOD_MICROS.get(key)
+    if per_100g is None:
+        return None
+    if basis == "per_100g":
+        return list(per_100g)
+    if basis == "per_piece" and db.get("default_grams"):
+        return micronutrients.scaled(per_100g, db["default_grams"] / 100.0)
+    return None
+
+@functools.lru_cache(maxsize=1)
+def _micro_sources() -> Dict[str, tuple]:
+    """Richest FOOD_DB food per calorie for each micronutrient (for suggestions)"""
+    foods = {}
+    for key, vec in FOOD_MICROS.items():
+        db = FOOD_DB.get(key, {})
+        if "per_100g" in db:
+            foods[key] = (vec, db["per_100g"]["calories"])
+        elif "per_piece" in db and db.get("default_grams"):
+            foods[key] = (vec, db["per_piece"]["calories"] * 100.0 / db["default_grams"])
+    return micronutrients.best_sources(foods)
+
+def estimate_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    key = item["food_key"]
+    db = _food_entry(item)
+    basis, units, qty_desc = _portion(item, db)
+    base = db[basis] if basis else FALLBACK_VALUES
+    calories, protein, carbs, fat = (base.get(n, 0) * units for n in MACRO_FIELDS)
+    out = {
         "id": str(uuid.uuid4()),
-        "name": key,
+        "name": db.get("name", key),
         "quantity": qty_desc,
         "calories": round(float(calories), 1),
         "protein": round(float(protein), 1),
         "carbs": round(float(carbs), 1),
         "fats": round(float(fat), 1)
     }
+    # the food's micronutrient vector, scaled by the units eaten
+    micros = _unit_micros(key, db, basis)
+    if micros is not None:
+        out["micros"] = micronutrients.as_dict(micronutrients.scaled(micros, units))
+    return out
 
 def aggregate(identified: List[Dict[str, Any]]) -> Dict[str, Any]:
     total_cal = sum(i["calories"] for i in identified)
@@ -206,16 +366,8 @@ def aggregate(identified: List[Dict[str, Any]]) -> Dict[str, Any]:
         "carbs": {"value": round(total_carbs, 1), "percentage": carbs_pct},
         "fats": {"value": round(total_fats, 1), "percentage": fats_pct}
     }
-    # simple micronutrients heuristics
-    names = " ".join([i["name"] for i in identified]).lower()
-    micronutrients = []
-    if any(w in names for w in ["banana", "apple", "vegetable", "veg", "spinach"]):
-        micronutrients.append({"name": "Vitamin C", "value": "20-60mg", "daily": "20-60%"})
-        micronutrients.append({"name": "Fiber", "value": "3-8g", "daily": "10-30%"})
-    if "yogurt" in names or "cheese" in names:
-        micronutrients.append({"name": "Calcium", "value": "100-250mg", "daily": "10-25%"})
-    if not micronutrients:
-        micronutrients.append({"name": "Iron", "value": "1-3mg", "daily": "5-15%"})
+    # micronutrients: sum of the items' vectors, %DV against the reference intakes
+    micro_totals = micronutrients.total([micronutrients.vector(i.get("micros") or {}) for i in identified])
     suggestions = []
     if total_cal > 800:
         suggestions.append({"id": 1, "type": "reduce", "title": "Reduce portion", "description": "Consider smaller portions", "impact": "Lower calories", "icon": "🍽️"})
@@ -223,6 +375,7 @@ def aggregate(identified: List[Dict[str, Any]]) -> Dict[str, Any]:
         suggestions.append({"id": 2, "type": "reduce", "title": "Lower fats", "description": "Choose leaner options", "impact": "Better heart health", "icon": "🫒"})
     if protein_pct < 15:
         suggestions.append({"id": 3, "type": "add", "title": "Add protein", "description": "Include lean protein or legumes", "impact": "Satiety & muscle", "icon": "🍗"})
+    suggestions.extend(micronutrients.suggestions(micro_totals, _micro_sources()))
     if not suggestions:
         suggestions.append({"id": 10, "type": "balance", "title": "Balanced meal", "description": "Looks reasonably balanced", "impact": "Maintain", "icon": "✅"})
     return {
@@ -231,13 +384,110 @@ def aggregate(identified: List[Dict[str, Any]]) -> Dict[str, Any]:
         "totalCalories": int(round(total_cal)),
         "calories": int(round(total_cal)),   # compatibility alias
         "macros": macros,
-        "micronutrients": micronutrients,
+        "micronutrients": micronutrients.panel(micro_totals),
         "identifiedIngredients": identified,
         "suggestions": suggestions,
         "confidence": "low",
         "analysisTime": "local_estimate"
     }
 
+def _macros_from_totals(protein: float, carbs: float, fats: float) -> Dict[str, Any]:
+    sum_macros = max(1.0, protein * 4.0 + carbs * 4.0 + fats * 9.0)
+    return {
+        "protein": {"value": round(protein, 1), "percentage": round((protein * 4.0 / sum_macros) * 100, 1)},
+        "carbs": {"value": round(carbs, 1), "percentage": round((carbs * 4.0 / sum_macros) * 100, 1)},
+        "fats": {"value": round(fats, 1), "percentage": round((fats * 9.0 / sum_macros) * 100, 1)}
+    }
+
+def analyze_batch(descriptions: List[Any]) -> List[Dict[str, Any]]:
+    """
+    Calories, macros and micronutrients for many descriptions at once, in input order. Every
+    description is parsed into one row of a sparse quantity matrix; the totals come from a
+    single product with the nutrient matrix (nutrition_matrix) instead of
+    estimate_item/aggregate per text.
+    """
+    q = nutrition_matrix.QuantityMatrix(NUTRIENT_FIELDS)
+    entries: Dict[str, Dict[str, Any]] = {}
+    parsed = []     # per description: None (invalid) or (confidence, [(name, quantity)])
+    for text in descriptions:
+        desc = text.strip() if isinstance(text, str) else ""
+        if not desc:
+            parsed.append(None)
+            q.end_row()
+            continue
+        items, confidence = find_food_matches(desc), "medium"
+        if not items:
+            items, confidence = heuristic_items(desc), "low"
+        labels = []
+        for it in items:
+            key = it["food_key"]
+            if key not in entries:
+                entries[key] = _food_entry(it)
+            db = entries[key]
+            basis, units, qty_desc = _portion(it, db)
+            base = db[basis] if basis else FALLBACK_VALUES
+            micros = _unit_micros(key, db, basis)
+            q.add((key, basis), units, [base.get(n, 0) for n in MACRO_FIELDS] + (micros if micros is not None else NO_MICROS))
+            labels.append((db.get("name", key), qty_desc))
+        parsed.append((confidence, labels))
+        q.end_row()
+
+    item_values, totals = q.product(decimals=NUTRIENT_DECIMALS)
+    # micronutrient panels for the whole batch at once (%DV: one division by the daily values)
+    micro_panels = micronutrients.panels(micronutrients.settled([t[len(MACRO_FIELDS):] for t in totals]))
+    results = []
+    offset = 0
+    for index, (entry, total) in enumerate(zip(parsed, totals)):
+        if entry is None:
+            results.append({"index": index, "success": False, "message": "Description empty"})
+            continue
+        confidence, labels = entry
+        if not labels:
+            default = get_default()
+            results.append({"index": index, "success": True, "fallback": True, "totalCalories": default["totalCalories"],
+                            "calories": default["calories"], "macros": default["macros"],
+                            "identifiedIngredients": default["identifiedIngredients"], "confidence": "low"})
+            continue
+        identified = []
+        for (name, quantity), values in zip(labels, item_values[offset:offset + len(labels)]):
+            cal, protein, carbs, fat = values[:len(MACRO_FIELDS)]
+            identified.append({"name": name, "quantity": quantity, "calories": cal, "protein": protein, "carbs": carbs, "fats": fat})
+        offset += len(labels)
+        results.append({
+            "index": index,
+            "success": True,
+            "fallback": False,
+            "totalCalories": int(round(total[0])),
+            "calories": int(round(total[0])),
+            "macros": _macros_from_totals(total[1], total[2], total[3]),
+            "micronutrients": micro_panels[index],
+            "identifiedIngredients": identified,
+            "confidence": confidence,
+        })
+    return results
+
+def analyze_description(desc: str) -> Dict[str, Any]:
+    """Full analysis of one text description (matched foods, else keyword heuristics)."""
+    identified = []
+    for it in find_food_matches(desc):
+        try:
+            identified.append(estimate_item(it))
+        except Exception:
+            continue
+    if identified:
+        nutrition_result = aggregate(identified)
+        nutrition_result["confidence"] = "medium"
+    else:
+        nutrition_result = heuristic_free_text(desc)
+        nutrition_result["confidence"] = "low"
+    nutrition_result["inputType"] = "text"
+    return nutrition_result
+
+def _memo_generation() -> tuple:
+    """Changes whenever analyze_description could answer differently for the same text."""
+    identity = getattr(nutrient_db.get_db(), "identity", None)
+    return (food_matcher.table_signature(FOOD_DB, SYNONYMS), identity, fuzzy_index.is_ready("nutrient_db", identity))
+
 def deterministic_image_estimate(width: int, height: int) -> Dict[str, Any]:
     area = max(1, width * height)
     scaled = 400 + (area % 300)
@@ -251,11 +501,35 @@ def deterministic_image_estimate(width: int, height: int) -> Dict[str, Any]:
 
 @bp.route("/health", methods=["GET"])
 def health():
-    return jsonify({"success": True, "message": "nutrition-extractor ready", "model": "local-estimator"}), 200
+    return jsonify({"success": True, "message": "nutrition-extractor ready", "model": "local-estimator", "image_probe": image_probe.stats(), "food_matcher": food_matcher.stats(), "nutrient_db": nutrient_db.stats(), "fuzzy_index": fuzzy_index.stats(), "nutrition_store": NUTRITION_STORE.stats(), "nutrition_memo": nutrition_memo.stats()}), 200
+
+def _image_size(probed: Optional[tuple]) -> tuple:
+    """Pixel size from an image_probe result; 400x300 when unknown"""
+    if probed:
+        return probed[1], probed[2]
+    return 400, 300
+
+def _image_estimate(width: int, height: int) -> Dict[str, Any]:
+    nutrition_result = deterministic_image_estimate(width, height)
+    nutrition_result["inputType"] = "image"
+    nutrition_result["confidence"] = "low"
+    return nutrition_result
 
 @bp.route("/analyze-nutrition", methods=["POST"])
 def analyze_nutrition():
     try:
+        if uploads.is_binary_upload():
+            try:
+                upload = uploads.read_photo("image")
+            except uploads.UploadError as e:
+                fallback = get_default()
+                return jsonify({"success": False, "message": str(e), "fallback": True, "nutrition": fallback, "data": fallback}), e.status
+            with upload:
+                nutrition_result = _image_estimate(*_image_size(image_probe.probe_file(upload.fileobj, upload.size)))
+            nutrition_result["id"] = str(uuid.uuid4())
+            NUTRITION_STORE.put(nutrition_result["id"], nutrition_result)
+            return jsonify({"success": True, "message": "Analysis complete", "fallback": False, "nutrition": nutrition_result, "data": nutrition_result}), 200
+
         data = request.get_json(force=True, silent=True) or {}
         if not data:
             fallback = get_default()
@@ -268,43 +542,17 @@ def analyze_nutrition():
             if not desc:
                 fallback = get_default()
                 return jsonify({"success": False, "message": "Description empty", "fallback": True, "nutrition": fallback, "data": fallback}), 400
-            matches = find_food_matches(desc)
-            if matches:
-                identified = []
-                for it in matches:
-                    try:
-                        identified.append(estimate_item(it))
-                    except Exception:
-                        continue
-                if identified:
-                    nutrition_result = aggregate(identified)
-                    nutrition_result["confidence"] = "medium"
-                else:
-                    nutrition_result = heuristic_free_text(desc)
-                    nutrition_result["confidence"] = "low"
-            else:
-                nutrition_result = heuristic_free_text(desc)
-                nutrition_result["confidence"] = "low"
-            nutrition_result["inputType"] = "text"
+            # repeated descriptions (in any spelling of the same quantities) come from the memo
+            nutrition_result = nutrition_memo.cached_analysis(desc, _memo_generation(), analyze_description)
 
         elif "imageBase64" in data:
             img_b64 = data.get("imageBase64", "")
-            if "," in img_b64:
-                img_b64 = img_b64.split(",", 1)[1]
-            if not img_b64 or len(img_b64) < 50:
+            start = img_b64.find(",") + 1       # payload offset; the string is not copied
+            if len(img_b64) - start < 50:
                 fallback = get_default()
                 return jsonify({"success": False, "message": "Invalid image data", "fallback": True, "nutrition": fallback, "data": fallback}), 400
-            width = 400; height = 300
-            if PIL_AVAILABLE:
-                try:
-                    raw = base64.b64decode(img_b64)
-                    im = Image.open(io.BytesIO(raw))
-                    width, height = im.size
-                except Exception:
-                    width, height = 400, 300
-            nutrition_result = deterministic_image_estimate(width, height)
-            nutrition_result["inputType"] = "image"
-            nutrition_result["confidence"] = "low"
+            # only the leading base64 chunk holding the header is decoded (image_probe)
+            nutrition_result = _image_estimate(*_image_size(image_probe.probe_base64(img_b64, start)))
 
         else:
             fallback = get_default()
@@ -312,15 +560,31 @@ def analyze_nutrition():
 
         # store and return both 'nutrition' and 'data' keys
         nutrition_result["id"] = nutrition_result.get("id", str(uuid.uuid4()))
-        NUTRITION_STORE[nutrition_result["id"]] = nutrition_result
+        NUTRITION_STORE.put(nutrition_result["id"], nutrition_result)
         return jsonify({"success": True, "message": "Analysis complete", "fallback": False, "nutrition": nutrition_result, "data": nutrition_result}), 200
 
     except Exception as e:
         traceback.print_exc()
         fallback = get_default()
-        NUTRITION_STORE[fallback["id"]] = fallback
+        NUTRITION_STORE.put(fallback["id"], fallback)
         return jsonify({"success": False, "message": f"Internal error: {e}", "fallback": True, "nutrition": fallback, "data": fallback}), 500
 
+@bp.route("/analyze-nutrition/batch", methods=["POST"])
+def analyze_nutrition_batch():
+    """body: { "descriptions": ["...", ...] } -> one result per description, in input order (results are not stored)"""
+    try:
+        data = request.get_json(force=True, silent=True) or {}
+        descriptions = data.get("descriptions")
+        if not isinstance(descriptions, list) or not descriptions:
+            return jsonify({"success": False, "message": "Provide 'descriptions' as a non-empty list"}), 400
+        if len(descriptions) > BATCH_MAX_DESCRIPTIONS:
+            return jsonify({"success": False, "message": f"At most {BATCH_MAX_DESCRIPTIONS} descriptions per batch"}), 413
+        results = analyze_batch(descriptions)
+        return jsonify({"success": True, "message": "Analysis complete", "count": len(results), "results": results}), 200
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"success": False, "message": f"Internal error: {e}"}), 500
+
 @bp.route("/enhance-nutrition", methods=["POST"])
 def enhance_nutrition():
     try:
@@ -342,7 +606,7 @@ def models():
 
 @bp.route("/", methods=["GET"])
 def home():
-    return jsonify({"message": "Nutrition Analyzer (local)", "endpoints": {"analyze": "/analyze-nutrition", "enhance": "/enhance-nutrition", "health": "/health"}}), 200
+    return jsonify({"message": "Nutrition Analyzer (local)", "endpoints": {"analyze": "/analyze-nutrition", "batch": "/analyze-nutrition/batch", "enhance": "/enhance-nutrition", "health": "/health"}}), 200
 
 # helper fallback & heuristic functions
 
@@ -363,17 +627,22 @@ def get_default() -> Dict[str, Any]:
     }
     return obj
 
-def heuristic_free_text(text: str) -> Dict[str, Any]:
-    t = text.lower()
+def heuristic_items(text: str) -> List[Dict[str, Any]]:
+    """Guessed food items for text that names no known food (may be empty); whole words only"""
+    words = set(food_matcher.split_words(text))
     items = []
-    if any(w in t for w in ["chicken", "breast"]):
+    if words & {"chicken", "breast", "breasts"}:
         items.append({"food_key": "chicken breast", "quantity_g": 150, "count": None})
-    if any(w in t for w in ["rice", "biryani", "pulao", "pilaf", "fried rice"]):
+    if words & {"rice", "biryani", "pulao", "pilaf"}:
         items.append({"food_key": "rice", "quantity_g": 150, "count": None})
-    if any(w in t for w in ["egg", "eggs"]):
+    if words & {"egg", "eggs"}:
         items.append({"food_key": "egg", "quantity_g": None, "count": 2})
-    if any(w in t for w in ["salad", "vegetable", "veg", "veggies"]):
+    if words & {"salad", "salads", "vegetable", "vegetables", "veg", "veggie", "veggies"}:
         items.append({"food_key": "mixed vegetables", "quantity_g": 100, "count": None})
+    return items
+
+def heuristic_free_text(text: str) -> Dict[str, Any]:
+    items = heuristic_items(text)
     if not items:
         return get_default()
     identified = [estimate_item(it) for it in items]
@@ -383,4 +652,7 @@ def heuristic_free_text(text: str) -> Dict[str, Any]:
 nutrition_bp = bp
 
 def init_app(app):
+    db = nutrient_db.get_db()   # map the nutrient database now rather than on the first request
+    if db is not None:
+        _db_fuzzy(db)           # starts the typo index build in the background
     print("[nutrition_extractor] ✅ deterministic nutrition extractor initialized")
@@ -0,0 +1,111 @@
+"""
+nutrition_matrix.py
+
+Sparse quantity matrix for batch nutrition analysis (POST /api/analyze-nutrition/batch).
+
+Q has one row per description and one column per distinct (food, basis) seen in the batch.
+Each entry is the number of basis units eaten, e.g. 1.5 x per_100g or 2 x per_piece. It is
+kept in CSR form: indptr, column indices and values, appended row by row. N is the dense
+(columns x nutrients) matrix of per-unit values. One product Q @ N gives the totals of
+every description. Rows are aligned on the CSR offsets, so the product is a gather, a scale
+and a segmented np.add.reduceat, all vectorised:
+- item values = units[:, None] * N[cols]   (also returned: the per-ingredient numbers)
+- totals      = row-wise sums of item values
+
+Without numpy the same numbers are computed with plain loops.
+"""
+from array import array
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple, Union
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+
+def py_round(values: "np.ndarray", decimals: Union[int, Sequence[int]]) -> "np.ndarray":
+    """
+    Python's round() element-wise (decimals: one, or one per last-axis column), vectorised.
+    Scale-and-rint (what np.round does) is exact except near a tie, where the scaled value's
+    float error can tip it; those few values are redone with round().
+    """
+    values = np.asarray(values, dtype=np.float64)
+    places = np.broadcast_to(np.asarray(decimals), values.shape)
+    scale = 10.0 ** places
+    scaled = values * scale
+    out = np.rint(scaled) / scale
+    near = np.abs(scaled - np.floor(scaled) - 0.5) <= 1e-9 + 1e-12 * np.abs(scaled)
+    for index in zip(*np.nonzero(near)):
+        out[index] = round(float(values[index]), int(places[index]))
+    return out
+
+
+class QuantityMatrix:
+    """Descriptions x foods quantities, appended one description (row) at a time."""
+
+    def __init__(self, fields: Sequence[str]):
+        self.fields = tuple(fields)
+        self.indptr = array("q", [0])
+        self.cols = array("q")
+        self.units = array("d")
+        self._columns: Dict[Hashable, int] = {}
+        self._values: List[Sequence[float]] = []     # per-unit nutrients of each column
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self.indptr) - 1, len(self._columns)
+
+    def add(self, key: Hashable, units: float, values: Sequence[float]):
+        """Add `units` of column `key` to the current row; `values` (per unit, in `fields` order) is read the first time `key` is seen."""
+        col = self._columns.get(key)
+        if col is None:
+            col = self._columns[key] = len(self._values)
+            self._values.append(values)
+        self.cols.append(col)
+        self.units.append(units)
+
+    def end_row(self):
+        self.indptr.append(len(self.cols))
+
+    def product(self, decimals: Union[None, int, Sequence[int]] = None) -> Tuple[List[List[float]], List[List[float]]]:
+        """
+        (item values, row totals) as nested lists: one item row per stored entry, one total
+        row per description. With `decimals` (one for all fields, or one per field), item
+        values are rounded before summing, as the single-description path does.
+        """
+        rows, width = len(self.indptr) - 1, len(self.fields)
+        if not self.cols:
+            return [], [[0.0] * width for _ in range(rows)]
+        if isinstance(decimals, int):
+            decimals = [decimals] * width
+        if not NUMPY_AVAILABLE:
+            return self._product_loops(decimals)
+        nutrients = np.asarray(self._values, dtype=np.float64).reshape(-1, width)
+        cols = np.frombuffer(self.cols, dtype=np.int64)
+        items = np.frombuffer(self.units, dtype=np.float64)[:, None] * nutrients[cols]
+        if decimals is not None:
+            # rounded as round() does (not np.round), so half-way values such as 1159.35 come
+            # out as in the single-description path
+            items = py_round(items, decimals)
+        indptr = np.frombuffer(self.indptr, dtype=np.int64)
+        starts = indptr[:-1]
+        nonempty = starts < indptr[1:]
+        totals = np.zeros((rows, width))
+        totals[nonempty] = np.add.reduceat(items, starts[nonempty], axis=0)
+        return items.tolist(), totals.tolist()
+
+    def _product_loops(self, decimals: Optional[Sequence[int]]) -> Tuple[List[List[float]], List[List[float]]]:
+        items = []
+        for col, units in zip(self.cols, self.units):
+            values = [v * units for v in self._values[col]]
+            items.append([round(v, d) for v, d in zip(values, decimals)] if decimals is not None else values)
+        totals = []
+        for start, end in zip(self.indptr, self.indptr[1:]):
+            totals.append([sum(column) for column in zip(*items[start:end])] or [0.0] * len(self.fields))
+        return items, totals
+
+    def stats(self) -> Dict[str, Any]:
+        rows, columns = self.shape
+        return {"rows": rows, "columns": columns, "nonzeros": len(self.cols),
+                "density": round(len(self.cols) / (rows * columns), 6) if rows and columns else 0.0}
@@ -0,0 +1,172 @@
+"""
+nutrition_memo.py
+
+Memo for text analyses in /api/analyze-nutrition, keyed on a canonical form of the
+description.
+
+Meal loggers send the same strings again and again ("2 eggs and 1 slice bread"). A
+description is canonicalised (canonical_description) by:
+- lowercasing it
+- collapsing whitespace
+- writing numbers plainly: "2.0" -> "2", "1,5" -> "1.5", "007" -> "7"
+- attaching units and writing them one way: "100 grams" -> "100g", "2 Cups" -> "2cup"
+
+Spelling variants then share one entry. The analysis itself always runs on the canonical
+text, so a cached result depends only on its key, never on which variant arrived first. A
+hit reuses the stored aggregate and allocates fresh ids only (the result and each
+ingredient).
+
+Entries are stored without ids, as zlib-compressed compact JSON (nutrition_store.pack_result).
+The default 100k entries take some tens of MB, not the GBs of full dicts. The memo is
+dropped whenever the food data changes: FOOD_DB/SYNONYMS names, the nutrient database, or
+its typo index becoming ready (`generation`).
+
+Environment:
+- NUTRITION_MEMO_ENABLED     (default "1")
+- NUTRITION_MEMO_MAX_ENTRIES (default 100000)
+"""
+import os
+import re
+import uuid
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from nutrition_store import pack_result, unpack_result
+
+MEMO_ENABLED = os.getenv("NUTRITION_MEMO_ENABLED", "1") == "1"
+MEMO_MAX_ENTRIES = int(os.getenv("NUTRITION_MEMO_MAX_ENTRIES", "100000"))
+
+# unit spellings the quantity parser treats alike -> the one canonical spelling
+_UNITS = {
+    "g": "g", "gram": "g", "grams": "g",
+    "kg": "kg",
+    "cup": "cup", "cups": "cup",
+    "tbsp": "tbsp", "tablespoon": "tbsp",
+    "tsp": "tsp",
+    "slice": "slice", "slices": "slice",
+    "piece": "piece", "pieces": "piece",
+    "oz": "oz", "ounce": "oz", "ounces": "oz",
+}
+_SPACE_RE = re.compile(r"\s+")
+_DECIMAL_COMMA_RE = re.compile(r"(?<=\d),(?=\d)")
+_QUANTITY_RE = re.compile(r"(\d+(?:\.\d+)?)(?:\s*(" + "|".join(sorted(_UNITS, key=len, reverse=True)) + r")\b)?")
+
+
+def _number(text: str) -> str:
+    whole, _, fraction = text.partition(".")
+    whole = whole.lstrip("0") or "0"
+    fraction = fraction.rstrip("0")
+    return f"{whole}.{fraction}" if fraction else whole
+
+
+def canonical_description(description: str) -> str:
+    text = _SPACE_RE.sub(" ", description.lower()).strip()
+    text = _DECIMAL_COMMA_RE.sub(".", text)
+    return _QUANTITY_RE.sub(lambda m: _number(m.group(1)) + (_UNITS[m.group(2)] if m.group(2) else ""), text)
+
+
+def _strip_ids(result: Dict[str, Any]) -> Dict[str, Any]:
+    stripped = dict(result)
+    stripped.pop("id", None)
+    stripped["identifiedIngredients"] = [
+        {k: v for k, v in item.items() if k != "id"} for item in result.get("identifiedIngredients", [])
+    ]
+    return stripped
+
+
+def _with_fresh_ids(result: Dict[str, Any]) -> Dict[str, Any]:
+    result["id"] = str(uuid.uuid4())
+    for item in result.get("identifiedIngredients", []):
+        item["id"] = str(uuid.uuid4())
+    return result
+
+
+class NutritionMemo:
+    """canonical description -> analysis result (without ids), LRU-bounded."""
+
+    def __init__(self, max_entries: int = MEMO_MAX_ENTRIES):
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._generation: Optional[Hashable] = None
+        self.bytes = 0
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def _check_generation(self, generation: Hashable):
+        if generation != self._generation:
+            if self._entries:
+                self.counters["invalidations"] += 1
+            self._entries.clear()
+            self.bytes = 0
+            self._generation = generation
+
+    def get(self, key: str, generation: Hashable) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._check_generation(generation)
+            blob = self._entries.get(key)
+            if blob is None:
+                self.counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+        return _with_fresh_ids(unpack_result(blob))
+
+    def put(self, key: str, generation: Hashable, result: Dict[str, Any]):
+        blob = pack_result(_strip_ids(result))
+        with self._lock:
+            self._check_generation(generation)
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old)
+            self._entries[key] = blob
+            self.bytes += len(blob)
+            while len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.counters["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            c = dict(self.counters)
+            lookups = c["hits"] + c["misses"]
+            return {
+                "enabled": MEMO_ENABLED,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self.bytes,
+                "hit_rate": round(c["hits"] / lookups, 4) if lookups else 0.0,
+                **c,
+            }
+
+
+memo = NutritionMemo()
+
+
+def stats() -> Dict[str, Any]:
+    return memo.stats()
+
+
+def cached_analysis(
+    description: str,
+    generation: Hashable,
+    analyze: Callable[[str], Dict[str, Any]],
+) -> Dict[str, Any]:
+    """
+    analyze(canonical description), served from the memo when the canonical form was seen before.
+    Hits and misses alike get fresh uuid ids, whatever ids analyze() assigned.
+    """
+    key = canonical_description(description)
+    if not MEMO_ENABLED:
+        return _with_fresh_ids(analyze(key))
+    hit = memo.get(key, generation)
+    if hit is not None:
+        return hit
+    result = _with_fresh_ids(analyze(key))
+    memo.put(key, generation, result)
+    return result
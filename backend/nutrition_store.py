@@ -0,0 +1,136 @@
+"""
+nutrition_store.py
+
+Bounded store for analysis results, so /api/enhance-nutrition can look them up by id.
+
+Results used to be kept forever as the full response dicts: ingredient lists, suggestion
+dicts, one UUID string per item. Each result is now kept as one small __slots__ entry:
+- its JSON (compact separators), zlib-compressed: a few hundred bytes instead of several KB
+  of Python objects
+- its expiry time
+
+The JSON is expanded back into a dict only when the result is read. Every read gets a fresh
+copy, so callers can mutate it freely.
+
+Limits, whichever is hit first; the least recently used entries go first:
+- NUTRITION_STORE_MAX_ENTRIES (default 10000)
+- NUTRITION_STORE_MAX_BYTES   (default 16 MiB, counted as payload + per-entry overhead)
+- NUTRITION_STORE_TTL         (default 86400 seconds)
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+STORE_MAX_ENTRIES = int(os.getenv("NUTRITION_STORE_MAX_ENTRIES", "10000"))
+STORE_MAX_BYTES = int(os.getenv("NUTRITION_STORE_MAX_BYTES", str(16 * 1024 * 1024)))
+STORE_TTL = float(os.getenv("NUTRITION_STORE_TTL", str(24 * 3600)))
+
+
+class _Entry:
+    __slots__ = ("blob", "expires_at", "size")
+
+    def __init__(self, blob: bytes, expires_at: float, size: int):
+        self.blob = blob
+        self.expires_at = expires_at
+        self.size = size
+
+
+# entry object + its key + the OrderedDict link, on top of the compressed payload
+_ENTRY_OVERHEAD = sys.getsizeof(_Entry(b"", 0.0, 0)) + 150
+
+
+def pack_result(result: Dict[str, Any]) -> bytes:
+    return zlib.compress(json.dumps(result, separators=(",", ":"), ensure_ascii=False).encode("utf-8"), 1)
+
+
+def unpack_result(blob: bytes) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(blob))
+
+
+class NutritionStore:
+    """id -> analysis result, bounded by entry count, bytes and age (LRU eviction)."""
+
+    def __init__(self, max_entries: int = STORE_MAX_ENTRIES, max_bytes: int = STORE_MAX_BYTES, ttl: float = STORE_TTL):
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max(1, max_bytes)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.bytes = 0
+        self.counters = {"sets": 0, "hits": 0, "misses": 0, "evictions": 0, "expired": 0, "rejected": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, result_id: str) -> bool:
+        entry = self._entries.get(result_id)
+        return entry is not None and entry.expires_at >= time.time()
+
+    def _drop(self, result_id: str) -> _Entry:
+        entry = self._entries.pop(result_id)
+        self.bytes -= entry.size
+        return entry
+
+    def put(self, result_id: str, result: Dict[str, Any]):
+        blob = pack_result(result)
+        size = len(blob) + len(result_id) + _ENTRY_OVERHEAD
+        now = time.time()
+        with self._lock:
+            if result_id in self._entries:
+                self._drop(result_id)
+            if size > self.max_bytes:
+                self.counters["rejected"] += 1
+                return
+            self._entries[result_id] = _Entry(blob, now + self.ttl, size)
+            self.bytes += size
+            self.counters["sets"] += 1
+            # expired entries at the cold end go first, then LRU until within both limits
+            while self._entries:
+                oldest_id, oldest = next(iter(self._entries.items()))
+                if oldest.expires_at < now:
+                    self._drop(oldest_id)
+                    self.counters["expired"] += 1
+                elif len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                    self._drop(oldest_id)
+                    self.counters["evictions"] += 1
+                else:
+                    break
+
+    def get(self, result_id: str) -> Optional[Dict[str, Any]]:
+        """The stored result as a fresh dict, or None (unknown, evicted or expired)."""
+        with self._lock:
+            entry = self._entries.get(result_id)
+            if entry is not None and entry.expires_at < time.time():
+                self._drop(result_id)
+                self.counters["expired"] += 1
+                entry = None
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            self._entries.move_to_end(result_id)
+            self.counters["hits"] += 1
+            blob = entry.blob
+        return unpack_result(blob)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = len(self._entries)
+            return {
+                "entries": entries,
+                "bytes": self.bytes,
+                "avg_entry_bytes": round(self.bytes / entries) if entries else 0,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                **self.counters,
+            }
@@ -5,8 +5,10 @@ Flask blueprint for the Recipe Extractor backend.
 
 Endpoints:
 - GET  /health
-- POST /photo      -> {"image": "data:image/jpeg;base64,...."}
+- POST /photo      -> {"image": "data:image/jpeg;base64,...."}, or multipart/form-data with an
+                       "image" file, or the raw bytes as application/octet-stream / image/*
 - POST /dish-name  -> {"dishName": "Paneer Butter Masala"}
+  (/photo and /dish-name stream Server-Sent Events when sent with Accept: text/event-stream)
 - POST /url        -> {"url": "https://..."}
 - POST /enhance    -> {"recipeId": "...", "enhancementType": "vegetarian" | "spicier" | "double-portions" | "custom",
                        "customInstructions": "..."}
@@ -14,19 +16,22 @@ Endpoints:
 """
 
 import os
-import re
-import io
 import json
 import uuid
-import base64
 import traceback
-from typing import Optional
+from typing import Any, Optional
 from database import save_recipe_to_db, get_user_saved_recipes
-from flask import Blueprint, request, jsonify
-from PIL import Image
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 import requests
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
+import llm_gateway
+import llm_json
+import image_pipeline
+import image_hash
+import uploads
+from json_stream import RecipeStreamParser
+from singleflight import SingleFlight
 
 # Load .env if present
 load_dotenv()
@@ -42,22 +47,6 @@ if not GEMINI_API_KEY:
 if not GROQ_API_KEY:
     print("WARNING: GROQ_API_KEY not set. Groq calls will fail until provided.")
 
-# === Import SDKs (deferred) ===
-try:
-    from google import genai
-    # create Gemini client (Google Gen AI)
-    genai_client = genai.Client(api_key=GEMINI_API_KEY) if GEMINI_API_KEY else None
-except Exception as e:
-    genai_client = None
-    print("google-genai import failed:", e)
-
-try:
-    from groq import Groq
-    groq_client = Groq(api_key=GROQ_API_KEY) if GROQ_API_KEY else None
-except Exception as e:
-    groq_client = None
-    print("groq import failed:", e)
-
 # === Blueprint ===
 extractor_bp = Blueprint("recipe_extractor", __name__)
 
@@ -69,69 +58,119 @@ RECIPE_STORE = {}
 def parse_json_from_text(text: str) -> Optional[dict]:
     """
     Try to extract JSON object from a model's textual response.
-    The model is asked to return strict JSON, but we defensively parse.
+    The model is asked to return strict JSON, but we defensively parse
+    (linear scan for balanced candidates, then local repair; see llm_json).
     """
-    try:
-        # First try direct parse
-        return json.loads(text)
-    except Exception:
-        # Attempt to extract the first {...} block
-        m = re.search(r"(\{(?:.|\n)*\})", text)
-        if m:
-            candidate = m.group(1)
-            try:
-                return json.loads(candidate)
-            except Exception:
-                # try fixing single quotes
-                try:
-                    candidate2 = candidate.replace("'", '"')
-                    return json.loads(candidate2)
-                except Exception:
-                    pass
-    return None
+    return llm_json.parse_json_from_text(text, expect=dict)
 
 def safe_json(obj):
     return json.loads(json.dumps(obj))
 
-def call_gemini_image_to_text(pil_image: Image.Image, prompt_text: str) -> str:
+def call_gemini_image_to_text(image: Any, prompt_text: str, json_mode: bool = False,
+                              cache: Optional[str] = None, cache_validate=None) -> str:
     """
-    Use google-genai client to send an image + prompt, return text.
+    Send an image + prompt to Gemini through the shared gateway, return text.
+    With cache="<namespace>" a near-identical photo answered before is served from image_hash.
     """
-    if genai_client is None:
-        raise RuntimeError("Gemini client not configured (google-genai).")
-    # The google-genai SDK supports passing PIL.Image objects directly in contents list.
-    # We build a contents list: [image_obj, prompt_text]
-    # The response object has `text` attribute.
-    response = genai_client.models.generate_content(
-        model=GEMINI_MODEL,
-        contents=[pil_image, prompt_text],
+    def call() -> str:
+        return llm_gateway.call_gemini_image_to_text(image, prompt_text, model=GEMINI_MODEL, json_mode=json_mode)
+
+    if cache:
+        return image_hash.cached_call(image, cache, call, cache_validate)
+    return call()
+
+def call_groq_chat_system(system_prompt: str, user_prompt: str, model: str = GROQ_MODEL, **params) -> str:
+    """
+    Produce text (expected JSON) from Groq, handing over to Gemini when Groq fails or its
+    circuit breaker is open. Extra params (e.g. cache="extractor.dish_name") go to the gateway.
+    """
+    return llm_gateway.complete(
+        system_prompt, user_prompt,
+        providers=("groq", "gemini"),
+        models={"groq": model, "gemini": GEMINI_MODEL},
+        **params
     )
-    # aggregated text:
-    return response.text if hasattr(response, "text") else str(response)
 
-def call_groq_chat_system(system_prompt: str, user_prompt: str, model: str = GROQ_MODEL) -> str:
+def _is_complete_recipe(text: str) -> bool:
+    """Cache check: a complete recipe as is (no repair), so truncated output is never stored."""
+    recipe = llm_json.parse_strict_json(text, expect=dict)
+    return bool(recipe and recipe.get("title") and isinstance(recipe.get("ingredients"), list) and recipe["ingredients"])
+
+def generate_recipe_json(system_prompt: str, user_prompt: str, **params):
     """
-    Use Groq client chat completion to produce text (expected JSON).
+    Structured-output recipe call: JSON mode on the provider, local repair on our side.
+    Only when the output is beyond repair is a second call made, and that call carries the
+    original output so the model converts it rather than starting from nothing.
+    Returns (parsed dict or None, raw text of the first response).
     """
-    if groq_client is None:
-        raise RuntimeError("Groq client not configured (groq).")
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": user_prompt},
-    ]
-    resp = groq_client.chat.completions.create(
-        messages=messages,
-        model=model,
+    raw = call_groq_chat_system(system_prompt, user_prompt, json_mode=True, **params)
+    parsed = parse_json_from_text(raw)
+    if parsed is None:
+        parsed = convert_to_recipe_json(system_prompt, raw)
+    return parsed, raw
+
+def convert_to_recipe_json(system_prompt: str, raw: str) -> Optional[dict]:
+    """One conversion round-trip for output that local repair could not fix."""
+    print("[recipe_extractor] ⚠️ Unrepairable JSON from model, asking for a conversion")
+    fallback_user = (
+        "The model output must be valid JSON. Convert the following text to the JSON schema described earlier:\n\n"
+        + raw
     )
-    try:
-        return resp.choices[0].message.content
-    except Exception:
-        return str(resp)
+    return parse_json_from_text(call_groq_chat_system(system_prompt, fallback_user, json_mode=True))
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _wants_stream() -> bool:
+    return "text/event-stream" in request.headers.get("Accept", "")
+
+def stream_recipe(open_stream, fallback, build_recipe) -> Response:
+    """
+    Server-Sent Events response for a recipe the model is still writing. Event order:
+      field {field, value}          - a top-level member (title, time, ...) as soon as it closes
+      item  {field, index, value}   - one element of a top-level array (ingredients, instructions, ...)
+      end   {field, count}          - a top-level array closed
+      done  {success, recipe} | error {success, error}
+    fallback(raw_text) must return the parsed dict (or None) when the stream failed or its
+    output could not be parsed; build_recipe(parsed) normalises and stores the recipe.
+    """
+    def generate():
+        parser = RecipeStreamParser()
+        try:
+            for chunk in open_stream():
+                for event in parser.feed(chunk):
+                    kind = event.pop("type")
+                    yield _sse(kind, event)
+        except Exception as e:
+            print(f"[recipe_extractor] Streaming failed, falling back: {e}")
+        parsed = parser.result()
+        if parsed is None:
+            try:
+                parsed = fallback(parser.text())
+            except Exception:
+                traceback.print_exc()
+        if parsed is None:
+            yield _sse("error", {"success": False, "error": "Could not parse recipe JSON from model output"})
+            return
+        yield _sse("done", {"success": True, "recipe": build_recipe(parsed)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+_url_fetches = SingleFlight("url_fetch")
 
 def fetch_url_text(url: str) -> str:
     """
     Fetch a URL and attempt to extract title and main text.
+    Concurrent requests for the same URL share one download.
     """
+    text, _shared = _url_fetches.do(url, lambda: _fetch_url_text(url))
+    return text
+
+def _fetch_url_text(url: str) -> str:
     try:
         resp = requests.get(url, timeout=8, headers={"User-Agent":"RecipeExtractor/1.0"})
         resp.raise_for_status()
@@ -155,99 +194,126 @@ def fetch_url_text(url: str) -> str:
 
 # === Endpoint implementations ===
 
+# Rich prompt for Gemini vision (photo -> recipe)
+PHOTO_PROMPT = (
+    "You are an expert chef and food scientist. Analyze the image provided and:\n"
+    "1) Say whether the image clearly shows a food dish (\"food\" or \"not food\").\n"
+    "2) If food, give your best-guess dish name (short) and cuisine.\n"
+    "3) List visible ingredients (comma separated).\n"
+    "4) State whether it's vegetarian or non-vegetarian.\n"
+    "5) Suggest likely cooking method(s) and an estimated total time (in minutes), servings, and calorie estimate.\n"
+    "6) Finally, produce a structured recipe in JSON EXACTLY with the following keys:\n"
+    "   title, source, confidence, time, servings, calories, cuisine, difficulty, tags (array),\n"
+    "   ingredients (array of objects {name, quantity, unit}), instructions (array of step strings),\n"
+    "   nutritional_info (object: protein, carbs, fat, fiber)\n"
+    "Output only valid JSON (no additional explanatory text). If you are not confident it is food, set confidence to 'low' and return {\"title\":null, \"reason\":\"not food\"}.\n"
+    "Be conservative on quantities if uncertain; use approximate quantities like \"1-2\" or \"to taste\".\n"
+)
+
 @extractor_bp.route("/health", methods=["GET"])
 def health():
-    return jsonify({"success": True, "message": "recipe-extractor backend running"}), 200
+    return jsonify({
+        "success": True,
+        "message": "recipe-extractor backend running",
+        "providers": llm_gateway.provider_health(),
+        "image_pipeline": image_pipeline.stats(),
+        "photo_cache": image_hash.stats()
+    }), 200
 
 @extractor_bp.route("/photo", methods=["POST"])
 def extractor_photo():
     try:
-        data = request.get_json(force=True)
-        if not data or "image" not in data:
-            return jsonify({"success": False, "error": "Missing 'image' in request body"}), 400
-
-        data_uri = data["image"]
-        # Expect form: data:image/jpeg;base64,/9j/4AA...
-        m = re.match(r"data:(?P<mime>image/[^;]+);base64,(?P<b64>.+)$", data_uri)
-        if not m:
-            return jsonify({"success": False, "error": "Invalid image data URI"}), 400
-
-        img_b64 = m.group("b64")
-        img_bytes = base64.b64decode(img_b64)
-        pil_image = Image.open(io.BytesIO(img_bytes)).convert("RGB")
-
-        # Build a rich prompt for Gemini vision
-        prompt = (
-            "You are an expert chef and food scientist. Analyze the image provided and:\n"
-            "1) Say whether the image clearly shows a food dish (\"food\" or \"not food\").\n"
-            "2) If food, give your best-guess dish name (short) and cuisine.\n"
-            "3) List visible ingredients (comma separated).\n"
-            "4) State whether it's vegetarian or non-vegetarian.\n"
-            "5) Suggest likely cooking method(s) and an estimated total time (in minutes), servings, and calorie estimate.\n"
-            "6) Finally, produce a structured recipe in JSON EXACTLY with the following keys:\n"
-            "   title, source, confidence, time, servings, calories, cuisine, difficulty, tags (array),\n"
-            "   ingredients (array of objects {name, quantity, unit}), instructions (array of step strings),\n"
-            "   nutritional_info (object: protein, carbs, fat, fiber)\n"
-            "Output only valid JSON (no additional explanatory text). If you are not confident it is food, set confidence to 'low' and return {\"title\":null, \"reason\":\"not food\"}.\n"
-            "Be conservative on quantities if uncertain; use approximate quantities like \"1-2\" or \"to taste\".\n"
-        )
+        # multipart/form-data, raw image bytes, or the original JSON data URI (see uploads.py)
+        try:
+            upload = uploads.read_photo("image")
+        except uploads.UploadError as e:
+            return jsonify({"success": False, "error": str(e)}), e.status
+
+        # Downscale + re-encode before upload (image_pipeline); Gemini gets compact JPEG bytes
+        try:
+            with upload:
+                image = image_pipeline.preprocess_file(upload.fileobj, upload.mime_type, upload.size)
+        except image_pipeline.PipelineBusy as e:
+            return jsonify({"success": False, "error": str(e)}), 503, {"Retry-After": "2"}
+
+        if _wants_stream():
+            def photo_fallback(raw: str) -> Optional[dict]:
+                return _analysis_to_recipe(raw or call_gemini_image_to_text(
+                    image, PHOTO_PROMPT, json_mode=True, cache="extractor.photo", cache_validate=_is_complete_recipe
+                ))
+
+            return stream_recipe(
+                lambda: image_hash.cached_stream(
+                    image,
+                    "extractor.photo",
+                    lambda: llm_gateway.call_gemini_image_to_text_stream(image, PHOTO_PROMPT, model=GEMINI_MODEL, json_mode=True),
+                    _is_complete_recipe,
+                ),
+                photo_fallback,
+                _photo_recipe,
+            )
 
         # Call Gemini vision (image + prompt)
         gemini_text = ""
         try:
-            gemini_text = call_gemini_image_to_text(pil_image, prompt)
+            gemini_text = call_gemini_image_to_text(
+                image, PHOTO_PROMPT, json_mode=True, cache="extractor.photo", cache_validate=_is_complete_recipe
+            )
         except Exception as e:
             traceback.print_exc()
             return jsonify({"success": False, "error": f"Gemini vision failed: {str(e)}"}), 500
 
-        # Try to parse JSON
-        parsed = parse_json_from_text(gemini_text)
-
-        # If parsing failed, fallback to using Groq to convert gemini textual description into JSON
-        if parsed is None:
-            try:
-                system_prompt = "You are a helpful assistant that converts a chef's analysis into a structured JSON recipe object. Output ONLY JSON."
-                user_prompt = (
-                    "Convert the following analysis into a strict JSON recipe following the schema "
-                    "title, source, confidence, time, servings, calories, cuisine, difficulty, tags (array), "
-                    "ingredients (array of {name,quantity,unit}), instructions (array), nutritional_info.\n\n"
-                    "Analysis:\n" + gemini_text
-                )
-                groq_out = call_groq_chat_system(system_prompt, user_prompt)
-                parsed = parse_json_from_text(groq_out)
-            except Exception as e:
-                traceback.print_exc()
-                parsed = None
-
+        parsed = _analysis_to_recipe(gemini_text)
         if parsed is None:
             return jsonify({"success": False, "error": "Could not parse recipe JSON from model output", "raw": gemini_text}), 500
 
-        # Put sensible defaults and store recipe
-        recipe_id = str(uuid.uuid4())
-        recipe = {
-            "id": recipe_id,
-            "title": parsed.get("title") or parsed.get("dish") or "Unknown Dish",
-            "image": "🍽️",
-            "time": parsed.get("time", "30 mins"),
-            "servings": parsed.get("servings", "2"),
-            "calories": parsed.get("calories", "estimate"),
-            "source": "image",
-            "confidence": parsed.get("confidence", "medium"),
-            "ingredients": parsed.get("ingredients", []),
-            "instructions": parsed.get("instructions", []),
-            "cuisine": parsed.get("cuisine", ""),
-            "difficulty": parsed.get("difficulty", "medium"),
-            "tags": parsed.get("tags", []),
-            "nutritional_info": parsed.get("nutritional_info", {}),
-        }
-        RECIPE_STORE[recipe_id] = recipe
-
-        return jsonify({"success": True, "recipe": recipe}), 200
+        return jsonify({"success": True, "recipe": _photo_recipe(parsed)}), 200
 
     except Exception as e:
         traceback.print_exc()
         return jsonify({"success": False, "error": str(e)}), 500
 
+def _analysis_to_recipe(gemini_text: str) -> Optional[dict]:
+    """Parse Gemini's photo analysis; if that fails, use Groq to convert the text into JSON."""
+    parsed = parse_json_from_text(gemini_text)
+    if parsed is None:
+        try:
+            system_prompt = "You are a helpful assistant that converts a chef's analysis into a structured JSON recipe object. Output ONLY JSON."
+            user_prompt = (
+                "Convert the following analysis into a strict JSON recipe following the schema "
+                "title, source, confidence, time, servings, calories, cuisine, difficulty, tags (array), "
+                "ingredients (array of {name,quantity,unit}), instructions (array), nutritional_info.\n\n"
+                "Analysis:\n" + gemini_text
+            )
+            groq_out = call_groq_chat_system(system_prompt, user_prompt, json_mode=True)
+            parsed = parse_json_from_text(groq_out)
+        except Exception:
+            traceback.print_exc()
+            parsed = None
+    return parsed
+
+def _photo_recipe(parsed: dict) -> dict:
+    """Put sensible defaults on a photo-derived recipe and store it"""
+    recipe_id = str(uuid.uuid4())
+    recipe = {
+        "id": recipe_id,
+        "title": parsed.get("title") or parsed.get("dish") or "Unknown Dish",
+        "image": "🍽️",
+        "time": parsed.get("time", "30 mins"),
+        "servings": parsed.get("servings", "2"),
+        "calories": parsed.get("calories", "estimate"),
+        "source": "image",
+        "confidence": parsed.get("confidence", "medium"),
+        "ingredients": parsed.get("ingredients", []),
+        "instructions": parsed.get("instructions", []),
+        "cuisine": parsed.get("cuisine", ""),
+        "difficulty": parsed.get("difficulty", "medium"),
+        "tags": parsed.get("tags", []),
+        "nutritional_info": parsed.get("nutritional_info", {}),
+    }
+    RECIPE_STORE[recipe_id] = recipe
+    return recipe
+
 @extractor_bp.route("/dish-name", methods=["POST"])
 def extractor_dish_name():
     """
@@ -268,43 +334,59 @@ def extractor_dish_name():
         )
         user_prompt = f"Create a complete recipe for '{dish}'. Be realistic, include ingredient quantities for 2-4 servings, a step-by-step instruction list, an estimated total time, and a short nutrition estimate."
 
-        groq_response = call_groq_chat_system(system_prompt, user_prompt)
-        parsed = parse_json_from_text(groq_response)
-        if parsed is None:
-            fallback_user = (
-                "The model output must be valid JSON. Convert the following text to the JSON schema described earlier:\n\n"
-                + groq_response
+        if _wants_stream():
+            def dish_fallback(raw: str) -> Optional[dict]:
+                if raw:
+                    return convert_to_recipe_json(system_prompt, raw)
+                return generate_recipe_json(system_prompt, user_prompt, cache="extractor.dish_name", cache_validate=_is_complete_recipe)[0]
+
+            return stream_recipe(
+                lambda: llm_gateway.complete_stream(
+                    system_prompt, user_prompt,
+                    providers=("groq", "gemini"),
+                    models={"groq": GROQ_MODEL, "gemini": GEMINI_MODEL},
+                    cache="extractor.dish_name",
+                    cache_validate=_is_complete_recipe,
+                ),
+                dish_fallback,
+                lambda parsed: _dish_name_recipe(parsed, dish),
             )
-            groq_response2 = call_groq_chat_system(system_prompt, fallback_user)
-            parsed = parse_json_from_text(groq_response2)
+
+        parsed, groq_response = generate_recipe_json(
+            system_prompt, user_prompt, cache="extractor.dish_name", cache_validate=_is_complete_recipe
+        )
 
         if parsed is None:
             return jsonify({"success": False, "error": "Failed to parse recipe JSON from Groq response", "raw": groq_response}), 500
 
-        recipe_id = str(uuid.uuid4())
-        recipe = {
-            "id": recipe_id,
-            "title": parsed.get("title", dish),
-            "image": parsed.get("image", "🍽️"),
-            "time": parsed.get("time", "30 mins"),
-            "servings": parsed.get("servings", "2"),
-            "calories": parsed.get("calories", ""),
-            "source": "dish-name",
-            "confidence": parsed.get("confidence", "high"),
-            "ingredients": parsed.get("ingredients", []),
-            "instructions": parsed.get("instructions", []),
-            "cuisine": parsed.get("cuisine", ""),
-            "difficulty": parsed.get("difficulty", "medium"),
-            "tags": parsed.get("tags", []),
-            "nutritional_info": parsed.get("nutritional_info", {}),
-        }
-        RECIPE_STORE[recipe_id] = recipe
-        return jsonify({"success": True, "recipe": recipe}), 200
+        return jsonify({"success": True, "recipe": _dish_name_recipe(parsed, dish)}), 200
 
     except Exception as e:
         traceback.print_exc()
         return jsonify({"success": False, "error": str(e)}), 500
 
+def _dish_name_recipe(parsed: dict, dish: str) -> dict:
+    """Put sensible defaults on a dish-name recipe and store it"""
+    recipe_id = str(uuid.uuid4())
+    recipe = {
+        "id": recipe_id,
+        "title": parsed.get("title", dish),
+        "image": parsed.get("image", "🍽️"),
+        "time": parsed.get("time", "30 mins"),
+        "servings": parsed.get("servings", "2"),
+        "calories": parsed.get("calories", ""),
+        "source": "dish-name",
+        "confidence": parsed.get("confidence", "high"),
+        "ingredients": parsed.get("ingredients", []),
+        "instructions": parsed.get("instructions", []),
+        "cuisine": parsed.get("cuisine", ""),
+        "difficulty": parsed.get("difficulty", "medium"),
+        "tags": parsed.get("tags", []),
+        "nutritional_info": parsed.get("nutritional_info", {}),
+    }
+    RECIPE_STORE[recipe_id] = recipe
+    return recipe
+
 @extractor_bp.route("/url", methods=["POST"])
 def extractor_url():
     """
@@ -329,11 +411,9 @@ def extractor_url():
         )
         user_prompt = f"Scraped content:\n{scraped}\n\nCreate the recipe JSON now."
 
-        groq_response = call_groq_chat_system(system_prompt, user_prompt)
-        parsed = parse_json_from_text(groq_response)
-        if parsed is None:
-            groq_response2 = call_groq_chat_system(system_prompt, "Please output valid JSON only. Convert the previous output to JSON.")
-            parsed = parse_json_from_text(groq_response2)
+        parsed, groq_response = generate_recipe_json(
+            system_prompt, user_prompt, cache="extractor.url", cache_validate=_is_complete_recipe
+        )
 
         if parsed is None:
             return jsonify({"success": False, "error": "Could not parse JSON from model", "raw": groq_response}), 500
@@ -419,11 +499,7 @@ def extractor_enhance():
         else:
             return jsonify({"success": False, "error": f"Unknown enhancementType: {enh_type}"}), 400
 
-        groq_out = call_groq_chat_system(system_prompt, user_prompt)
-        parsed = parse_json_from_text(groq_out)
-        if parsed is None:
-            groq_out2 = call_groq_chat_system(system_prompt, "Please output valid JSON only. Convert the previous output to JSON.")
-            parsed = parse_json_from_text(groq_out2)
+        parsed, groq_out = generate_recipe_json(system_prompt, user_prompt)
 
         if parsed is None:
             return jsonify({"success": False, "error": "Could not parse enhanced recipe JSON", "raw": groq_out}), 500
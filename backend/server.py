@@ -10,6 +10,7 @@ from flask import Flask, jsonify, request
 from flask_cors import CORS
 from dotenv import load_dotenv
 import traceback
+import llm_gateway
 
 load_dotenv()
 
@@ -25,9 +26,21 @@ MODULES_ORDER = [
 app = Flask(__name__)
 CORS(app)
 
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv("MAX_CONTENT_LENGTH", str(16 * 1024 * 1024)))
 app.config['JSON_SORT_KEYS'] = False
 
+@app.before_request
+def enforce_max_content_length():
+    """Reject oversized bodies from the Content-Length header, before anything buffers them.
+    Chunked uploads without a length are capped while streaming (uploads.py)."""
+    limit = app.config.get('MAX_CONTENT_LENGTH')
+    length = request.content_length
+    if limit and length is not None and length > limit:
+        return jsonify({
+            "success": False,
+            "error": f"Request body too large ({length} bytes, limit {limit})"
+        }), 413
+
 # Global registry
 registered_blueprints = set()
 registered_modules = []
@@ -251,7 +264,8 @@ def health_check():
         "service": "Culinary AI Server",
         "timestamp": time.time(),
         "modules_loaded": len(registered_modules),
-        "python_version": sys.version
+        "python_version": sys.version,
+        "llm_gateway": llm_gateway.status()
     })
 
 @app.route("/", methods=["GET"])
@@ -320,8 +334,10 @@ def initialize_server():
     check_critical_endpoints()
     print_all_routes()
 
-# Initialize the server
-initialize_server()
+# Initialize the server (not in image_pipeline's spawned pool workers, which re-import this
+# file as __mp_main__ and only need image_pipeline)
+if __name__ != "__mp_main__":
+    initialize_server()
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 5000))
@@ -0,0 +1,72 @@
+"""
+singleflight.py
+
+Request coalescing for identical in-flight work, used by llm_gateway and recipe_extractor.
+
+The first caller for a key (the "leader") runs the function; callers arriving with the same
+key while it runs wait for it and receive the same result, or the same exception. Once the
+call finishes the key is forgotten, so later callers start a fresh call (results are kept
+by llm_cache, not here).
+"""
+import threading
+from typing import Any, Callable, Dict, Tuple
+
+
+class _Call:
+    __slots__ = ("done", "value", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: BaseException = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self, name: str = "default"):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.counters = {"leaders": 0, "shared": 0, "errors": 0}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run fn once per key across concurrent callers. Returns (value, shared)."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.counters["shared"] += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.counters["leaders"] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        try:
+            call.value = fn()
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self.counters["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.value, False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            c = dict(self.counters)
+            total = c["leaders"] + c["shared"]
+            return {
+                "in_flight": len(self._calls),
+                **c,
+                "coalesced_rate": round(c["shared"] / total, 4) if total else 0.0,
+            }
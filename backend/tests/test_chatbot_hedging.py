@@ -0,0 +1,32 @@
+"""
+chatbot hedging: only answers that reached a provider tune the hedge delay.
+
+Run from backend/:
+    python -m pytest tests
+"""
+import chatbot
+import llm_cache
+import llm_gateway
+
+
+def test_cache_hits_are_not_recorded_as_provider_latency(monkeypatch):
+    monkeypatch.setattr(llm_cache, "CACHE_ENABLED", True)
+    calls = []
+
+    def fake_gemini(prompt):
+        return llm_gateway._cached_call(
+            "tests.chatbot", ("model", "", prompt, None), lambda: calls.append(prompt) or "answer"
+        )
+
+    service = chatbot.AIService()
+    monkeypatch.setattr(service, "_get_gemini_response", fake_gemini)
+    for _ in range(3):
+        assert service._call_provider("gemini", "what goes with basil?") == "answer"
+    assert len(calls) == 1
+    assert len(service.metrics.latencies["gemini"]) == 1
+
+
+def test_bad_hedge_delay_setting_falls_back_to_auto():
+    assert chatbot._parse_hedge_delay("fast") is None
+    assert chatbot._parse_hedge_delay("auto") is None
+    assert chatbot._parse_hedge_delay("250") == 250.0
@@ -0,0 +1,50 @@
+"""
+chatbot SSE: a reply cut off by a provider failure is not reported as a success.
+
+Run from backend/:
+    python -m pytest tests
+"""
+import json
+
+from flask import Flask
+
+import chatbot
+import llm_gateway
+
+
+def _events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def _chat(monkeypatch, stream):
+    service = chatbot.ai_orchestrator.ai_service
+    monkeypatch.setattr(service, "clients", {"groq": object()})
+    monkeypatch.setattr(service, "_stream_groq_response", stream)
+    monkeypatch.setattr(llm_gateway, "provider_order", lambda names: list(names))
+    app = Flask(__name__)
+    app.register_blueprint(chatbot.chatbot_bp, url_prefix="/api/chatbot")
+    r = app.test_client().post(
+        "/api/chatbot/message", json={"message": "how do I braise leeks"}, headers={"Accept": "text/event-stream"}
+    )
+    return _events(r.get_data(as_text=True))
+
+
+def test_reply_cut_off_mid_stream_ends_with_error(monkeypatch):
+    def stream(prompt):
+        yield "Trim the leeks and"
+        raise ConnectionError("provider reset the connection")
+
+    events = _chat(monkeypatch, stream)
+    assert [name for name, _ in events] == ["meta", "token", "error", "done"]
+    assert events[1][1]["text"] == "Trim the leeks and"
+    assert events[-1][1]["success"] is False
+
+
+def test_complete_reply_ends_with_success(monkeypatch):
+    events = _chat(monkeypatch, lambda prompt: iter(["Trim the leeks ", "and braise them."]))
+    assert [name for name, _ in events] == ["meta", "token", "token", "done"]
+    assert events[-1][1]["success"] is True
@@ -0,0 +1,53 @@
+"""
+Circuit breakers around streamed provider calls (llm_gateway._guarded_stream).
+
+Run from backend/:
+    python -m pytest tests
+"""
+import circuit_breaker
+import llm_gateway
+
+
+def _half_open(name):
+    breaker = circuit_breaker.get_breaker(name)
+    breaker._open(0.0)          # opened long ago: the cool-down has passed
+    assert breaker.state == circuit_breaker.HALF_OPEN
+    return breaker
+
+
+def _stream(pieces):
+    def open_stream():
+        yield from pieces
+    return open_stream
+
+
+def test_trial_stream_closed_before_text_frees_the_trial():
+    breaker = _half_open("tests.closed_early")
+    stream = llm_gateway._guarded_stream("tests.closed_early", _stream(["", "never read"]))
+    assert next(stream) == ""
+    stream.close()
+    assert breaker.state == circuit_breaker.HALF_OPEN
+    assert breaker.allow()      # the next call may be the trial
+
+
+def test_trial_stream_closed_after_text_closes_the_breaker():
+    breaker = _half_open("tests.disconnect")
+    stream = llm_gateway._guarded_stream("tests.disconnect", _stream(["Hello", " world"]))
+    assert next(stream) == "Hello"
+    stream.close()
+    assert breaker.state == circuit_breaker.CLOSED
+
+
+def test_trial_stream_failing_reopens_the_breaker():
+    def open_stream():
+        yield "partial"
+        raise RuntimeError("provider dropped the connection")
+
+    breaker = _half_open("tests.failure")
+    stream = llm_gateway._guarded_stream("tests.failure", open_stream)
+    assert next(stream) == "partial"
+    try:
+        next(stream)
+    except RuntimeError:
+        pass
+    assert breaker.state == circuit_breaker.OPEN
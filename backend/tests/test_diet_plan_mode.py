@@ -0,0 +1,19 @@
+"""
+diet_plan: the request's "mode" must be a known generation mode.
+
+Run from backend/:
+    python -m pytest tests
+"""
+import pytest
+
+import diet_plan
+
+
+@pytest.mark.parametrize("mode", ["Batched", " sequential ", "concurrent"])
+def test_known_modes_are_used(mode):
+    assert diet_plan._generation_mode(mode) == mode.strip().lower()
+
+
+@pytest.mark.parametrize("mode", [None, "", "parallel", "fast", 3, ["batched"], {"mode": "batched"}])
+def test_unknown_modes_fall_back_to_the_default(mode):
+    assert diet_plan._generation_mode(mode) == diet_plan.DIET_PLAN_MODE
@@ -0,0 +1,37 @@
+"""
+fuzzy_index.for_names: background builds and index versions.
+
+Run from backend/:
+    python -m pytest tests
+"""
+import time
+
+import fuzzy_index
+
+
+def _wait_idle(label, version):
+    deadline = time.time() + 5
+    while (label, version) in fuzzy_index._building and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_failed_background_build_is_not_left_building(capsys):
+    def broken():
+        raise OSError("names file vanished")
+
+    assert fuzzy_index.for_names("tests.broken", broken, wait=False, version=1) is None
+    _wait_idle("tests.broken", 1)
+    assert ("tests.broken", 1) not in fuzzy_index._building
+    assert not fuzzy_index.is_ready("tests.broken", 1)
+    assert "names file vanished" in capsys.readouterr().out
+
+
+def test_new_version_replaces_the_index():
+    old = fuzzy_index.for_names("tests.versions", lambda: ["salmon fillet"], version="v1")
+    assert old.lookup("salmon filet") == "salmon fillet"
+    fuzzy_index.for_names("tests.versions", lambda: [], wait=False, version="v2")
+    _wait_idle("tests.versions", "v2")
+    assert fuzzy_index.is_ready("tests.versions", "v2")
+    assert not fuzzy_index.is_ready("tests.versions", "v1")
+    new = fuzzy_index.for_names("tests.versions", lambda: ["tuna steak"], version="v2")
+    assert new.lookup("tuna steek") is None      # built from the v2 names (none)
@@ -0,0 +1,29 @@
+"""
+Typo tolerance in find_food_matches must not turn ordinary words into foods.
+
+Run from backend/:
+    python -m pytest tests
+"""
+import pytest
+
+import nutrition_extractor as ne
+
+
+@pytest.mark.parametrize("description", [
+    "tomato paste on toast",            # paste -> pasta
+    "apply butter to toast",            # apply -> apple
+    "soup at the salon",                # salon -> salmon
+    "thicken the gravy with flour",     # thicken -> chicken breast
+    "coffee during my break",           # break -> bread
+])
+def test_common_words_are_not_foods(description):
+    assert ne.find_food_matches(description) == []
+
+
+@pytest.mark.parametrize("description, key", [
+    ("chiken brest for lunch", "chicken breast"),
+    ("two banannas", "banana"),
+    ("2 salon fillets", "salmon"),      # after a quantity a common word may still be a typo
+])
+def test_misspelt_foods_still_match(description, key):
+    assert key in [m["food_key"] for m in ne.find_food_matches(description)]
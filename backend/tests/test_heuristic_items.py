@@ -0,0 +1,23 @@
+"""
+heuristic_items: guesses for text that names no known food match whole words only.
+
+Run from backend/:
+    python -m pytest tests
+"""
+import pytest
+
+import nutrition_extractor as ne
+
+
+def _keys(text):
+    return [item["food_key"] for item in ne.heuristic_items(text)]
+
+
+@pytest.mark.parametrize("text", ["eggplant curry", "legging day", "price of lunch", "vegan wrap", "breastroke swim"])
+def test_words_containing_a_food_name_are_not_that_food(text):
+    assert _keys(text) == []
+
+
+def test_whole_words_and_plurals_are_guessed():
+    assert _keys("Fried rice with two eggs and veggies") == ["rice", "egg", "mixed vegetables"]
+    assert _keys("grilled chicken and side salads") == ["chicken breast", "mixed vegetables"]
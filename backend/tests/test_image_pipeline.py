@@ -0,0 +1,50 @@
+"""
+image_pipeline process pool: a photo the caller stops waiting for.
+
+Run from backend/:
+    python -m pytest tests
+"""
+import io
+import os
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import pytest
+
+import image_pipeline
+
+pytestmark = pytest.mark.skipif(not image_pipeline.PIL_AVAILABLE, reason="Pillow not installed")
+
+
+def _photo(edge):
+    from PIL import Image
+    buf = io.BytesIO()
+    Image.effect_noise((edge, edge), 64).convert("RGB").save(buf, "PNG")
+    return buf
+
+
+def _shm_blocks():
+    return set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+
+
+def test_timed_out_job_keeps_its_slot_and_leaks_no_shared_memory(monkeypatch):
+    pool = image_pipeline._ProcessPool(workers=1, max_pending=2)
+    small = _photo(64)
+    pool.run(small, "image/png", len(small.getvalue()), {})     # start the worker process
+    before = _shm_blocks()
+
+    big = _photo(3000)
+    monkeypatch.setattr(image_pipeline, "POOL_TIMEOUT", 0.01)
+    with pytest.raises(FutureTimeout):
+        pool.run(big, "image/png", len(big.getvalue()), {})
+    assert pool.pending == 1            # the worker is still busy with it
+
+    deadline = time.time() + 60
+    while pool.pending and time.time() < deadline:
+        time.sleep(0.05)
+    try:
+        assert pool.pending == 0
+        assert pool.counters["failed"] == 1
+        assert _shm_blocks() == before
+    finally:
+        pool._executor.shutdown()
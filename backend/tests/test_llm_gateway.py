@@ -0,0 +1,33 @@
+"""
+llm_gateway: response caching of streamed answers.
+
+Run from backend/:
+    python -m pytest tests
+"""
+import llm_cache
+import llm_gateway
+
+
+def _stream(monkeypatch, text, validate):
+    monkeypatch.setattr(llm_cache, "CACHE_ENABLED", True)
+    key_parts = ("model", "system", text, None)
+    pieces = llm_gateway._cached_stream("tests.stream", key_parts, lambda: iter([text[:4], text[4:]]), validate)
+    assert "".join(pieces) == text
+    return llm_cache.cache.get(llm_cache.make_key(*key_parts), "tests.stream")
+
+
+def test_stream_failing_validation_is_not_cached(monkeypatch):
+    assert _stream(monkeypatch, "Sure! Here is a recipe", lambda t: t.startswith("{")) is None
+
+
+def test_stream_passing_validation_is_cached(monkeypatch):
+    assert _stream(monkeypatch, '{"title": "Soup"}', lambda t: t.startswith("{")) == '{"title": "Soup"}'
+
+
+def test_json_mode_and_token_cap_are_part_of_the_key():
+    def key(json_mode, **params):
+        return llm_cache.make_key(*llm_gateway._key_parts("model", "system", "user", json_mode, params))
+
+    assert key(False, temperature=0.2) == key(False, temperature=0.2)
+    assert key(True, temperature=0.2) != key(False, temperature=0.2)
+    assert key(False, max_tokens=200) != key(False, max_tokens=2000)
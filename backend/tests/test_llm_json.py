@@ -0,0 +1,26 @@
+"""
+llm_json: code-fence stripping and linear-time behaviour on hostile output.
+
+Run from backend/:
+    python -m pytest tests
+"""
+import time
+
+import llm_json
+
+
+def test_fences_are_stripped():
+    assert llm_json.parse_json_from_text('```json\n{"a": 1}\n```') == {"a": 1}
+    assert llm_json.parse_json_from_text("```\n[1, 2]```") == [1, 2]
+
+
+def test_long_whitespace_run_does_not_backtrack():
+    start = time.perf_counter()
+    llm_json.parse_json_from_text('{"a": 1' + " " * 40000 + "x")
+    assert time.perf_counter() - start < 1.0
+
+
+def test_strict_parse_rejects_truncated_and_prose_wrapped_fragments():
+    assert llm_json.parse_strict_json('{"title": "Soup", "ingredients": [{"name": "on') is None
+    assert llm_json.parse_strict_json("Here is the recipe {") is None
+    assert llm_json.parse_strict_json('Sure: {"a": [1]} enjoy', expect=dict) == {"a": [1]}
@@ -0,0 +1,30 @@
+"""
+nutrition_memo: a memoised analysis looks the same on a miss and on a hit.
+
+Run from backend/:
+    python -m pytest tests
+"""
+import uuid
+
+import pytest
+
+import nutrition_extractor as ne
+import nutrition_memo
+
+
+def _ids(result):
+    return [result["id"]] + [item["id"] for item in result["identifiedIngredients"]]
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+def test_fallback_result_gets_uuid_ids(monkeypatch, enabled):
+    monkeypatch.setattr(nutrition_memo, "MEMO_ENABLED", enabled)
+    nutrition_memo.memo.clear()
+    seen = set()
+    for _ in range(2):                  # miss, then hit
+        result = nutrition_memo.cached_analysis("zzz qqq", ("tests",), lambda text: ne.get_default())
+        ids = _ids(result)
+        for i in ids:
+            uuid.UUID(i)
+        assert not seen & set(ids)
+        seen.update(ids)
@@ -0,0 +1,33 @@
+"""
+uploads: malformed JSON photo fields are a 400 (UploadError), never a 500.
+
+Run from backend/:
+    python -m pytest tests
+"""
+import pytest
+from flask import Flask
+
+import uploads
+
+
+@pytest.mark.parametrize("body", [
+    {"image": 42},
+    {"image": ["data:image/png;base64,AAAA"]},
+    {"image": {"data": "AAAA"}},
+    {"image": None},
+    "image",
+    ["image"],
+])
+def test_non_string_image_is_an_upload_error(body):
+    app = Flask(__name__)
+    with app.test_request_context("/", method="POST", json=body):
+        with pytest.raises(uploads.UploadError) as info:
+            uploads.read_photo()
+    assert info.value.status == 400
+
+
+def test_non_string_entry_in_images_is_an_upload_error():
+    app = Flask(__name__)
+    with app.test_request_context("/", method="POST", json={"images": ["data:image/png;base64,AAAA", 7]}):
+        with pytest.raises(uploads.UploadError):
+            uploads.read_photos()
@@ -0,0 +1,180 @@
+"""
+uploads.py
+
+Photo upload readers shared by the photo routes (/fridge/photo, /fridge/photos,
+/api/extractor/photo, /api/analyze-nutrition).
+
+Accepted request shapes:
+- multipart/form-data with the file in the "image" field (werkzeug spools large parts to disk)
+- application/octet-stream or image/* raw body, streamed in chunks into a SpooledTemporaryFile
+- JSON with a base64 data URI (the original form, kept for compatibility)
+
+The binary forms never hold the whole upload as a Python string. The image ends up as a
+file object that PIL can open lazily (image_pipeline.preprocess_file). The JSON form splits
+the data URI at the first comma with str.partition instead of running a regex over the whole payload.
+
+Environment:
+- UPLOAD_SPOOL_MAX_MEMORY (default 1048576) bytes kept in memory before spilling to a temp file
+- UPLOAD_CHUNK_SIZE       (default 65536)
+"""
+import base64
+import binascii
+import io
+import os
+import tempfile
+from typing import IO, Any, List, Optional, Tuple
+
+from flask import current_app, request
+
+SPOOL_MAX_MEMORY = int(os.getenv("UPLOAD_SPOOL_MAX_MEMORY", str(1024 * 1024)))
+CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(64 * 1024)))
+
+
+class UploadError(ValueError):
+    """Bad or oversized upload; `status` is the HTTP code to answer with."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class PhotoUpload:
+    """An uploaded image as a seekable file object plus its declared mime type."""
+    __slots__ = ("fileobj", "mime_type", "size", "source")
+
+    def __init__(self, fileobj: IO[bytes], mime_type: str, size: int, source: str):
+        self.fileobj = fileobj
+        self.mime_type = mime_type or "image/jpeg"
+        self.size = size
+        self.source = source            # "multipart", "binary" or "json"
+
+    def read(self) -> bytes:
+        self.fileobj.seek(0)
+        return self.fileobj.read()
+
+    def close(self):
+        try:
+            self.fileobj.close()
+        except Exception:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def split_data_uri(data_uri: str) -> Tuple[Optional[str], Optional[str]]:
+    """'data:image/png;base64,AAAA' -> ('image/png', 'AAAA'); (None, None) when not a base64 image URI."""
+    header, sep, payload = data_uri.partition(",")
+    if not sep or not header.startswith("data:image/") or not header.endswith(";base64"):
+        return None, None
+    return header[5:-7], payload
+
+
+def is_binary_upload() -> bool:
+    mimetype = request.mimetype or ""
+    return mimetype == "multipart/form-data" or mimetype == "application/octet-stream" or mimetype.startswith("image/")
+
+
+def _max_length() -> Optional[int]:
+    try:
+        return current_app.config.get("MAX_CONTENT_LENGTH")
+    except RuntimeError:
+        return None
+
+
+def _spool_body() -> PhotoUpload:
+    limit = _max_length()
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    size = 0
+    stream = request.stream
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if limit and size > limit:
+            spool.close()
+            raise UploadError(f"Upload too large (limit {limit} bytes)", 413)
+        spool.write(chunk)
+    if not size:
+        spool.close()
+        raise UploadError("Empty upload body")
+    spool.seek(0)
+    mimetype = request.mimetype if request.mimetype.startswith("image/") else "image/jpeg"
+    return PhotoUpload(spool, mimetype, size, "binary")
+
+
+def _decode_data_uri(value: Any) -> PhotoUpload:
+    if not isinstance(value, str):
+        raise UploadError("Image must be a data URI string")
+    mime_type, payload = split_data_uri(value)
+    if payload is None:
+        raise UploadError("Invalid image data URI")
+    try:
+        raw = base64.b64decode(payload)
+    except (binascii.Error, ValueError):
+        raise UploadError("Invalid base64 image data")
+    return PhotoUpload(io.BytesIO(raw), mime_type, len(raw), "json")
+
+
+def _file_upload(upload) -> PhotoUpload:
+    stream = upload.stream
+    stream.seek(0, io.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    if not size:
+        raise UploadError("Empty upload")
+    return PhotoUpload(stream, upload.mimetype, size, "multipart")
+
+
+def read_photo(field: str = "image", data: Optional[dict] = None) -> PhotoUpload:
+    """
+    Read the photo from the current request in whichever of the three shapes it came.
+    For JSON requests `data` may carry the already-parsed body and `field` names the
+    data-URI key. Raises UploadError.
+    """
+    mimetype = request.mimetype or ""
+    if mimetype == "multipart/form-data":
+        upload = request.files.get(field) or next(iter(request.files.values()), None)
+        if upload is None:
+            raise UploadError(f"Missing '{field}' file in multipart body")
+        return _file_upload(upload)
+
+    if mimetype == "application/octet-stream" or mimetype.startswith("image/"):
+        return _spool_body()
+
+    if data is None:
+        data = request.get_json(force=True, silent=True)
+    if not isinstance(data, dict) or field not in data:
+        raise UploadError(f"Missing '{field}' in request body")
+    return _decode_data_uri(data[field])
+
+
+def read_photos(field: str = "images", max_count: int = 8) -> List[PhotoUpload]:
+    """
+    Several photos from one request: every multipart file (any field name, in order), or a
+    JSON body whose `field` is an array of data URIs. A raw-bytes body counts as one photo.
+    Raises UploadError when there are none or more than `max_count`.
+    """
+    mimetype = request.mimetype or ""
+    if mimetype == "multipart/form-data":
+        files = [f for name in request.files for f in request.files.getlist(name)]
+        if not files:
+            raise UploadError("No image files in multipart body")
+        if len(files) > max_count:
+            raise UploadError(f"Too many images ({len(files)}, limit {max_count})")
+        return [_file_upload(f) for f in files]
+
+    if mimetype == "application/octet-stream" or mimetype.startswith("image/"):
+        return [_spool_body()]
+
+    data = request.get_json(force=True, silent=True)
+    values = data.get(field) if isinstance(data, dict) else None
+    if not isinstance(values, list) or not values:
+        raise UploadError(f"'{field}' must be a non-empty array of image data URIs")
+    if len(values) > max_count:
+        raise UploadError(f"Too many images ({len(values)}, limit {max_count})")
+    return [_decode_data_uri(v) for v in values]